@@ -2,20 +2,32 @@
 Amphilagus - Project management module for Haystack RAG Assistant
 """
 
+import importlib
+
 __version__ = "0.1.0"
 
-from .file_manager import FileManager, Tag, Metadata
-from .database.manager import DatabaseManager
-from .task_manager import TaskManager
-from .assistant import MCPToolAgent
-from .literature import Literature
-
-__all__ = [
-    "FileManager",
-    "Tag",
-    "Metadata",
-    "DatabaseManager",
-    "TaskManager",
-    "MCPToolAgent",
-    "Literature",
-] 
\ No newline at end of file
+# 公开的类在首次访问时才导入：解析文件和提取PDF文本的spawn工作进程会导入本包，
+# 不应为此加载管道、助手和任务管理器等重量级依赖
+_EXPORTS = {
+    "FileManager": ".file_manager",
+    "Tag": ".file_manager",
+    "Metadata": ".file_manager",
+    "DatabaseManager": ".database.manager",
+    "TaskManager": ".task_manager",
+    "MCPToolAgent": ".assistant",
+    "Literature": ".literature",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -500,7 +500,7 @@ class Collection_Sum_Assistant(Collection_Base_Assistant):
         super()._setup_tools()
         
         @tool
-        def search_collection(queries: List[str], title: str) -> Dict[str, Any]:
+        def search_collection(queries: List[str], title: str, section: Optional[str] = None) -> Dict[str, Any]:
             """
             Search documents in the predefined collection using embedding-based semantic search.
             
@@ -509,6 +509,9 @@ class Collection_Sum_Assistant(Collection_Base_Assistant):
                 title: The title of the article to search within. The search will be limited to 
                       documents with this title. This parameter is required for targeted article 
                       summarization.
+                section: Optional section heading (e.g. "Introduction", "Methods", "Conclusions") to
+                      restrict the search to chunks under matching headings of the article. If the
+                      article has no matching section, the search is not restricted.
             Returns:
                 Dictionary containing the search results for each query
             
@@ -531,6 +534,7 @@ class Collection_Sum_Assistant(Collection_Base_Assistant):
                     "mode": "run_with_selected_title",
                     "top_k": self.top_k,
                     "title": title,
+                    "section": section,
                 })
             logger.debug(f"total number of queries: {len(queries)}")
             logger.debug(f"total number of formatted queries: {len(formatted_queries)}")
@@ -568,6 +572,7 @@ IMPORTANT: To manage token usage effectively, follow these guidelines when searc
 4. Always perform at least two rounds of searches for each information category to ensure accuracy and completeness
 5. If initial search results are incomplete or unclear, formulate follow-up queries that address specific gaps
 6. Use the information from earlier searches to inform and refine subsequent queries
+7. When a category corresponds to a section of the paper (e.g. Methods, Results, Conclusions), pass it as the section argument of search_collection to search only that section
 
 Extract and summarize information in the following categories:
 
@@ -32,7 +32,8 @@ def run_embedding_search(
     
     Args:
         collection_name: Name of the collection to search in
-        queries: List of query configurations, each must have at least a 'query' field
+        queries: List of query configurations, each must have at least a 'query' field.
+            An optional 'section' field (e.g. "Methods") restricts a query to chunks under matching headings
         top_k: Default number of results to return for each query
         mode: Mode of the query
     Returns:
@@ -44,7 +45,8 @@ def run_embedding_search(
             "collection_name": "research_papers",
             "queries": [
                 {"query": "quantum computing applications", "top_k": 3},
-                {"query": "neural networks in medicine"}
+                {"query": "neural networks in medicine"},
+                {"query": "simulation parameters", "section": "Methods"}
             ]
         }
     """
@@ -69,36 +71,24 @@ def run_embedding_search(
             title = query.get("title", False)
             if title:
                 query_config["title"] = title
+            section = query.get("section")
+            if section:
+                query_config["section"] = section
 
             formatted_queries.append(query_config)
         else:
             raise ValueError(f"Invalid query format: {query}")
     
-    # Get the embedding pipeline for the specified collection
-    pipeline = manager.pipeline.get_pipeline(
-        pipeline_type="embedding",
-        collection_name=collection_name,
-        create_if_missing=True
-    )
-    
-    if not pipeline:
-        return {
-            "error": f"Failed to initialize embedding pipeline for collection '{collection_name}'",
-            "results": []
-        }
-    
     try:
-        # Run the batch queries
-        results = pipeline.run_batch(formatted_queries)
-        # 解除 pipeline 的busy状态
-        pipeline.busy = False
+        # Check an embedding pipeline out of the pool for the duration of the batch
+        with manager.pipeline.checkout("embedding", collection_name) as pipeline:
+            results = pipeline.run_batch(formatted_queries)
         return {
             "collection_name": collection_name,
             "results": results,
             "query_count": len(results)
         }
     except Exception as e:
-        pipeline.busy = False
         return {
             "error": f"Error running batch queries: {str(e)}",
             "collection_name": collection_name,
@@ -134,45 +124,28 @@ def get_collection_titles(
         }
     """
     try:
-        # Get the pipeline for the specified collection
-        pipeline = manager.pipeline.get_pipeline(
-            pipeline_type="embedding",
-            collection_name=collection_name,
-            create_if_missing=True
-        )
-        
-        if not pipeline:
-            return {
-                "error": f"Collection '{collection_name}' not found or could not be accessed",
-                "collection_name": collection_name,
-                "titles": [],
-                "title_count": 0
-            }
-        
-        # Retrieve titles using the pipeline's _cache_all_titles method
-        try:
-            # Call the pipeline's method to get and cache all titles
-            unique_titles = pipeline._cache_all_titles(collection_name)
-            titles = list(unique_titles)
-            
-            # Release pipeline
-            pipeline.busy = False
-            
-            return {
-                "collection_name": collection_name,
-                "titles": titles,
-                "title_count": len(titles)
-            }
-            
-        except Exception as e:
-            pipeline.busy = False
-            logger.error(f"Error retrieving titles: {str(e)}", exc_info=True)
-            return {
-                "error": f"Error retrieving titles: {str(e)}",
-                "collection_name": collection_name,
-                "titles": [],
-                "title_count": 0
-            }
+        # Check a pipeline out of the pool for the specified collection
+        with manager.pipeline.checkout("embedding", collection_name) as pipeline:
+            # Retrieve titles using the pipeline's _cache_all_titles method
+            try:
+                # Call the pipeline's method to get and cache all titles
+                unique_titles = pipeline._cache_all_titles(collection_name)
+                titles = list(unique_titles)
+                
+                return {
+                    "collection_name": collection_name,
+                    "titles": titles,
+                    "title_count": len(titles)
+                }
+                
+            except Exception as e:
+                logger.error(f"Error retrieving titles: {str(e)}", exc_info=True)
+                return {
+                    "error": f"Error retrieving titles: {str(e)}",
+                    "collection_name": collection_name,
+                    "titles": [],
+                    "title_count": 0
+                }
     
     except Exception as e:
         logger.error(f"Error accessing collection: {str(e)}", exc_info=True)
@@ -33,7 +33,12 @@ CHROMA_DB_PATH = os.path.join(WORKSPACE_DIR, 'chroma_db')
 KNOWLEDGE_DIR = os.path.join(WORKSPACE_DIR, 'knowledge')
 LITERATURE_DATA_PATH = os.path.join(KNOWLEDGE_DIR, 'literature_data.json')
 COLLECTION_METADATA_FILE = os.path.join(WORKSPACE_DIR, 'collection_metadata.json')
+COLLECTION_INDEX_FILE = os.path.join(WORKSPACE_DIR, 'collection_index.sqlite3')
 SUM_FILES_PATH = os.path.join(FILES_DIR, 'sum_files')
+EMBEDDING_CACHE_PATH = os.path.join(WORKSPACE_DIR, 'embedding_cache')
+PDF_TEXT_CACHE_PATH = os.path.join(WORKSPACE_DIR, 'pdf_text_cache')
+# 上传文件和PDF转换输出的暂存目录，与raw_files位于同一文件系统，入库时可直接重命名而无需复制
+UPLOAD_TEMP_PATH = os.path.join(WORKSPACE_DIR, 'uploads')
 
 # 配置文件路径
 MD_CLEANER_CONFIG_PATH = os.path.join(CONFIGS_DIR, 'md_cleaner_config.json')
@@ -52,6 +57,10 @@ logger.debug(f"CHROMA_DB_PATH: {CHROMA_DB_PATH}")
 logger.debug(f"KNOWLEDGE_DIR: {KNOWLEDGE_DIR}")
 logger.debug(f"LITERATURE_DATA_PATH: {LITERATURE_DATA_PATH}")
 logger.debug(f"COLLECTION_METADATA_FILE: {COLLECTION_METADATA_FILE}")
+logger.debug(f"COLLECTION_INDEX_FILE: {COLLECTION_INDEX_FILE}")
+logger.debug(f"EMBEDDING_CACHE_PATH: {EMBEDDING_CACHE_PATH}")
+logger.debug(f"PDF_TEXT_CACHE_PATH: {PDF_TEXT_CACHE_PATH}")
+logger.debug(f"UPLOAD_TEMP_PATH: {UPLOAD_TEMP_PATH}")
 logger.debug(f"MD_CLEANER_CONFIG_PATH: {MD_CLEANER_CONFIG_PATH}")
 logger.debug(f"TITLE_EXTRACTOR_CONFIG_PATH: {TITLE_EXTRACTOR_CONFIG_PATH}")
 
@@ -62,6 +71,7 @@ os.makedirs(TASKS_PATH, exist_ok=True)
 os.makedirs(CONFIGS_DIR, exist_ok=True)
 os.makedirs(KNOWLEDGE_DIR, exist_ok=True)
 os.makedirs(SUM_FILES_PATH, exist_ok=True)
+os.makedirs(UPLOAD_TEMP_PATH, exist_ok=True)
 
 # 加载配置文件
 try:
@@ -102,6 +112,69 @@ def pdf_converter_available():
 # 设置PDF转换器可用性
 PDF_CONVERTER_AVAILABLE = pdf_converter_available()
 
+# 常驻Marker转换进程的数量，每个进程约占用数GB内存（或显存）
+MARKER_WORKERS = int(os.environ.get('AMPHILAGUS_MARKER_WORKERS', '1'))
+# 每个进程转换多少个PDF后重启，释放累积的内存
+MARKER_MAX_JOBS_PER_WORKER = int(os.environ.get('AMPHILAGUS_MARKER_MAX_JOBS', '20'))
+# 进程常驻内存超过该值（MB）时重启，0表示不限制
+MARKER_MAX_MEMORY_MB = int(os.environ.get('AMPHILAGUS_MARKER_MAX_MEMORY_MB', '0')) or None
+# 单个PDF的最长转换时间（秒），超时后终止该进程并让下一个PDF启动新进程，0表示不限制
+MARKER_JOB_TIMEOUT = float(os.environ.get('AMPHILAGUS_MARKER_JOB_TIMEOUT', '1800')) or None
+logger.debug(f"MARKER_WORKERS: {MARKER_WORKERS}, MARKER_MAX_JOBS_PER_WORKER: {MARKER_MAX_JOBS_PER_WORKER}, "
+             f"MARKER_MAX_MEMORY_MB: {MARKER_MAX_MEMORY_MB}, MARKER_JOB_TIMEOUT: {MARKER_JOB_TIMEOUT}")
+
+# 嵌入文件时并行解析文件的进程数量，以及单个文件的最长解析时间（秒，0表示不限制）。
+# 默认在当前进程中逐个解析；进程数大于1或设置了超时时才启动解析进程池
+EMBED_LOAD_WORKERS = int(os.environ.get('AMPHILAGUS_EMBED_LOAD_WORKERS', '1'))
+EMBED_FILE_TIMEOUT = float(os.environ.get('AMPHILAGUS_EMBED_FILE_TIMEOUT', '0')) or None
+logger.debug(f"EMBED_LOAD_WORKERS: {EMBED_LOAD_WORKERS}, EMBED_FILE_TIMEOUT: {EMBED_FILE_TIMEOUT}")
+
+# 大型PDF（页数达到document_loader.PDF_PARALLEL_MIN_PAGES）按页拆分到多个进程提取文本时的进程数量，
+# 1表示始终在当前进程中提取；已经在解析文件的工作进程中时不再拆分
+PDF_EXTRACT_WORKERS = int(os.environ.get('AMPHILAGUS_PDF_EXTRACT_WORKERS', str(min(4, os.cpu_count() or 1))))
+logger.debug(f"PDF_EXTRACT_WORKERS: {PDF_EXTRACT_WORKERS}")
+
+# 批量查询时同时进行的LLM生成请求数量
+RAG_BATCH_GENERATION_WORKERS = int(os.environ.get('AMPHILAGUS_RAG_BATCH_WORKERS', '4'))
+logger.debug(f"RAG_BATCH_GENERATION_WORKERS: {RAG_BATCH_GENERATION_WORKERS}")
+
+# 按章节过滤检索时，一个章节名称最多匹配的章节路径数量（下推到Chroma的in条件的最大长度）
+SECTION_FILTER_MAX_VALUES = int(os.environ.get('AMPHILAGUS_SECTION_FILTER_MAX_VALUES', '100'))
+logger.debug(f"SECTION_FILTER_MAX_VALUES: {SECTION_FILTER_MAX_VALUES}")
+
+# 后台任务工作线程数量
+TASK_WORKERS = int(os.environ.get('AMPHILAGUS_TASK_WORKERS', '4'))
+# 各类任务同时运行的上限；同一集合的嵌入和同步任务始终串行执行
+TASK_CONCURRENCY = {
+    'file_upload': int(os.environ.get('AMPHILAGUS_MAX_UPLOAD_TASKS', '2')),
+    'batch_embed': int(os.environ.get('AMPHILAGUS_MAX_EMBED_TASKS', '2')),
+    'batch_clean': int(os.environ.get('AMPHILAGUS_MAX_CLEAN_TASKS', '4')),
+    'collection_sync': int(os.environ.get('AMPHILAGUS_MAX_SYNC_TASKS', '1')),
+}
+logger.debug(f"TASK_WORKERS: {TASK_WORKERS}, TASK_CONCURRENCY: {TASK_CONCURRENCY}")
+# 文件数不超过该值的任务视为交互式任务，优先执行并可抢占批量任务
+INTERACTIVE_TASK_MAX_FILES = int(os.environ.get('AMPHILAGUS_INTERACTIVE_MAX_FILES', '3'))
+logger.debug(f"INTERACTIVE_TASK_MAX_FILES: {INTERACTIVE_TASK_MAX_FILES}")
+# 已结束任务的保留策略：保留天数（0表示不按时间清理）和最多保留的数量
+TASK_RETENTION_DAYS = float(os.environ.get('AMPHILAGUS_TASK_RETENTION_DAYS', '30'))
+TASK_RETENTION_MAX_FINISHED = int(os.environ.get('AMPHILAGUS_TASK_RETENTION_MAX', '1000'))
+logger.debug(f"TASK_RETENTION_DAYS: {TASK_RETENTION_DAYS}, TASK_RETENTION_MAX_FINISHED: {TASK_RETENTION_MAX_FINISHED}")
+
+# 文献全文检索各字段的BM25权重，未列出的字段不参与检索
+LITERATURE_SEARCH_FIELD_BOOSTS = {
+    'title': 3.0,
+    'authors': 2.0,
+    'journal': 1.5,
+    'research_field': 1.5,
+    'tags': 1.5,
+    'highlights': 1.2,
+    'background': 1.0,
+    'methodology': 1.0,
+    'content': 1.0,
+    'review': 0.5,
+}
+logger.debug(f"LITERATURE_SEARCH_FIELD_BOOSTS: {LITERATURE_SEARCH_FIELD_BOOSTS}")
+
 # 允许的文件类型
 ALLOWED_EXTENSIONS = {'txt', 'pdf', 'md', 'docx', 'html'}
 
@@ -0,0 +1,302 @@
+"""
+Chunker Module
+
+按嵌入模型的词元数量切分文档，并保留文档结构：
+- 一次遍历预先计算标题行和句子边界
+- 以句子为单位贪心打包，保证每个片段不超过模型的最大输入长度
+- 遇到标题时开始新片段，片段元数据记录所在章节路径（如 "Methods > Simulation details"）
+- 每个片段记录在原文中的(起始, 结束)字符偏移
+"""
+
+import copy
+import re
+from typing import Any, Dict, Iterator, List, Match, NamedTuple, Optional, Tuple
+
+from haystack import Document
+
+from ..logger import get_logger
+
+# 获取日志记录器
+logger = get_logger("chunker")
+
+# 可选的切片方式
+CHUNKERS = ("character", "token")
+
+# 行（包括其后的连续换行）
+_LINE_RE = re.compile(r'[^\n]*\n+|[^\n]+')
+
+# 行内句子边界：中英文句末标点（包括其后的引号括号），以及后接空白的英文句点
+_SENTENCE_RE = re.compile(r'[。！？；!?]+["\'”’）)\]]*|\.(?=\s)')
+
+# Markdown标题行
+_HEADING_RE = re.compile(r'[ \t]*(#{1,6})[ \t]+(.+?)[ \t]*#*[ \t]*\n*$')
+
+# 代码块围栏行，围栏内的 # 开头的行不是标题
+_FENCE_RE = re.compile(r'[ \t]*(`{3,}|~{3,})')
+
+# 未提供分词器时的近似词元：单个汉字、连续的字母数字或单个标点
+_SIMPLE_TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]|[A-Za-z0-9_]+|[^\sA-Za-z0-9_]')
+
+
+class _SimpleTokenCounter:
+    """没有可用分词器时使用的近似词元计数"""
+
+    def count(self, texts: List[str]) -> List[int]:
+        return [len(_SIMPLE_TOKEN_RE.findall(text)) for text in texts]
+
+    def split(self, text: str, max_tokens: int) -> List[Tuple[int, int]]:
+        """按词元数把文本切成若干(起始, 结束)区间"""
+        spans = [match.span() for match in _SIMPLE_TOKEN_RE.finditer(text)]
+        return _group_token_spans(spans, len(text), max_tokens)
+
+
+class _TransformersTokenCounter:
+    """使用嵌入模型的Hugging Face分词器计数"""
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self._fallback = _SimpleTokenCounter()
+
+    def count(self, texts: List[str]) -> List[int]:
+        if not texts:
+            return []
+        encoded = self.tokenizer(texts, add_special_tokens=False, return_attention_mask=False,
+                                 return_token_type_ids=False)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    def split(self, text: str, max_tokens: int) -> List[Tuple[int, int]]:
+        if not getattr(self.tokenizer, "is_fast", False):
+            return self._fallback.split(text, max_tokens)
+        offsets = self.tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+        return _group_token_spans([tuple(span) for span in offsets], len(text), max_tokens)
+
+
+def _group_token_spans(spans: List[Tuple[int, int]], text_length: int, max_tokens: int) -> List[Tuple[int, int]]:
+    """把词元区间按max_tokens分组，返回覆盖整个文本的连续区间"""
+    if not spans:
+        return [(0, text_length)]
+    ranges = []
+    start = 0
+    for i in range(max_tokens, len(spans), max_tokens):
+        end = spans[i][0]
+        ranges.append((start, end))
+        start = end
+    ranges.append((start, text_length))
+    return ranges
+
+
+def _scan_lines(text: str) -> Iterator[Tuple[int, int, Optional[Match]]]:
+    """逐行扫描文本，返回(行起始, 行结束, 标题匹配)，代码块围栏内的行不识别为标题"""
+    fence = None
+    for line in _LINE_RE.finditer(text):
+        line_start, line_end = line.span()
+        match = _FENCE_RE.match(text, line_start, line_end)
+        if fence is not None:
+            if match and match.group(1).startswith(fence):
+                fence = None
+            yield line_start, line_end, None
+        elif match:
+            fence = match.group(1)[0] * 3
+            yield line_start, line_end, None
+        else:
+            yield line_start, line_end, _HEADING_RE.match(text, line_start, line_end)
+
+
+def section_starts(text: str) -> Tuple[List[int], List[str]]:
+    """
+    扫描文本中的Markdown标题行
+
+    Args:
+        text: 原文
+
+    Returns:
+        (各标题的起始偏移, 从该偏移开始的章节路径)，可用bisect查找任意偏移所在的章节
+    """
+    offsets, paths = [], []
+    sections: List[Tuple[int, str]] = []
+    for line_start, _, match in _scan_lines(text):
+        if not match:
+            continue
+        level = len(match.group(1))
+        while sections and sections[-1][0] >= level:
+            sections.pop()
+        sections.append((level, match.group(2).strip()))
+        offsets.append(line_start)
+        paths.append(" > ".join(title for _, title in sections))
+    return offsets, paths
+
+
+class _Segment(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+    heading: Optional[Tuple[int, str]]  # (标题级别, 标题文本)
+
+
+class TokenChunker:
+    """
+    按嵌入模型词元数量切分文档的结构感知切片器
+    """
+
+    def __init__(self, chunk_size: int = 256, chunk_overlap: int = 32, tokenizer=None,
+                 max_tokens: Optional[int] = None):
+        """
+        初始化切片器
+
+        Args:
+            chunk_size: 每个片段的最大词元数
+            chunk_overlap: 相邻片段之间重叠的最大词元数（按整句重叠）
+            tokenizer: Hugging Face分词器，None时使用近似计数
+            max_tokens: 模型允许的最大词元数（已扣除特殊词元和前后缀），chunk_size不会超过该值
+        """
+        self.counter = _TransformersTokenCounter(tokenizer) if tokenizer is not None else _SimpleTokenCounter()
+        self.chunk_size = max(1, min(chunk_size, max_tokens) if max_tokens else chunk_size)
+        self.chunk_overlap = max(0, min(chunk_overlap, self.chunk_size // 2))
+        if self.chunk_size < chunk_size:
+            logger.info(f"切片大小 {chunk_size} 超过模型最大输入长度，已调整为 {self.chunk_size} 个词元")
+
+    @classmethod
+    def for_pipeline(cls, pipeline, chunk_size: int = 256, chunk_overlap: int = 32) -> "TokenChunker":
+        """
+        使用管道中文档嵌入模型的分词器和最大输入长度创建切片器
+
+        Args:
+            pipeline: RAGPipeline实例
+            chunk_size: 每个片段的最大词元数
+            chunk_overlap: 相邻片段之间重叠的最大词元数
+
+        Returns:
+            TokenChunker实例
+        """
+        embedder = pipeline.document_embedder
+        model = getattr(getattr(embedder, "embedding_backend", None), "model", None)
+        tokenizer = getattr(model, "tokenizer", None)
+        if tokenizer is None:
+            logger.warning("无法获取嵌入模型的分词器，使用近似词元计数")
+            return cls(chunk_size, chunk_overlap)
+
+        # 切片在加载线程中进行，复制分词器以免与嵌入线程并发使用同一个实例
+        tokenizer = copy.deepcopy(tokenizer)
+        max_tokens = None
+        max_seq_length = getattr(model, "max_seq_length", None)
+        if max_seq_length:
+            special_tokens = tokenizer.num_special_tokens_to_add(pair=False)
+            affix = (getattr(embedder, "prefix", "") or "") + (getattr(embedder, "suffix", "") or "")
+            affix_tokens = _TransformersTokenCounter(tokenizer).count([affix])[0] if affix else 0
+            max_tokens = max_seq_length - special_tokens - affix_tokens
+        return cls(chunk_size, chunk_overlap, tokenizer=tokenizer, max_tokens=max_tokens)
+
+    def _segments(self, text: str) -> List[_Segment]:
+        """一次遍历计算标题行和句子边界，并批量统计每个句子的词元数"""
+        bounds = []
+        for line_start, line_end, match in _scan_lines(text):
+            if match:
+                bounds.append((line_start, line_end, (len(match.group(1)), match.group(2).strip())))
+                continue
+            start = line_start
+            for sentence in _SENTENCE_RE.finditer(text, line_start, line_end):
+                if sentence.end() > start:
+                    bounds.append((start, sentence.end(), None))
+                    start = sentence.end()
+            if start < line_end:
+                bounds.append((start, line_end, None))
+
+        counts = self.counter.count([text[s:e] for s, e, _ in bounds])
+        segments = []
+        for (s, e, heading), tokens in zip(bounds, counts):
+            if tokens > self.chunk_size:
+                # 超长句子按词元数强制切分
+                for sub_start, sub_end in self.counter.split(text[s:e], self.chunk_size):
+                    sub_tokens = self.counter.count([text[s + sub_start:s + sub_end]])[0]
+                    segments.append(_Segment(s + sub_start, s + sub_end, sub_tokens, heading))
+                    heading = None
+            else:
+                segments.append(_Segment(s, e, tokens, heading))
+        return segments
+
+    def chunk_text(self, text: str) -> List[Dict[str, Any]]:
+        """
+        切分单个文本
+
+        Args:
+            text: 原文
+
+        Returns:
+            片段信息列表，每项包含start、end、tokens和section
+        """
+        chunks = []
+        current: List[_Segment] = []
+        current_tokens = 0
+        sections: List[Tuple[int, str]] = []
+        chunk_section = ""
+
+        def emit():
+            if current and text[current[0].start:current[-1].end].strip():
+                chunks.append({
+                    "start": current[0].start,
+                    "end": current[-1].end,
+                    "tokens": current_tokens,
+                    "section": chunk_section
+                })
+
+        for segment in self._segments(text):
+            if segment.heading:
+                # 标题开始新的章节：结束当前片段，章节之间不重叠；只有标题的片段与后续内容合并
+                if any(not previous.heading for previous in current):
+                    emit()
+                    current, current_tokens = [], 0
+                level, title = segment.heading
+                while sections and sections[-1][0] >= level:
+                    sections.pop()
+                sections.append((level, title))
+
+            if current and current_tokens + segment.tokens > self.chunk_size:
+                emit()
+                # 保留末尾若干完整句子作为重叠
+                overlap, overlap_tokens = [], 0
+                for previous in reversed(current[1:]):
+                    if overlap_tokens + previous.tokens > self.chunk_overlap:
+                        break
+                    overlap.insert(0, previous)
+                    overlap_tokens += previous.tokens
+                current, current_tokens = overlap, overlap_tokens
+                # 重叠部分加上新句子仍超长时，从前面丢弃重叠句子
+                while current and current_tokens + segment.tokens > self.chunk_size:
+                    current_tokens -= current.pop(0).tokens
+
+            if all(previous.heading for previous in current):
+                chunk_section = " > ".join(title for _, title in sections)
+            current.append(segment)
+            current_tokens += segment.tokens
+
+        emit()
+        return chunks
+
+    def chunk_documents(self, documents: List[Document]) -> List[Document]:
+        """
+        切分文档列表
+
+        Args:
+            documents: Document对象列表
+
+        Returns:
+            带有偏移和章节元数据的片段Document列表
+        """
+        chunked_documents = []
+        for doc in documents:
+            text = doc.content or ""
+            base_meta = doc.meta or {}
+            for chunk_id, chunk in enumerate(self.chunk_text(text)):
+                chunk_meta = dict(base_meta)
+                chunk_meta.update({
+                    "chunk_id": chunk_id,
+                    "chunk_size": self.chunk_size,
+                    "chunk_overlap": self.chunk_overlap,
+                    "chunk_start": chunk["start"],
+                    "chunk_end": chunk["end"],
+                    "chunk_tokens": chunk["tokens"]
+                })
+                if chunk["section"]:
+                    chunk_meta["section"] = chunk["section"]
+                chunked_documents.append(Document(content=text[chunk["start"]:chunk["end"]], meta=chunk_meta))
+        return chunked_documents
@@ -0,0 +1,340 @@
+"""
+Collection Index Module
+
+为每个集合维护文档来源路径和片段内容哈希的索引，使重复检测成为常数时间查询。
+索引保存在collection_metadata.json旁边的SQLite文件中，按文档ID记录(来源, 内容哈希)，
+在写入和删除文档时增量更新；尚未建立索引的旧集合在首次使用时从Chroma重建一次。
+同时记录每个源文件的(路径, 修改时间, 大小, 内容哈希)，用于增量重新嵌入，
+以及每个片段所在的章节路径和文档标题，用于按章节过滤检索（可限定在某一标题内）。
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .. import config
+from ..logger import get_logger
+
+# 获取日志记录器
+logger = get_logger("collection_index")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def content_hash(content: Optional[str]) -> str:
+    """
+    计算片段内容的哈希（Unicode NFC并合并空白字符后的SHA-256）
+
+    Args:
+        content: 片段内容
+
+    Returns:
+        十六进制哈希字符串
+    """
+    normalized = _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", content or "")).strip()
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class CollectionIndex:
+    """集合的来源路径和内容哈希索引"""
+
+    def __init__(self, db_path: str):
+        """
+        初始化索引，数据库在首次使用时才打开
+
+        Args:
+            db_path: SQLite文件路径
+        """
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开（必要时创建）SQLite索引，调用方需持有锁"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS collections (collection TEXT PRIMARY KEY)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "collection TEXT NOT NULL, doc_id TEXT NOT NULL, source TEXT, content_hash TEXT NOT NULL, "
+                "section TEXT, title TEXT, PRIMARY KEY (collection, doc_id)) WITHOUT ROWID"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+            for column in ("section", "title"):
+                if column not in columns:
+                    # 旧索引没有章节或标题列：添加后让所有集合在下次使用时重建
+                    conn.execute(f"ALTER TABLE documents ADD COLUMN {column} TEXT")
+                    conn.execute("DELETE FROM collections")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_source ON documents (collection, source)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_content ON documents (collection, content_hash)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_title ON documents (collection, title)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS source_versions ("
+                "collection TEXT NOT NULL, source TEXT NOT NULL, mtime REAL NOT NULL, size INTEGER NOT NULL, "
+                "file_hash TEXT NOT NULL, PRIMARY KEY (collection, source)) WITHOUT ROWID"
+            )
+            self._conn = conn
+        return self._conn
+
+    def is_ready(self, collection: str) -> bool:
+        """检查集合的索引是否已经建立"""
+        with self._lock:
+            conn = self._connect()
+            return conn.execute("SELECT 1 FROM collections WHERE collection = ?", (collection,)).fetchone() is not None
+
+    def rebuild(self, collection: str,
+                entries: Iterable[Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str]]]) -> int:
+        """
+        用集合中的全部文档重建索引
+
+        Args:
+            collection: 集合名称
+            entries: (文档ID, 来源, 内容, 章节路径, 标题)迭代器
+
+        Returns:
+            索引的文档数量
+        """
+        rows = [
+            (collection, doc_id, source, content_hash(content), section, title)
+            for doc_id, source, content, section, title in entries
+        ]
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM documents WHERE collection = ?", (collection,))
+                conn.executemany(
+                    "INSERT OR REPLACE INTO documents (collection, doc_id, source, content_hash, section, title) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                conn.execute("INSERT OR IGNORE INTO collections (collection) VALUES (?)", (collection,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        logger.info(f"已为集合 '{collection}' 重建来源索引，共 {len(rows)} 个文档")
+        return len(rows)
+
+    def add(self, collection: str, entries: Sequence[Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str]]]) -> None:
+        """
+        记录新写入的文档
+
+        Args:
+            collection: 集合名称
+            entries: (文档ID, 来源, 内容, 章节路径, 标题)列表
+        """
+        if not entries:
+            return
+        rows = [
+            (collection, doc_id, source, content_hash(content), section, title)
+            for doc_id, source, content, section, title in entries
+        ]
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO documents (collection, doc_id, source, content_hash, section, title) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+
+    def remove(self, collection: str, doc_ids: Sequence[str]) -> None:
+        """
+        移除已删除的文档
+
+        Args:
+            collection: 集合名称
+            doc_ids: 文档ID列表
+        """
+        if not doc_ids:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "DELETE FROM documents WHERE collection = ? AND doc_id = ?",
+                [(collection, doc_id) for doc_id in doc_ids]
+            )
+
+    def invalidate(self, collection: str) -> None:
+        """
+        标记集合的文档索引需要重建，保留已记录的源文件版本
+
+        Args:
+            collection: 集合名称
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("DELETE FROM collections WHERE collection = ?", (collection,))
+
+    def drop(self, collection: str) -> None:
+        """
+        删除集合的全部索引，包括源文件版本
+
+        Args:
+            collection: 集合名称
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DELETE FROM documents WHERE collection = ?", (collection,))
+                conn.execute("DELETE FROM collections WHERE collection = ?", (collection,))
+                conn.execute("DELETE FROM source_versions WHERE collection = ?", (collection,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def has_source(self, collection: str, source: str) -> bool:
+        """检查集合中是否存在来自指定来源的文档"""
+        with self._lock:
+            conn = self._connect()
+            return conn.execute(
+                "SELECT 1 FROM documents WHERE collection = ? AND source = ? LIMIT 1", (collection, source)
+            ).fetchone() is not None
+
+    def has_content(self, collection: str, content: str) -> bool:
+        """检查集合中是否存在内容相同的片段"""
+        with self._lock:
+            conn = self._connect()
+            return conn.execute(
+                "SELECT 1 FROM documents WHERE collection = ? AND content_hash = ? LIMIT 1",
+                (collection, content_hash(content))
+            ).fetchone() is not None
+
+    def get_sources(self, collection: str) -> Dict[str, int]:
+        """
+        获取集合中各来源的片段数量
+
+        Args:
+            collection: 集合名称
+
+        Returns:
+            {来源: 片段数量}
+        """
+        with self._lock:
+            conn = self._connect()
+            return {
+                source: count for source, count in conn.execute(
+                    "SELECT source, COUNT(*) FROM documents WHERE collection = ? AND source IS NOT NULL GROUP BY source",
+                    (collection,)
+                )
+            }
+
+    def get_doc_ids_by_source(self, collection: str, source: str) -> List[str]:
+        """
+        获取来自指定来源的全部文档ID
+
+        Args:
+            collection: 集合名称
+            source: 来源路径
+
+        Returns:
+            文档ID列表
+        """
+        with self._lock:
+            conn = self._connect()
+            return [row[0] for row in conn.execute(
+                "SELECT doc_id FROM documents WHERE collection = ? AND source = ?", (collection, source)
+            )]
+
+    def get_sections(self, collection: str, title: Optional[str] = None) -> List[str]:
+        """
+        获取集合中出现过的全部章节路径
+
+        Args:
+            collection: 集合名称
+            title: 只返回该标题的文档中的章节路径，None表示整个集合
+
+        Returns:
+            去重后的章节路径列表
+        """
+        query = "SELECT DISTINCT section FROM documents WHERE collection = ? AND section IS NOT NULL"
+        params: Tuple = (collection,)
+        if title is not None:
+            query += " AND title = ?"
+            params += (title,)
+        with self._lock:
+            conn = self._connect()
+            return [row[0] for row in conn.execute(query, params)]
+
+    def get_source_versions(self, collection: str) -> Dict[str, Dict[str, object]]:
+        """
+        获取集合中已记录的源文件版本
+
+        Args:
+            collection: 集合名称
+
+        Returns:
+            {来源: {"mtime": 修改时间, "size": 文件大小, "file_hash": 文件内容哈希}}
+        """
+        with self._lock:
+            conn = self._connect()
+            return {
+                source: {"mtime": mtime, "size": size, "file_hash": file_hash}
+                for source, mtime, size, file_hash in conn.execute(
+                    "SELECT source, mtime, size, file_hash FROM source_versions WHERE collection = ?", (collection,)
+                )
+            }
+
+    def set_source_versions(self, collection: str, versions: Sequence[Tuple[str, float, int, str]]) -> None:
+        """
+        记录源文件版本
+
+        Args:
+            collection: 集合名称
+            versions: (来源, 修改时间, 文件大小, 文件内容哈希)列表
+        """
+        if not versions:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO source_versions (collection, source, mtime, size, file_hash) VALUES (?, ?, ?, ?, ?)",
+                [(collection, *version) for version in versions]
+            )
+
+    def remove_source_versions(self, collection: str, sources: Sequence[str]) -> None:
+        """
+        删除源文件版本记录
+
+        Args:
+            collection: 集合名称
+            sources: 来源列表
+        """
+        if not sources:
+            return
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "DELETE FROM source_versions WHERE collection = ? AND source = ?",
+                [(collection, source) for source in sources]
+            )
+
+
+def hash_file(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """
+    分块计算文件内容的SHA-256哈希
+
+    Args:
+        file_path: 文件路径
+        block_size: 每次读取的字节数
+
+    Returns:
+        十六进制哈希字符串
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# 创建全局集合索引实例
+collection_index = CollectionIndex(config.COLLECTION_INDEX_FILE)
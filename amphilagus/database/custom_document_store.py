@@ -1,10 +1,20 @@
+from haystack import Document
+from haystack.document_stores.errors import DuplicateDocumentError
+from haystack.document_stores.types import DuplicatePolicy
 from haystack_integrations.document_stores.chroma import ChromaDocumentStore
 import logging
 import chromadb
 import os
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from .collection_index import collection_index
+from .document_writer import DEFAULT_MAX_BATCH_SIZE
 
 logger = logging.getLogger(__name__)
 
+# Chroma支持的元数据值类型（与ChromaDocumentStore一致）
+SUPPORTED_TYPES_FOR_METADATA_VALUES = (str, int, float, bool)
+
 class CustomChromaDocumentStore(ChromaDocumentStore):
     """
     A custom document store extending ChromaDocumentStore with fixed collection existence check.
@@ -33,6 +43,7 @@ class CustomChromaDocumentStore(ChromaDocumentStore):
             
             if collection_name in collection_names:
                 client.delete_collection(name=collection_name)
+                collection_index.drop(collection_name)
                 logger.info(f"Successfully deleted collection: {collection_name}")
                 return True
             else:
@@ -68,6 +79,7 @@ class CustomChromaDocumentStore(ChromaDocumentStore):
             **embedding_function_params,
         )
         # 不再存储和处理embedding_dim
+        self._max_batch_size = None
     
     def _ensure_initialized(self):
         if not self._initialized:
@@ -113,4 +125,247 @@ class CustomChromaDocumentStore(ChromaDocumentStore):
                     embedding_function=self._embedding_func,
                 )
 
-            self._initialized = True 
\ No newline at end of file
+            self._initialized = True
+
+    def has_meta_value(self, field: str, value: Any) -> bool:
+        """
+        Check whether at least one document carries ``meta[field] == value``.
+
+        The check is pushed down to Chroma as a ``where`` filter and only fetches a
+        single id, so it does not depend on the size of the collection.
+        """
+        self._ensure_initialized()
+        result = self._collection.get(where={field: value}, limit=1, include=[])
+        return bool(result and result.get("ids"))
+
+    def get_meta_values(self, field: str) -> Set[Any]:
+        """
+        Collect the distinct values of a metadata field across the collection.
+
+        Only metadatas are requested from Chroma; document contents and embeddings
+        are never loaded.
+        """
+        self._ensure_initialized()
+        result = self._collection.get(include=["metadatas"])
+        values = set()
+        for meta in (result or {}).get("metadatas") or []:
+            if meta and meta.get(field) is not None:
+                values.add(meta[field])
+        return values
+
+    def _ensure_index(self) -> None:
+        """
+        Make sure the source/content-hash index of this collection exists.
+
+        Collections created before the index existed are scanned once, page by page,
+        and indexed; afterwards the index is kept up to date on every write and delete.
+        """
+        self._ensure_initialized()
+        if not collection_index.is_ready(self._collection_name):
+            collection_index.rebuild(self._collection_name, self._iter_index_entries())
+
+    def _iter_index_entries(
+        self, page_size: int = 1000
+    ) -> Iterator[Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str]]]:
+        """Yield (id, source, content, section, title) for every document, fetching metadatas and contents in pages."""
+        offset = 0
+        while True:
+            result = self._collection.get(include=["metadatas", "documents"], limit=page_size, offset=offset)
+            ids = (result or {}).get("ids") or []
+            if not ids:
+                break
+            metadatas = result.get("metadatas") or [None] * len(ids)
+            contents = result.get("documents") or [None] * len(ids)
+            for doc_id, meta, content in zip(ids, metadatas, contents):
+                meta = meta or {}
+                yield doc_id, meta.get("source"), content, meta.get("section"), meta.get("title")
+            offset += len(ids)
+
+    def max_batch_size(self) -> int:
+        """
+        Return the largest number of records Chroma accepts in a single add call.
+        """
+        self._ensure_initialized()
+        if self._max_batch_size is None:
+            try:
+                self._max_batch_size = self._collection._client.get_max_batch_size()
+            except Exception as e:
+                logger.warning(f"Could not get Chroma's max batch size, using {DEFAULT_MAX_BATCH_SIZE}: {e}")
+                self._max_batch_size = DEFAULT_MAX_BATCH_SIZE
+        return self._max_batch_size
+
+    def _existing_ids(self, doc_ids: List[str]) -> Set[str]:
+        """
+        Return the subset of ``doc_ids`` already stored in the collection, queried in batches.
+        """
+        existing: Set[str] = set()
+        max_batch_size = self.max_batch_size()
+        for start in range(0, len(doc_ids), max_batch_size):
+            result = self._collection.get(ids=doc_ids[start:start + max_batch_size], include=[])
+            existing.update((result or {}).get("ids") or [])
+        return existing
+
+    def _apply_policy(self, documents: List[Document], policy: DuplicatePolicy) -> List[Document]:
+        """
+        Resolve duplicate ids according to ``policy`` and return the documents to write.
+
+        Ids are checked against the collection and within ``documents`` itself.
+        ``NONE`` behaves like ``FAIL``; ``SKIP`` keeps the stored (or first) document;
+        ``OVERWRITE`` keeps the last document and replaces the stored one.
+        """
+        unique: Dict[str, Document] = {}
+        repeated: List[str] = []
+        for doc in documents:
+            if doc.id in unique:
+                repeated.append(doc.id)
+                if policy != DuplicatePolicy.OVERWRITE:
+                    continue
+            unique[doc.id] = doc
+        if policy == DuplicatePolicy.OVERWRITE:
+            return list(unique.values())
+
+        existing = self._existing_ids(list(unique))
+        if policy == DuplicatePolicy.SKIP:
+            if existing or repeated:
+                logger.info(f"Skipping {len(existing) + len(repeated)} documents whose ids already exist")
+            return [doc for doc_id, doc in unique.items() if doc_id not in existing]
+
+        duplicates = sorted(existing.union(repeated))
+        if duplicates:
+            raise DuplicateDocumentError(
+                f"IDs {duplicates[:10]} already exist in collection '{self._collection_name}' or are repeated"
+                + (f" (and {len(duplicates) - 10} more)" if len(duplicates) > 10 else "")
+            )
+        return documents
+
+    def _add_documents(self, documents: List[Document], overwrite: bool = False) -> List[Document]:
+        """
+        Add documents to Chroma with one ``add`` (or ``upsert``) call per batch.
+
+        The base class issues one ``add`` call (one SQLite transaction and HNSW update) per
+        document; here ids, contents, metadatas and embeddings are passed column-wise instead.
+        Documents without content are skipped and unsupported metadata values are dropped,
+        as in the base class.
+
+        Returns:
+            The documents that were actually written
+        """
+        # Chroma要求同一次add中的文档要么都带向量，要么都不带
+        groups: Dict[bool, List[Document]] = {True: [], False: []}
+        for doc in documents:
+            if not isinstance(doc, Document):
+                raise ValueError("param 'documents' must contain a list of objects of type Document")
+            if doc.content is None:
+                logger.warning(f"ChromaDocumentStore cannot store documents with `content=None`. "
+                               f"Document with id {doc.id} will be skipped.")
+                continue
+            groups[doc.embedding is not None].append(doc)
+
+        write = self._collection.upsert if overwrite else self._collection.add
+        max_batch_size = self.max_batch_size()
+        written: List[Document] = []
+        for with_embeddings, docs in groups.items():
+            for start in range(0, len(docs), max_batch_size):
+                batch = docs[start:start + max_batch_size]
+                metadatas = []
+                for doc in batch:
+                    meta = {
+                        key: value for key, value in (doc.meta or {}).items()
+                        if isinstance(value, SUPPORTED_TYPES_FOR_METADATA_VALUES)
+                    }
+                    metadatas.append(meta or None)
+                data = {
+                    "ids": [doc.id for doc in batch],
+                    "documents": [doc.content for doc in batch],
+                    "metadatas": metadatas
+                }
+                if with_embeddings:
+                    data["embeddings"] = [doc.embedding for doc in batch]
+                write(**data)
+                written.extend(batch)
+        return written
+
+    def write_documents(self, documents: List[Document], policy: DuplicatePolicy = DuplicatePolicy.NONE) -> int:
+        """
+        Write documents to Chroma in bulk and record their sources, content hashes and sections in the index.
+
+        Documents whose id already exists are handled according to ``policy`` (``NONE`` fails like ``FAIL``).
+        Only documents that were actually written are indexed and counted.
+
+        Returns:
+            Number of written documents
+        """
+        self._ensure_index()
+        try:
+            documents = self._apply_policy(documents, policy)
+            written = self._add_documents(documents, overwrite=policy == DuplicatePolicy.OVERWRITE)
+        except DuplicateDocumentError:
+            raise
+        except Exception:
+            # 部分写入后索引可能与集合不一致，下次使用时重建
+            collection_index.invalidate(self._collection_name)
+            raise
+        collection_index.add(
+            self._collection_name,
+            [
+                (doc.id, (doc.meta or {}).get("source"), doc.content, (doc.meta or {}).get("section"),
+                 (doc.meta or {}).get("title"))
+                for doc in written
+            ]
+        )
+        return len(written)
+
+    def delete_documents(self, document_ids: List[str]) -> None:
+        """
+        Delete documents from Chroma and from the index.
+        """
+        super().delete_documents(document_ids)
+        collection_index.remove(self._collection_name, document_ids)
+
+    def has_source(self, source: str) -> bool:
+        """
+        Check whether any document of this collection was loaded from ``source``.
+
+        Answered from the persisted index, so the cost does not depend on the collection size.
+        """
+        self._ensure_index()
+        return collection_index.has_source(self._collection_name, source)
+
+    def has_content(self, content: str) -> bool:
+        """
+        Check whether a chunk with the same (whitespace-normalized) content is already stored.
+        """
+        self._ensure_index()
+        return collection_index.has_content(self._collection_name, content)
+
+    def get_sources(self) -> Dict[str, int]:
+        """
+        Return the number of stored chunks per source path, answered from the index.
+        """
+        self._ensure_index()
+        return collection_index.get_sources(self._collection_name)
+
+    def get_sections(self, title: Optional[str] = None) -> List[str]:
+        """
+        Return the distinct section paths of the stored chunks, answered from the index.
+
+        With ``title`` only the sections of documents with that title are returned.
+        """
+        self._ensure_index()
+        return collection_index.get_sections(self._collection_name, title=title)
+
+    def delete_source(self, source: str) -> int:
+        """
+        Delete every document that was loaded from ``source``.
+
+        The ids are looked up with a Chroma ``where`` filter on the source metadata.
+
+        Returns:
+            Number of deleted documents
+        """
+        self._ensure_initialized()
+        result = self._collection.get(where={"source": source}, include=[])
+        doc_ids = (result or {}).get("ids") or []
+        if doc_ids:
+            self.delete_documents(doc_ids)
+        return len(doc_ids)
@@ -8,14 +8,36 @@ This module handles the loading and preprocessing of documents from various file
 - HTML files
 """
 
+import bisect
+import codecs
+import multiprocessing
 import os
 import re
-from typing import List, Optional
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Iterator, List, Mapping, Optional, Tuple
 import pypdf
-import markdown
 from haystack import Document
 from bs4 import BeautifulSoup
 
+from .. import config
+from ..logger import get_logger
+from .chunker import section_starts
+from .collection_index import content_hash, hash_file
+from .markdown_text import markdown_to_text
+from .pdf_text_cache import pdf_text_cache
+
+# 获取日志记录器
+logger = get_logger("document_loader")
+
+# 可选的统计编码检测
+try:
+    import charset_normalizer
+    CHARSET_DETECTION_SUPPORT = True
+except ImportError:
+    CHARSET_DETECTION_SUPPORT = False
+
 # 添加docx支持
 try:
     import docx
@@ -25,7 +47,8 @@ except ImportError:
     print("Warning: python-docx package not installed. DOCX file support will be disabled.")
     print("To enable DOCX support, install with: pip install python-docx")
 
-def load_documents(directory_path: str, file_types: Optional[List[str]] = None, specific_files: Optional[List[str]] = None) -> List[Document]:
+def load_documents(directory_path: str, file_types: Optional[List[str]] = None, specific_files: Optional[List[str]] = None,
+                   workers: Optional[int] = None, file_timeout: Optional[float] = None) -> List[Document]:
     """
     Load documents from a directory or from a list of specific files.
     
@@ -35,6 +58,10 @@ def load_documents(directory_path: str, file_types: Optional[List[str]] = None,
                    If None, all supported file types will be loaded
         specific_files: Optional list of specific file paths or filenames to process
                        If provided, only these files will be processed
+        workers: Number of worker processes used to parse files in parallel.
+                 None or 1 parses files one by one in the calling process
+        file_timeout: Maximum number of seconds to spend on a single file. Files that take longer are
+                      counted as failed; enforcing the timeout requires a worker process
     
     Returns:
         List of Haystack Document objects
@@ -51,6 +78,7 @@ def load_documents(directory_path: str, file_types: Optional[List[str]] = None,
     failed_files = 0
     encoding_success = {}
     directories_scanned = set()
+    file_paths = []
     
     # Handle specific files mode
     if specific_files:
@@ -74,38 +102,8 @@ def load_documents(directory_path: str, file_types: Optional[List[str]] = None,
                 print(f"Skipping {file} - unsupported file type {file_ext}")
                 failed_files += 1
                 continue
-                
-            try:
-                # 从文件名中提取标题（去除文件扩展名）
-                filename_without_ext = os.path.splitext(file)[0]
-                
-                if file_ext == 'pdf':
-                    docs = load_pdf(full_path, filename_without_ext)
-                elif file_ext == 'txt':
-                    docs = load_text(full_path, filename_without_ext)
-                elif file_ext == 'md':
-                    docs = load_markdown(full_path, filename_without_ext)
-                elif file_ext in ['html', 'htm']:
-                    docs = load_html(full_path, filename_without_ext)
-                elif file_ext == 'docx':
-                    docs = load_docx(full_path, filename_without_ext)
-                else:
-                    continue
-                
-                if docs:
-                    successful_files += 1
-                    documents.extend(docs)
-                    # Record which encoding succeeded (only for text-based files)
-                    if hasattr(docs[0], 'meta') and 'encoding' in docs[0].meta:
-                        encoding = docs[0].meta['encoding']
-                        encoding_success[encoding] = encoding_success.get(encoding, 0) + 1
-                    print(f"  Loaded {len(docs)} segments from {file}")
-                else:
-                    failed_files += 1
-                    print(f"  No content extracted from {file}")
-            except Exception as e:
-                failed_files += 1
-                print(f"  Error loading {file}: {e}")
+            
+            file_paths.append(full_path)
         
     # Directory scanning mode
     else:
@@ -113,7 +111,7 @@ def load_documents(directory_path: str, file_types: Optional[List[str]] = None,
         print(f"Supported file types: {', '.join(file_types)}")
         print("This loader supports Chinese documents with multiple encodings (UTF-8, GB18030, GBK, GB2312, BIG5)")
         
-        # Count total files first and gather directory information
+        # Gather files and directory information
         for root, _, files in os.walk(directory_path):
             rel_path = os.path.relpath(root, directory_path)
             if rel_path != '.':
@@ -122,8 +120,9 @@ def load_documents(directory_path: str, file_types: Optional[List[str]] = None,
             for file in files:
                 file_ext = os.path.splitext(file)[1].lower().lstrip('.')
                 if file_ext in file_types:
-                    total_files += 1
+                    file_paths.append(os.path.join(root, file))
         
+        total_files = len(file_paths)
         if total_files == 0:
             print(f"No supported files found in {directory_path} or its subdirectories")
             return []
@@ -136,53 +135,24 @@ def load_documents(directory_path: str, file_types: Optional[List[str]] = None,
             print("Subdirectories that will be processed:")
             for subdir in sorted(directories_scanned):
                 print(f"  - {subdir}")
-        
-        # 按照目录层级加载文档
-        for root, _, files in os.walk(directory_path):
-            # 显示当前处理的目录
-            rel_path = os.path.relpath(root, directory_path)
-            dir_display = f"{rel_path}/" if rel_path != '.' else "(root)"
-            
-            # 检查当前目录是否有支持的文件
-            has_supported_files = any(os.path.splitext(file)[1].lower().lstrip('.') in file_types for file in files)
-            if has_supported_files:
-                print(f"\nProcessing directory: {dir_display}")
-            
-            for file in files:
-                file_ext = os.path.splitext(file)[1].lower().lstrip('.')
-                if file_ext in file_types:
-                    file_path = os.path.join(root, file)
-                    try:
-                        # 从文件名中提取标题（去除文件扩展名）
-                        filename_without_ext = os.path.splitext(file)[0]
-                        
-                        if file_ext == 'pdf':
-                            docs = load_pdf(file_path, filename_without_ext)
-                        elif file_ext == 'txt':
-                            docs = load_text(file_path, filename_without_ext)
-                        elif file_ext == 'md':
-                            docs = load_markdown(file_path, filename_without_ext)
-                        elif file_ext in ['html', 'htm']:
-                            docs = load_html(file_path, filename_without_ext)
-                        elif file_ext == 'docx':
-                            docs = load_docx(file_path, filename_without_ext)
-                        else:
-                            continue
-                        
-                        if docs:
-                            successful_files += 1
-                            documents.extend(docs)
-                            # Record which encoding succeeded (only for text-based files)
-                            if hasattr(docs[0], 'meta') and 'encoding' in docs[0].meta:
-                                encoding = docs[0].meta['encoding']
-                                encoding_success[encoding] = encoding_success.get(encoding, 0) + 1
-                            print(f"  Loaded {len(docs)} segments from {file}")
-                        else:
-                            failed_files += 1
-                            print(f"  No content extracted from {file}")
-                    except Exception as e:
-                        failed_files += 1
-                        print(f"  Error loading {file}: {e}")
+    
+    # 逐个文件或在进程池中并行加载，结果按完成顺序返回
+    for file_path, docs, error in iter_load_files(file_paths, workers=workers, file_timeout=file_timeout):
+        file = os.path.basename(file_path)
+        if error:
+            failed_files += 1
+            print(f"  Error loading {file}: {error}")
+        elif docs:
+            successful_files += 1
+            documents.extend(docs)
+            # Record which encoding succeeded (only for text-based files)
+            if hasattr(docs[0], 'meta') and 'encoding' in docs[0].meta:
+                encoding = docs[0].meta['encoding']
+                encoding_success[encoding] = encoding_success.get(encoding, 0) + 1
+            print(f"  Loaded {len(docs)} segments from {file}")
+        else:
+            failed_files += 1
+            print(f"  No content extracted from {file}")
     
     print(f"\nDocument loading summary:")
     print(f"Total files processed: {total_files}")
@@ -197,13 +167,204 @@ def load_documents(directory_path: str, file_types: Optional[List[str]] = None,
     
     return documents
 
-def load_pdf(file_path: str, title: Optional[str] = None) -> List[Document]:
+# 解析进程的启动方式，见iter_load_files
+_POOL_CONTEXT = multiprocessing.get_context("spawn")
+
+def iter_load_files(file_paths: Iterable[str], workers: Optional[int] = None,
+                    file_timeout: Optional[float] = None,
+                    file_hashes: Optional[Mapping[str, str]] = None) -> Iterator[Tuple[str, List[Document], Optional[str]]]:
+    """
+    Load files one by one or in a process pool and yield the results as they complete.
+    
+    file_paths is consumed lazily, one path per free worker, so it may be a generator that
+    decides which files need loading. Worker processes are started with the "spawn" method:
+    callers such as embed_files run in a multithreaded process that holds loaded models,
+    where forking could deadlock.
+    
+    Args:
+        file_paths: Paths of the files to load
+        workers: Number of worker processes. None or 1 loads files in the calling process,
+                 unless file_timeout is set, which always needs a worker process
+        file_timeout: Maximum number of seconds to spend on a single file
+        file_hashes: Content hashes the caller already computed, {file_path: hash}. Looked up
+                     when a file is submitted, so it may be filled while file_paths is consumed
+    
+    Yields:
+        (file_path, documents, error) tuples; error is None when the file was loaded
+    """
+    file_hashes = {} if file_hashes is None else file_hashes
+    if (not workers or workers <= 1) and file_timeout is None:
+        for file_path in file_paths:
+            try:
+                yield file_path, load_file(file_path, file_hashes.get(file_path)), None
+            except Exception as e:
+                yield file_path, [], str(e)
+        return
+    
+    workers = max(1, workers or 1)
+    pending_paths = iter(file_paths)
+    # 进程池重建后需要重新提交的文件
+    resubmit = []
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=_POOL_CONTEXT)
+    # {future: (file_path, deadline)}，在途任务数不超过进程数，提交时间即开始时间
+    running = {}
+    
+    try:
+        while True:
+            while len(running) < workers:
+                file_path = resubmit.pop() if resubmit else next(pending_paths, None)
+                if file_path is None:
+                    break
+                deadline = time.monotonic() + file_timeout if file_timeout else None
+                file_hash = file_hashes.get(file_path)
+                try:
+                    future = executor.submit(load_file, file_path, file_hash)
+                except BrokenProcessPool:
+                    # 工作进程异常退出（如内存不足被终止）后进程池不再可用，重建后重新提交
+                    _terminate_executor(executor)
+                    executor = ProcessPoolExecutor(max_workers=workers, mp_context=_POOL_CONTEXT)
+                    future = executor.submit(load_file, file_path, file_hash)
+                running[future] = (file_path, deadline)
+            if not running:
+                break
+            
+            deadlines = [deadline for _, deadline in running.values() if deadline is not None]
+            wait_timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            done, _ = wait(list(running), timeout=wait_timeout, return_when=FIRST_COMPLETED)
+            
+            for future in done:
+                file_path, _ = running.pop(future)
+                try:
+                    yield file_path, future.result(), None
+                except Exception as e:
+                    yield file_path, [], str(e)
+            
+            # 处理超时的文件：进程池无法取消正在运行的任务，只能终止全部工作进程后重建进程池，
+            # 其余仍在运行的文件重新提交
+            now = time.monotonic()
+            timed_out = [future for future, (_, deadline) in running.items()
+                         if deadline is not None and deadline <= now and not future.done()]
+            if timed_out:
+                for future in timed_out:
+                    file_path, _ = running.pop(future)
+                    yield file_path, [], f"timed out after {file_timeout}s"
+                for future, (file_path, _) in running.items():
+                    resubmit.append(file_path)
+                running.clear()
+                _terminate_executor(executor)
+                executor = ProcessPoolExecutor(max_workers=workers, mp_context=_POOL_CONTEXT)
+    finally:
+        if running:
+            # 调用方提前结束迭代时不再等待尚未完成的文件
+            _terminate_executor(executor)
+        else:
+            executor.shutdown(wait=True)
+
+def _terminate_executor(executor: ProcessPoolExecutor) -> None:
+    """Stop a process pool immediately, killing files that are still being parsed."""
+    processes = list(getattr(executor, "_processes", {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+    for process in processes:
+        process.join()
+
+def load_file(file_path: str, file_hash: Optional[str] = None) -> List[Document]:
+    """
+    Load a single file with the loader matching its extension.
+    
+    Args:
+        file_path: Path to the file
+        file_hash: Content hash of the file if already known, passed to loaders that cache by it
+    
+    Large PDFs are extracted with config.PDF_EXTRACT_WORKERS processes, unless this call
+    already runs in a worker process (e.g. of iter_load_files), where pools are not nested.
+    
+    Returns:
+        List of Document objects, empty if the file type is not supported
+    """
+    file_name = os.path.basename(file_path)
+    file_ext = os.path.splitext(file_name)[1].lower().lstrip('.')
+    loader = FILE_LOADERS.get(file_ext)
+    if loader is None:
+        return []
+    
+    # 从文件名中提取标题（去除文件扩展名）
+    filename_without_ext = os.path.splitext(file_name)[0]
+    if loader is load_pdf:
+        workers = config.PDF_EXTRACT_WORKERS if multiprocessing.parent_process() is None else 1
+        return load_pdf(file_path, filename_without_ext, workers=workers, file_hash=file_hash)
+    return loader(file_path, filename_without_ext)
+
+# 页数达到该值的PDF才在多个进程中并行提取
+PDF_PARALLEL_MIN_PAGES = 32
+
+# 提取文本中可能残留的孤立代理字符，无法编码为UTF-8
+_SURROGATE_RE = re.compile('[\ud800-\udfff]')
+
+def _extract_pdf_page_range(file_path: str, start: int, end: int) -> List[str]:
+    """
+    Extract the text of pages [start, end) of a PDF. Runs in a worker process for large PDFs.
+    
+    Args:
+        file_path: Path to the PDF file
+        start: First page index
+        end: Page index after the last page
+    
+    Returns:
+        Text of each page, empty for pages that could not be extracted
+    """
+    pdf_reader = pypdf.PdfReader(file_path)
+    texts = []
+    for i in range(start, end):
+        try:
+            texts.append(_SURROGATE_RE.sub('', pdf_reader.pages[i].extract_text() or ''))
+        except Exception as page_error:
+            print(f"Error extracting text from page {i+1} in PDF {file_path}: {page_error}")
+            # Continue to the next page even if one fails
+            texts.append('')
+    return texts
+
+def extract_pdf_pages(file_path: str, workers: Optional[int] = None) -> List[str]:
+    """
+    Extract the text of every page of a PDF, spreading large PDFs across worker processes.
+    
+    Args:
+        file_path: Path to the PDF file
+        workers: Number of worker processes. None or 1 extracts in the calling process; PDFs with
+            fewer than PDF_PARALLEL_MIN_PAGES pages are always extracted serially. Workers are
+            started with the "spawn" method, like iter_load_files
+    
+    Returns:
+        Text of each page
+    """
+    page_count = len(pypdf.PdfReader(file_path).pages)
+    workers = min(workers or 1, page_count // (PDF_PARALLEL_MIN_PAGES // 2) or 1)
+    if page_count < PDF_PARALLEL_MIN_PAGES or workers <= 1:
+        return _extract_pdf_page_range(file_path, 0, page_count)
+    
+    # 按连续页码区间分给各进程，每个进程只打开一次PDF
+    step = -(-page_count // workers)
+    ranges = [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+    with ProcessPoolExecutor(max_workers=len(ranges), mp_context=_POOL_CONTEXT) as executor:
+        futures = [executor.submit(_extract_pdf_page_range, file_path, start, end) for start, end in ranges]
+        return [text for future in futures for text in future.result()]
+
+def load_pdf(file_path: str, title: Optional[str] = None, workers: Optional[int] = None,
+             use_cache: bool = True, file_hash: Optional[str] = None) -> List[Document]:
     """
     Load and preprocess PDF documents.
     
+    Extracted page text is cached by file content hash, so re-chunking or re-embedding
+    the same PDF does not parse it again.
+    
     Args:
         file_path: Path to the PDF file
         title: Document title (typically from filename)
+        workers: Number of processes used to extract large PDFs, see extract_pdf_pages
+        use_cache: Whether to read and write the extracted-text cache
+        file_hash: Content hash of the file if the caller already computed it, saves reading it again
     
     Returns:
         List of Document objects
@@ -211,37 +372,154 @@ def load_pdf(file_path: str, title: Optional[str] = None) -> List[Document]:
     documents = []
     
     try:
-        pdf_reader = pypdf.PdfReader(file_path)
-        for i, page in enumerate(pdf_reader.pages):
-            try:
-                text = page.extract_text()
-                if text.strip():  # Skip empty pages
-                    # Sometimes PDF text extraction may introduce encoding issues
-                    # Try to clean the text
-                    try:
-                        # Handle potential encoding issues by decoding and re-encoding
-                        text = text.encode('utf-8', errors='ignore').decode('utf-8')
-                    except:
-                        pass  # Use original text if re-encoding fails
-                    
-                    doc = Document(
-                        content=text,
-                        meta={
-                            "source": file_path,
-                            "page": i + 1,
-                            "file_type": "pdf",
-                            "title": title
-                        }
-                    )
-                    documents.append(doc)
-            except Exception as page_error:
-                print(f"Error extracting text from page {i+1} in PDF {file_path}: {page_error}")
-                # Continue to the next page even if one fails
+        pages = None
+        if use_cache:
+            file_hash = file_hash or hash_file(file_path)
+            pages = pdf_text_cache.get(file_hash)
+        if pages is None:
+            pages = extract_pdf_pages(file_path, workers)
+            if use_cache:
+                pdf_text_cache.put(file_hash, pages)
+        
+        for i, text in enumerate(pages):
+            if text.strip():  # Skip empty pages
+                doc = Document(
+                    content=text,
+                    meta={
+                        "source": file_path,
+                        "page": i + 1,
+                        "file_type": "pdf",
+                        "title": title
+                    }
+                )
+                documents.append(doc)
     except Exception as e:
         print(f"Error processing PDF {file_path}: {e}")
     
     return documents
 
+# 编码检测只读取文件开头的有限字节
+ENCODING_SNIFF_BYTES = 64 * 1024
+
+# 字节顺序标记及对应编码，较长的标记需要先匹配
+_BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+_META_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([A-Za-z0-9_\-]+)', re.IGNORECASE)
+
+# GB2312和GBK都是GB18030的子集，统一使用GB18030解码
+_GB_FAMILY = {'gb2312', 'gbk', 'gb18030'}
+
+# 每个目录最近一次检测到的编码: {目录: 编码}，同目录的文件通常使用相同编码
+_directory_encoding_hints = {}
+
+def _normalize_encoding(encoding: Optional[str]) -> Optional[str]:
+    """Map an encoding label to a Python codec name, folding the GB family into gb18030."""
+    if not encoding:
+        return None
+    try:
+        name = codecs.lookup(encoding.strip()).name
+    except LookupError:
+        return None
+    return 'gb18030' if name in _GB_FAMILY else name
+
+def _decodes(data: bytes, encoding: str) -> bool:
+    """Check whether a byte prefix decodes cleanly, tolerating a character cut at the end."""
+    try:
+        codecs.getincrementaldecoder(encoding)().decode(data, final=False)
+        return True
+    except (UnicodeDecodeError, LookupError):
+        return False
+
+def detect_encoding(raw: bytes, hint: Optional[str] = None, is_html: bool = False) -> str:
+    """
+    Guess the encoding of a file from a bounded prefix of its bytes.
+    
+    The BOM wins, then an HTML <meta charset> declaration, then strict UTF-8 validation,
+    then the encoding previously detected for sibling files, then a statistical detector.
+    
+    Args:
+        raw: File contents (only the first ENCODING_SNIFF_BYTES are inspected)
+        hint: Encoding detected for another file in the same directory
+        is_html: Whether to look for an HTML <meta charset> declaration
+    
+    Returns:
+        Python codec name
+    """
+    for bom, encoding in _BOMS:
+        if raw.startswith(bom):
+            return encoding
+    
+    prefix = raw[:ENCODING_SNIFF_BYTES]
+    
+    if is_html:
+        match = _META_CHARSET_RE.search(prefix[:4096])
+        declared = _normalize_encoding(match.group(1).decode('ascii', errors='ignore')) if match else None
+        if declared and _decodes(prefix, declared):
+            return declared
+    
+    # UTF-8的严格校验非常可靠，优先于目录提示（GB18030几乎能解码任何字节序列）
+    if _decodes(prefix, 'utf-8'):
+        return 'utf-8'
+    
+    if hint and hint != 'utf-8' and _decodes(prefix, hint):
+        return hint
+    
+    if CHARSET_DETECTION_SUPPORT:
+        best = charset_normalizer.from_bytes(prefix).best()
+        detected = _normalize_encoding(best.encoding) if best else None
+        if detected and _decodes(prefix, detected):
+            return detected
+    
+    for encoding in ('gb18030', 'big5'):
+        if _decodes(prefix, encoding):
+            return encoding
+    return 'utf-8'
+
+def read_text_file(file_path: str, is_html: bool = False) -> Tuple[str, str]:
+    """
+    Read a text file once and decode it with the detected encoding.
+    
+    Args:
+        file_path: Path to the file
+        is_html: Whether the file is HTML (enables <meta charset> detection)
+    
+    Returns:
+        (text, encoding) tuple
+    
+    Raises:
+        UnicodeDecodeError: If the file cannot be decoded with any supported encoding
+    """
+    with open(file_path, 'rb') as file:
+        raw = file.read()
+    
+    directory = os.path.dirname(os.path.abspath(file_path))
+    encoding = detect_encoding(raw, hint=_directory_encoding_hints.get(directory), is_html=is_html)
+    
+    try:
+        text = raw.decode(encoding)
+    except UnicodeDecodeError:
+        # 前缀检测通过但后文解码失败时，再尝试其余候选编码
+        for fallback in ('utf-8', 'gb18030', 'big5'):
+            if fallback == encoding:
+                continue
+            try:
+                text = raw.decode(fallback)
+                encoding = fallback
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            raise
+    
+    _directory_encoding_hints[directory] = encoding
+    return text, encoding
+
 def load_text(file_path: str, title: Optional[str] = None) -> List[Document]:
     """
     Load and preprocess text documents.
@@ -253,33 +531,25 @@ def load_text(file_path: str, title: Optional[str] = None) -> List[Document]:
     Returns:
         List of Document objects
     """
-    # Try different encodings for Chinese text files
-    encodings = ['utf-8', 'gb18030', 'gbk', 'gb2312', 'big5']
-    
-    for encoding in encodings:
-        try:
-            with open(file_path, 'r', encoding=encoding) as file:
-                text = file.read()
-            
-            doc = Document(
-                content=text,
-                meta={
-                    "source": file_path,
-                    "file_type": "txt",
-                    "encoding": encoding,
-                    "title": title
-                }
-            )
-            return [doc]
-        except UnicodeDecodeError:
-            # Try next encoding
-            continue
-        except Exception as e:
-            print(f"Error processing text file {file_path}: {e}")
-            return []
+    try:
+        text, encoding = read_text_file(file_path)
+    except UnicodeDecodeError:
+        print(f"Error processing text file {file_path}: Unable to decode with any supported encoding")
+        return []
+    except Exception as e:
+        print(f"Error processing text file {file_path}: {e}")
+        return []
     
-    print(f"Error processing text file {file_path}: Unable to decode with any supported encoding")
-    return []
+    doc = Document(
+        content=text,
+        meta={
+            "source": file_path,
+            "file_type": "txt",
+            "encoding": encoding,
+            "title": title
+        }
+    )
+    return [doc]
 
 def load_markdown(file_path: str, title: Optional[str] = None) -> List[Document]:
     """
@@ -292,37 +562,28 @@ def load_markdown(file_path: str, title: Optional[str] = None) -> List[Document]
     Returns:
         List of Document objects
     """
-    # Try different encodings for Chinese text files
-    encodings = ['utf-8', 'gb18030', 'gbk', 'gb2312', 'big5']
-    
-    for encoding in encodings:
-        try:
-            with open(file_path, 'r', encoding=encoding) as file:
-                md_text = file.read()
-            
-            # Convert Markdown to HTML then strip HTML tags to get plain text
-            html = markdown.markdown(md_text)
-            text = re.sub('<[^<]+?>', '', html)
-            
-            doc = Document(
-                content=text,
-                meta={
-                    "source": file_path,
-                    "file_type": "md",
-                    "encoding": encoding,
-                    "title": title
-                }
-            )
-            return [doc]
-        except UnicodeDecodeError:
-            # Try next encoding
-            continue
-        except Exception as e:
-            print(f"Error processing Markdown file {file_path}: {e}")
-            return []
+    try:
+        md_text, encoding = read_text_file(file_path)
+        
+        # Parse Markdown line by line straight to plain text, keeping headings as "# title" lines
+        text = markdown_to_text(md_text)
+    except UnicodeDecodeError:
+        print(f"Error processing Markdown file {file_path}: Unable to decode with any supported encoding")
+        return []
+    except Exception as e:
+        print(f"Error processing Markdown file {file_path}: {e}")
+        return []
     
-    print(f"Error processing Markdown file {file_path}: Unable to decode with any supported encoding")
-    return []
+    doc = Document(
+        content=text,
+        meta={
+            "source": file_path,
+            "file_type": "md",
+            "encoding": encoding,
+            "title": title
+        }
+    )
+    return [doc]
 
 def load_html(file_path: str, title: Optional[str] = None) -> List[Document]:
     """
@@ -335,51 +596,45 @@ def load_html(file_path: str, title: Optional[str] = None) -> List[Document]:
     Returns:
         List of Document objects
     """
-    # Try different encodings for Chinese HTML files
-    encodings = ['utf-8', 'gb18030', 'gbk', 'gb2312', 'big5']
+    try:
+        html_content, encoding = read_text_file(file_path, is_html=True)
+        
+        # Parse HTML and extract text
+        soup = BeautifulSoup(html_content, 'html.parser')
+        
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.extract()
+        
+        # Get text
+        text = soup.get_text(separator=' ', strip=True)
+        
+        # Clean up whitespace
+        text = re.sub(r'\s+', ' ', text).strip()
+    except UnicodeDecodeError:
+        print(f"Error processing HTML file {file_path}: Unable to decode with any supported encoding")
+        return []
+    except Exception as e:
+        print(f"Error processing HTML file {file_path}: {e}")
+        return []
     
-    for encoding in encodings:
-        try:
-            with open(file_path, 'r', encoding=encoding) as file:
-                html_content = file.read()
-            
-            # Parse HTML and extract text
-            soup = BeautifulSoup(html_content, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.extract()
-            
-            # Get text
-            text = soup.get_text(separator=' ', strip=True)
-            
-            # Clean up whitespace
-            text = re.sub(r'\s+', ' ', text).strip()
-            
-            if text:
-                # 首选<title>标签中的标题，其次是传入的文件名标题
-                html_title = soup.title.string if soup.title else None
-                doc_title = html_title or title
-                
-                doc = Document(
-                    content=text,
-                    meta={
-                        "source": file_path,
-                        "file_type": "html",
-                        "encoding": encoding,
-                        "title": doc_title
-                    }
-                )
-                return [doc]
-        except UnicodeDecodeError:
-            # Try next encoding
-            continue
-        except Exception as e:
-            print(f"Error processing HTML file {file_path}: {e}")
-            return []
+    if not text:
+        return []
     
-    print(f"Error processing HTML file {file_path}: Unable to decode with any supported encoding")
-    return []
+    # 首选<title>标签中的标题，其次是传入的文件名标题
+    html_title = soup.title.string if soup.title else None
+    doc_title = html_title or title
+    
+    doc = Document(
+        content=text,
+        meta={
+            "source": file_path,
+            "file_type": "html",
+            "encoding": encoding,
+            "title": doc_title
+        }
+    )
+    return [doc]
 
 def load_docx(file_path: str, title: Optional[str] = None) -> List[Document]:
     """
@@ -432,6 +687,16 @@ def load_docx(file_path: str, title: Optional[str] = None) -> List[Document]:
     
     return documents
 
+# 文件扩展名到加载函数的映射
+FILE_LOADERS = {
+    'pdf': load_pdf,
+    'txt': load_text,
+    'md': load_markdown,
+    'html': load_html,
+    'htm': load_html,
+    'docx': load_docx,
+}
+
 def chunk_documents(documents: List[Document], chunk_size: int = 1000, chunk_overlap: int = 200) -> List[Document]:
     """
     Split documents into smaller chunks for better processing.
@@ -454,6 +719,9 @@ def chunk_documents(documents: List[Document], chunk_size: int = 1000, chunk_ove
             chunked_documents.append(doc)
             continue
         
+        # Heading offsets, used to record the section each chunk starts in
+        heading_offsets, heading_paths = section_starts(text)
+        
         # Split into chunks
         start = 0
         chunk_id = 0
@@ -478,6 +746,9 @@ def chunk_documents(documents: List[Document], chunk_size: int = 1000, chunk_ove
                 chunk_meta["chunk_id"] = chunk_id
                 chunk_meta["chunk_size"] = chunk_size
                 chunk_meta["chunk_overlap"] = chunk_overlap
+                section_index = bisect.bisect_right(heading_offsets, start) - 1
+                if section_index >= 0:
+                    chunk_meta["section"] = heading_paths[section_index]
                 chunked_doc = Document(
                     content=chunk_text,
                     meta=chunk_meta
@@ -492,63 +763,74 @@ def chunk_documents(documents: List[Document], chunk_size: int = 1000, chunk_ove
 
 def is_duplicate_document(document: Document, document_store, threshold: float = 0.95) -> bool:
     """
-    Check if a document already exists in the document store by comparing source metadata.
+    Check if a document already exists in the document store.
+    
+    A document is a duplicate if another document with the same 'source' metadata is already
+    stored. Stores with a source/content-hash index answer this in constant time; other stores
+    fall back to a Chroma ``where`` lookup or a metadata filter. Chunks whose content is already
+    stored are removed separately by drop_duplicate_chunks, so that a file sharing boilerplate
+    (a journal header, licence text) with another file is still embedded.
     
     Args:
         document: Document to check
         document_store: Haystack document store
-        threshold: Similarity threshold for considering a document as duplicate
+        threshold: Kept for backwards compatibility, not used
     
     Returns:
         True if the document appears to be a duplicate, False otherwise
     """
-    # First check: If the document has 'source' in meta, look for exact source match
-    if document.meta and "source" in document.meta:
-        source = document.meta["source"]
-        
-        print(f"Checking if document with source '{source}' already exists...")
-        
+    source = document.meta.get("source") if document.meta else None
+    if not source:
+        return False
+    
+    try:
+        # 使用来源/内容哈希索引进行常数时间查询
+        if hasattr(document_store, "has_source"):
+            duplicate = document_store.has_source(source)
+        # 没有索引时，把source条件下推给Chroma的where查询
+        elif hasattr(document_store, "has_meta_value"):
+            duplicate = document_store.has_meta_value("source", source)
+        else:
+            duplicate = bool(document_store.filter_documents(
+                filters={"field": "meta.source", "operator": "==", "value": source}
+            ))
+        if duplicate:
+            print(f"DUPLICATE DETECTED: Document with source '{source}' already exists")
+        return duplicate
+    except Exception as e:
+        print(f"Error checking for duplicates: {e}")
+        return False
+
+def drop_duplicate_chunks(documents: List[Document], document_store) -> List[Document]:
+    """
+    Remove chunks whose (whitespace-normalized) content is already stored or appears earlier in ``documents``.
+    
+    Only the duplicate chunks are removed; the remaining chunks of the same file are kept.
+    Stores without a content-hash index only deduplicate within ``documents``.
+    
+    Args:
+        documents: Chunks to check
+        document_store: Haystack document store
+    
+    Returns:
+        The chunks that are not duplicates, in their original order
+    """
+    check_store = hasattr(document_store, "has_content")
+    seen = set()
+    kept = []
+    for document in documents:
+        if not document.content:
+            kept.append(document)
+            continue
+        content_key = content_hash(document.content)
+        if content_key in seen:
+            continue
+        seen.add(content_key)
         try:
-            # 直接在文档的元数据中查找匹配的 source
-            # 注意：不同的文档存储实现查询方式可能不同
-            # 这里先尝试特定的查询方式
-            if hasattr(document_store, "_collection"):
-                # ChromaDocumentStore特定的查询方式
-                print("使用ChromaDocumentStore特定的查询方式...")
-                try:
-                    # 获取文档内容，包括元数据
-                    result = document_store._collection.get(include=["metadatas"])
-                    
-                    if result and "metadatas" in result and result["metadatas"]:
-                        metadatas = result["metadatas"]
-                        print(f"Found {len(metadatas)} documents with metadata")
-                        
-                        for meta in metadatas:
-                            if meta and "source" in meta and meta["source"] == source:
-                                print(f"DUPLICATE DETECTED: Document with source '{source}' already exists")
-                                return True
-                        
-                        # 打印一些元数据样本以帮助调试
-                        if metadatas and len(metadatas) > 0:
-                            print(f"Sample metadata: {metadatas[0]}")
-                    else:
-                        print("No documents with metadata found in the collection")
-                except Exception as e:
-                    print(f"Error accessing ChromaDB collection directly: {e}")
-            
-            # 标准方式：使用过滤器
-            all_docs = document_store.filter_documents({})
-            print(f"Standard query found {len(all_docs)} documents")
-            
-            for existing_doc in all_docs:
-                if existing_doc.meta and "source" in existing_doc.meta:
-                    existing_source = existing_doc.meta["source"]
-                    print(f"Comparing with existing source: '{existing_source}'")
-                    if existing_source == source:
-                        print(f"DUPLICATE DETECTED: Document with source '{source}' already exists in the document store")
-                        return True
+            if check_store and document_store.has_content(document.content):
+                continue
         except Exception as e:
-            print(f"Error checking for duplicates: {e}")
-    
-    print("No duplicate detected based on source metadata")
-    return False 
\ No newline at end of file
+            # 查询失败时保留该片段，宁可重复写入也不丢失内容
+            logger.warning(f"检查重复片段时出错，保留该片段: {e}")
+        kept.append(document)
+    return kept
@@ -0,0 +1,201 @@
+"""
+Document Writer Module
+
+在后台线程中把已嵌入的文档写入Chroma，使下一个微批次的嵌入与上一个微批次的持久化重叠进行。
+写入线程合并队列中已有的文档，批次大小自适应：不超过Chroma允许的最大批次，
+也不超过按内容、元数据和向量估算的字节预算。
+"""
+
+import json
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from haystack import Document
+from haystack.document_stores.types import DuplicatePolicy
+
+from ..logger import get_logger
+
+# 获取日志记录器
+logger = get_logger("document_writer")
+
+# 单个写入批次的默认字节预算
+DEFAULT_MAX_BATCH_BYTES = 64 * 1024 * 1024
+
+# 无法从Chroma获取最大批次时使用的默认值
+DEFAULT_MAX_BATCH_SIZE = 1000
+
+
+def estimate_document_bytes(doc: Document) -> int:
+    """
+    估算文档写入Chroma时占用的字节数（内容、元数据和float32向量）
+
+    Args:
+        doc: Document对象
+
+    Returns:
+        估算的字节数
+    """
+    size = len((doc.content or "").encode("utf-8")) + len(doc.id or "")
+    if doc.meta:
+        size += len(json.dumps(doc.meta, ensure_ascii=False, default=str).encode("utf-8"))
+    if doc.embedding is not None:
+        size += 4 * len(doc.embedding)
+    return size
+
+
+def iter_write_batches(documents: Sequence[Document], max_batch_size: int,
+                       max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES) -> Iterator[Tuple[List[Document], int]]:
+    """
+    把文档切分为同时满足数量上限和字节预算的批次
+
+    Args:
+        documents: 文档列表
+        max_batch_size: 每批最多的文档数量
+        max_batch_bytes: 每批的字节预算，单个文档超出预算时单独成批
+
+    Yields:
+        (文档批次, 估算的字节数)
+    """
+    batch, batch_bytes = [], 0
+    for doc in documents:
+        doc_bytes = estimate_document_bytes(doc)
+        if batch and (len(batch) >= max_batch_size or batch_bytes + doc_bytes > max_batch_bytes):
+            yield batch, batch_bytes
+            batch, batch_bytes = [], 0
+        batch.append(doc)
+        batch_bytes += doc_bytes
+    if batch:
+        yield batch, batch_bytes
+
+
+def store_max_batch_size(document_store) -> int:
+    """获取文档存储允许的最大写入批次"""
+    getter = getattr(document_store, "max_batch_size", None)
+    if callable(getter):
+        try:
+            return max(1, int(getter()))
+        except Exception as e:
+            logger.warning(f"无法获取最大写入批次，使用默认值 {DEFAULT_MAX_BATCH_SIZE}: {str(e)}")
+    return DEFAULT_MAX_BATCH_SIZE
+
+
+class DocumentWriter:
+    """
+    后台Chroma写入线程
+
+    用法:
+        writer = DocumentWriter(document_store)
+        writer.start()
+        writer.submit(documents, on_written=callback)
+        stats = writer.close()
+    """
+
+    def __init__(self, document_store, max_batch_size: Optional[int] = None,
+                 max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES, queue_size: int = 4):
+        """
+        初始化写入器
+
+        Args:
+            document_store: 文档存储
+            max_batch_size: 每批最多的文档数量，None时使用Chroma允许的最大批次
+            max_batch_bytes: 每批的字节预算
+            queue_size: 等待写入的提交数量上限，队列满时submit阻塞以限制内存占用
+        """
+        self.document_store = document_store
+        self.max_batch_size = max_batch_size or store_max_batch_size(document_store)
+        self.max_batch_bytes = max_batch_bytes
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+        self._done_marker = object()
+        self._stats = {"documents": 0, "batches": 0, "bytes": 0, "seconds": 0.0}
+
+    def start(self) -> "DocumentWriter":
+        """启动写入线程"""
+        self._thread = threading.Thread(target=self._run, name="chroma-writer", daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, documents: List[Document], on_written: Optional[Callable[[int], None]] = None) -> None:
+        """
+        提交一组文档，写入完成后在写入线程中调用on_written(文档数量)
+
+        Args:
+            documents: 已嵌入的文档列表，可以为空（只用于在之前的提交写入后触发回调）
+            on_written: 可选的回调
+
+        Raises:
+            RuntimeError: 写入线程已经出错
+        """
+        self._raise_error()
+        self._queue.put((documents, on_written))
+
+    def close(self) -> Dict[str, Any]:
+        """
+        等待队列中的文档全部写入并结束写入线程
+
+        Returns:
+            写入统计，包括文档数、批次数、字节数、耗时和吞吐量
+
+        Raises:
+            RuntimeError: 写入过程中出错
+        """
+        if self._thread is not None:
+            self._queue.put(self._done_marker)
+            self._thread.join()
+            self._thread = None
+        self._raise_error()
+        return self.stats()
+
+    def stats(self) -> Dict[str, Any]:
+        """获取当前的写入统计"""
+        stats = dict(self._stats)
+        seconds = stats["seconds"]
+        stats["seconds"] = round(seconds, 3)
+        stats["docs_per_second"] = round(stats["documents"] / seconds, 1) if seconds > 0 else 0.0
+        stats["mb_per_second"] = round(stats["bytes"] / seconds / (1024 * 1024), 2) if seconds > 0 else 0.0
+        return stats
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"写入文档时出错: {self._error}") from self._error
+
+    def _run(self) -> None:
+        finished = False
+        while not finished:
+            # 阻塞等待第一项，然后合并队列中已有的项，批次随写入速度自动变大
+            items = [self._queue.get()]
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if items[-1] is self._done_marker:
+                items.pop()
+                finished = True
+
+            if self._error is not None:
+                # 出错后丢弃剩余的提交，只需让submit和close尽快返回
+                continue
+            try:
+                self._write_items(items)
+            except BaseException as e:
+                logger.error(f"写入文档时出错: {str(e)}", exc_info=True)
+                self._error = e
+
+    def _write_items(self, items) -> None:
+        documents = [doc for docs, _ in items for doc in docs]
+        for batch, batch_bytes in iter_write_batches(documents, self.max_batch_size, self.max_batch_bytes):
+            started = time.perf_counter()
+            # 与Chroma的add一致，跳过ID已存在的文档（相同内容和元数据的片段）
+            written = self.document_store.write_documents(batch, policy=DuplicatePolicy.SKIP)
+            self._stats["seconds"] += time.perf_counter() - started
+            self._stats["documents"] += written
+            self._stats["batches"] += 1
+            self._stats["bytes"] += batch_bytes
+        # 合并的所有文档都已写入后再按提交顺序调用回调
+        for docs, on_written in items:
+            if on_written:
+                on_written(len(docs))
@@ -0,0 +1,225 @@
+"""
+Embedding Cache Module
+
+提供按内容寻址的持久化嵌入缓存。键为(嵌入模型, 规范化后的文本哈希)，
+向量按模型追加存储在float32矩阵文件中并通过内存映射读取，行号索引保存在SQLite中。
+同一文件重新嵌入到其他集合或以相同参数重新切片时，只需读取磁盘而无需再次推理。
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .. import config
+from ..logger import get_logger
+from .collection_index import content_hash
+
+# 获取日志记录器
+logger = get_logger("embedding_cache")
+
+
+class EmbeddingCache:
+    """持久化嵌入缓存，矩阵文件存储向量，SQLite存储(模型, 文本哈希) -> 行号索引"""
+
+    def __init__(self, cache_dir: str):
+        """
+        初始化嵌入缓存，数据库在首次使用时才打开
+
+        Args:
+            cache_dir: 缓存目录
+        """
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, "index.sqlite3")
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        """计算规范化文本的SHA-256哈希，与集合索引中的片段内容哈希使用同一算法"""
+        return content_hash(text)
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开（必要时创建）SQLite索引，调用方需持有锁"""
+        if self._conn is None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            conn = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS models ("
+                "model TEXT PRIMARY KEY, dim INTEGER NOT NULL, file TEXT NOT NULL, rows INTEGER NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text_hash TEXT NOT NULL, row INTEGER NOT NULL, "
+                "PRIMARY KEY (model, text_hash)) WITHOUT ROWID"
+            )
+            self._conn = conn
+        return self._conn
+
+    def _matrix_path(self, file_name: str) -> str:
+        return os.path.join(self.cache_dir, file_name)
+
+    def get_many(self, model: str, hashes: Sequence[str]) -> Dict[str, List[float]]:
+        """
+        批量查询缓存
+
+        Args:
+            model: 模型键
+            hashes: 文本哈希列表
+
+        Returns:
+            {文本哈希: 嵌入向量}，只包含命中的条目
+        """
+        if not hashes:
+            return {}
+        with self._lock:
+            conn = self._connect()
+            model_row = conn.execute("SELECT dim, file, rows FROM models WHERE model = ?", (model,)).fetchone()
+            if model_row is None:
+                return {}
+            dim, file_name, total_rows = model_row
+
+            rows: Dict[str, int] = {}
+            unique_hashes = list(dict.fromkeys(hashes))
+            # SQLite单条语句的参数数量有限，分批查询
+            for start in range(0, len(unique_hashes), 500):
+                batch = unique_hashes[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                for text_hash, row in conn.execute(
+                    f"SELECT text_hash, row FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                    (model, *batch)
+                ):
+                    rows[text_hash] = row
+
+        if not rows:
+            return {}
+
+        matrix_path = self._matrix_path(file_name)
+        try:
+            matrix = np.memmap(matrix_path, dtype=np.float32, mode="r", shape=(total_rows, dim))
+        except (OSError, ValueError) as e:
+            logger.warning(f"无法读取嵌入缓存矩阵 {matrix_path}: {str(e)}")
+            return {}
+        return {text_hash: matrix[row].tolist() for text_hash, row in rows.items() if row < total_rows}
+
+    def put_many(self, model: str, items: Sequence[Tuple[str, Sequence[float]]]) -> int:
+        """
+        批量写入缓存，已存在的哈希会被跳过
+
+        Args:
+            model: 模型键
+            items: (文本哈希, 嵌入向量)列表
+
+        Returns:
+            新写入的条目数
+        """
+        if not items:
+            return 0
+        with self._lock:
+            conn = self._connect()
+            # IMMEDIATE事务在多个进程之间串行化追加写入
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                model_row = conn.execute("SELECT dim, file, rows FROM models WHERE model = ?", (model,)).fetchone()
+                if model_row is None:
+                    dim = len(items[0][1])
+                    file_name = hashlib.sha1(model.encode("utf-8")).hexdigest()[:16] + f"_{dim}.f32"
+                    total_rows = 0
+                    conn.execute("INSERT INTO models (model, dim, file, rows) VALUES (?, ?, ?, 0)",
+                                 (model, dim, file_name))
+                else:
+                    dim, file_name, total_rows = model_row
+
+                existing = set()
+                hashes = list(dict.fromkeys(text_hash for text_hash, _ in items))
+                for start in range(0, len(hashes), 500):
+                    batch = hashes[start:start + 500]
+                    placeholders = ",".join("?" * len(batch))
+                    existing.update(row[0] for row in conn.execute(
+                        f"SELECT text_hash FROM embeddings WHERE model = ? AND text_hash IN ({placeholders})",
+                        (model, *batch)
+                    ))
+
+                new_items = []
+                seen = set(existing)
+                for text_hash, embedding in items:
+                    if text_hash in seen or len(embedding) != dim:
+                        continue
+                    seen.add(text_hash)
+                    new_items.append((text_hash, embedding))
+
+                if not new_items:
+                    conn.execute("COMMIT")
+                    return 0
+
+                vectors = np.asarray([embedding for _, embedding in new_items], dtype=np.float32)
+                # 按行号定位写入，即使上次写入中断留下了多余字节也不会错位
+                fd = os.open(self._matrix_path(file_name), os.O_RDWR | os.O_CREAT, 0o644)
+                with os.fdopen(fd, "r+b") as f:
+                    f.truncate(total_rows * dim * 4)
+                    f.seek(total_rows * dim * 4)
+                    f.write(vectors.tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                conn.executemany(
+                    "INSERT INTO embeddings (model, text_hash, row) VALUES (?, ?, ?)",
+                    [(model, text_hash, total_rows + i) for i, (text_hash, _) in enumerate(new_items)]
+                )
+                conn.execute("UPDATE models SET rows = ? WHERE model = ?", (total_rows + len(new_items), model))
+                conn.execute("COMMIT")
+                return len(new_items)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def stats(self) -> List[Dict[str, object]]:
+        """
+        获取各模型的缓存统计
+
+        Returns:
+            模型名称、维度和条目数列表
+        """
+        with self._lock:
+            conn = self._connect()
+            return [
+                {"model": model, "dim": dim, "entries": rows}
+                for model, dim, rows in conn.execute("SELECT model, dim, rows FROM models ORDER BY model")
+            ]
+
+    def clear(self, model: Optional[str] = None) -> None:
+        """
+        清空缓存
+
+        Args:
+            model: 只清空指定模型的缓存，None表示全部清空
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if model is None:
+                    files = [row[0] for row in conn.execute("SELECT file FROM models")]
+                    conn.execute("DELETE FROM embeddings")
+                    conn.execute("DELETE FROM models")
+                else:
+                    files = [row[0] for row in conn.execute("SELECT file FROM models WHERE model = ?", (model,))]
+                    conn.execute("DELETE FROM embeddings WHERE model = ?", (model,))
+                    conn.execute("DELETE FROM models WHERE model = ?", (model,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            for file_name in files:
+                try:
+                    os.remove(self._matrix_path(file_name))
+                except FileNotFoundError:
+                    pass
+
+
+# 创建全局嵌入缓存实例
+embedding_cache = EmbeddingCache(config.EMBEDDING_CACHE_PATH)
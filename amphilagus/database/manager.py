@@ -3,9 +3,11 @@ Database management module for interacting with ChromaDB vector database.
 """
 import os
 import json
+import queue
 import sys
+import threading
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Set, Union, Tuple
+from typing import List, Dict, Any, Optional, Set, Union, Tuple, Callable, Iterable
 
 # 导入ChromaDB相关
 import chromadb
@@ -13,9 +15,17 @@ import chromadb
 # 导入rag_assistant的相关模块
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from .collection_metadata import list_collections, get_collection_metadata, delete_collection_metadata
-from .document_loader import load_documents, chunk_documents
+from .document_loader import FILE_LOADERS, iter_load_files, chunk_documents, is_duplicate_document, drop_duplicate_chunks
 from ..pipeline.basic import RAGPipeline
 from .custom_document_store import CustomChromaDocumentStore
+from .collection_index import collection_index, hash_file
+from .chunker import CHUNKERS, TokenChunker
+from .document_writer import DocumentWriter
+from .. import config
+from ..logger import get_logger
+
+# 获取日志记录器
+logger = get_logger("database_manager")
 
 
 class DatabaseManager:
@@ -200,8 +210,9 @@ class DatabaseManager:
                 # 删除ChromaDB中的collection
                 self.client.delete_collection(collection_name)
                 
-                # 删除元数据
+                # 删除元数据和来源索引
                 delete_collection_metadata(collection_name)
+                collection_index.drop(collection_name)
                 
                 return True, f"Collection '{collection_name}' 已成功删除"
             else:
@@ -480,8 +491,9 @@ class DatabaseManager:
             if not result["ids"]:
                 return False, f"未找到ID为{document_id}的文档"
                 
-            # 删除文档
+            # 删除文档并同步来源索引
             chroma_collection.delete(ids=[document_id])
+            collection_index.remove(collection_name, [document_id])
             
             return True, f"成功删除文档 {document_id}"
             
@@ -490,26 +502,68 @@ class DatabaseManager:
 
     def embed_files(self, collection_name: str, file_paths: List[str], 
                     chunk_size: int = 1000, chunk_overlap: int = 200,
-                    check_duplicates: bool = True) -> Tuple[bool, str, Dict[str, Any]]:
+                    check_duplicates: bool = True,
+                    use_embedding_cache: bool = True,
+                    batch_size: int = 64,
+                    queue_size: int = 4,
+                    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                    incremental: bool = True,
+                    chunker: str = "character",
+                    checkpoint_callback: Optional[Callable[[List[str], List[str]], None]] = None,
+                    replace_sources: Optional[Iterable[str]] = None,
+                    should_stop: Optional[Callable[[], bool]] = None,
+                    load_workers: Optional[int] = None,
+                    file_timeout: Optional[float] = None) -> Tuple[bool, str, Dict[str, Any]]:
         """
-        将文件嵌入到向量数据库中
+        以流式方式将文件嵌入到向量数据库中
         
         步骤:
         1. 检查pipeline是否已初始化
-        2. 使用rag_assistant的load_documents方法把files转化为haystack的document
-        3. 使用rag_assistant的chunk_documents切片
-        4. 使用rag_pipeline.add_documents嵌入
+        2. 后台加载线程通过iter_load_files在进程池中并行解析文件（单个文件超时则记为出错），
+           切片后通过有界队列交给嵌入阶段
+        3. 嵌入阶段把切片组成batch_size大小的微批次，调用rag_pipeline.embed_documents嵌入
+           （先查询持久化嵌入缓存）
+        4. 后台写入线程把已嵌入的微批次合并为大批次写入Chroma
+        
+        加载、嵌入和写入并行进行，内存占用只取决于队列长度和微批次大小，
+        已写入的片段在任务仍在运行时即可被检索。结果统计中的write包含写入吞吐量。
+        
+        增量模式下为每个源文件记录(路径, 修改时间, 大小, 内容哈希)。修改时间和大小未变、
+        或内容哈希未变的文件直接跳过；内容变化的文件先删除旧片段再重新嵌入。
+        集合中已有片段但还没有版本记录的文件（启用增量嵌入之前写入的文件）按磁盘上的文件
+        补记版本并视为未变化（结果统计中的seeded），不会被删除后重新嵌入。
+        
+        chunker为"token"时使用嵌入模型的分词器按词元数切片（chunk_size和chunk_overlap以词元计，
+        且不超过模型的最大输入长度），在句子边界处切分并记录章节路径和字符偏移。
         
         Args:
             collection_name: 集合名称
             file_paths: 文件路径列表
             chunk_size: 文档切片大小
             chunk_overlap: 切片重叠大小
-            check_duplicates: 是否检查重复文档
+            check_duplicates: 是否检查重复文档：跳过集合中已有来源的文件，并丢弃内容已存在的片段
+            use_embedding_cache: 是否复用持久化嵌入缓存中的嵌入
+            batch_size: 每个嵌入微批次的切片数量
+            queue_size: 加载阶段最多预先缓冲的文件数量
+            progress_callback: 每写入一个微批次后调用，参数为当前的结果统计
+            incremental: 是否只重新嵌入内容发生变化的文件
+            chunker: 切片方式，"character"按字符切片，"token"按模型词元切片并保留文档结构
+            checkpoint_callback: 用于断点续传，参数为(新近处理完毕的文件路径, 正在写入的文件路径)。
+                处理完毕指片段已全部写入，或被跳过、未变化、出错；正在写入指已有片段提交写入、
+                但尚未全部写入的文件。在文件的片段提交写入前、以及每个微批次写入Chroma后调用
+            replace_sources: 集合中已有这些文件的片段时先删除再重新嵌入，续传时用于清理中断前
+                只写入了一部分的文件（即上次记录的正在写入的文件）
+            should_stop: 在文件之间和微批次之间调用，返回True时写完已提交的片段后停止，
+                结果统计中的stopped为True
+            load_workers: 并行解析文件的进程数量，默认为config.EMBED_LOAD_WORKERS
+            file_timeout: 单个文件的最长解析时间（秒），默认为config.EMBED_FILE_TIMEOUT
             
         Returns:
             (成功标志, 消息, 结果统计)
         """
+        if chunker not in CHUNKERS:
+            return False, f"不支持的切片方式: {chunker}", {"processed": 0, "errors": [f"不支持的切片方式: {chunker}"]}
+        
         # 1. 检查pipeline是否已初始化
         if collection_name not in self.pipelines:
             success, message, pipeline = self.init_pipeline(collection_name)
@@ -521,65 +575,341 @@ class DatabaseManager:
         stats = {
             "processed": 0,
             "chunked": 0,
+            "written": 0,
             "errors": [],
             "skipped": [],
-            "files": []
+            "files": [],
+            "unchanged": [],
+            "replaced": [],
+            "seeded": [],
+            "duplicate_chunks": 0,
+            "cache_hits": 0,
+            "embedded": 0,
+            "total_files": 0,
+            "files_done": 0,
+            "stopped": False,
+            "write": {}
         }
         
-        try:
-            # 确保文件存在
-            existing_files = []
-            for file_path in file_paths:
-                if os.path.exists(file_path):
-                    existing_files.append(file_path)
-                else:
-                    stats["errors"].append(f"文件不存在: {file_path}")
-            
-            if not existing_files:
-                return False, "没有找到可处理的文件", stats
-            
-            # 2. 使用rag_assistant的load_documents方法直接加载指定文件
-            # 获取文件类型(扩展名)，不带点号
-            file_types = set()
+        # 确保文件存在
+        existing_files = []
+        for file_path in file_paths:
+            if os.path.exists(file_path):
+                existing_files.append(file_path)
+            else:
+                stats["errors"].append(f"文件不存在: {file_path}")
+        
+        if not existing_files:
+            return False, "没有找到可处理的文件", stats
+        # 同一文件只处理一次
+        existing_files = list(dict.fromkeys(existing_files))
+        stats["total_files"] = len(existing_files)
+        
+        replace_sources = set(replace_sources or ())
+        
+        # 已记录的源文件版本，用于增量嵌入
+        recorded_versions = collection_index.get_source_versions(collection_name) if incremental else {}
+        
+        token_chunker = TokenChunker.for_pipeline(pipeline, chunk_size, chunk_overlap) if chunker == "token" else None
+        
+        # 2. 加载阶段：后台线程逐个文件加载和切片，有界队列限制预先缓冲的文件数量
+        chunk_queue = queue.Queue(maxsize=max(1, queue_size))
+        stop_event = threading.Event()
+        done_marker = object()
+        
+        load_workers = config.EMBED_LOAD_WORKERS if load_workers is None else load_workers
+        file_timeout = (config.EMBED_FILE_TIMEOUT if file_timeout is None else file_timeout) or None
+        # 需要解析的文件 -> 队列项，解析完成后补充切片并放入队列
+        loading_items = {}
+        # 版本检查时已计算的文件哈希，解析PDF时复用，避免再次读取文件
+        file_hashes = {}
+        
+        def files_to_load():
+            """依次检查文件版本，未变化的文件直接放入队列，其余交给iter_load_files解析"""
             for file_path in existing_files:
-                ext = os.path.splitext(file_path)[1].lower().lstrip('.')
-                if ext:  # 只添加非空扩展名
-                    file_types.add(ext)
-            
-            # 如果没有识别到文件类型，使用默认值
-            if not file_types:
-                file_types = ['pdf', 'txt', 'md', 'html', 'htm', 'docx']
-            
+                if stop_event.is_set():
+                    return
+                item = {"path": file_path, "chunks": [], "error": None, "unchanged": False, "version": None}
+                try:
+                    if incremental:
+                        file_stat = os.stat(file_path)
+                        recorded = recorded_versions.get(file_path)
+                        # 修改时间和大小未变时无需读取文件内容
+                        if recorded and recorded["mtime"] == file_stat.st_mtime and recorded["size"] == file_stat.st_size:
+                            item["unchanged"] = True
+                            chunk_queue.put(item)
+                            continue
+                        file_hash = hash_file(file_path)
+                        item["version"] = (file_path, file_stat.st_mtime, file_stat.st_size, file_hash)
+                        file_hashes[file_path] = file_hash
+                        if recorded and recorded["file_hash"] == file_hash:
+                            item["unchanged"] = True
+                            chunk_queue.put(item)
+                            continue
+                        if (recorded is None and file_path not in replace_sources
+                                and pipeline.document_store.has_source(file_path)):
+                            # 启用增量嵌入之前已写入集合的文件没有版本记录：以磁盘上的文件为准
+                            # 记录版本并视为未变化，需要重新嵌入时应显式删除后再嵌入
+                            item["unchanged"] = True
+                            item["seeded"] = True
+                            chunk_queue.put(item)
+                            continue
+                except Exception as e:
+                    item["error"] = str(e)
+                    chunk_queue.put(item)
+                    continue
+                loading_items[file_path] = item
+                yield file_path
+        
+        def produce():
             try:
-                # 以指定文件模式调用load_documents
-                # 使用当前目录作为基准目录（仅影响日志输出）
-                documents = load_documents(".", file_types=list(file_types), specific_files=existing_files)
+                for file_path, documents, error in iter_load_files(files_to_load(), workers=load_workers,
+                                                                   file_timeout=file_timeout,
+                                                                   file_hashes=file_hashes):
+                    item = loading_items.pop(file_path)
+                    if error:
+                        item["error"] = error
+                    else:
+                        try:
+                            if token_chunker is not None:
+                                item["chunks"] = token_chunker.chunk_documents(documents)
+                            else:
+                                item["chunks"] = chunk_documents(documents, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+                        except Exception as e:
+                            item["error"] = str(e)
+                    chunk_queue.put(item)
+                    if stop_event.is_set():
+                        break
+            except Exception as e:
+                logger.error(f"加载文件时出错: {e}", exc_info=True)
+                for item in loading_items.values():
+                    item["error"] = str(e)
+                    chunk_queue.put(item)
+            finally:
+                chunk_queue.put(done_marker)
+        
+        loader = threading.Thread(target=produce, name=f"embed-loader-{collection_name}", daemon=True)
+        loader.start()
+        
+        # 3. 嵌入阶段：按微批次嵌入后交给写入线程
+        writer = DocumentWriter(pipeline.document_store).start()
+        pending = []
+        # 切片已全部进入pending的文件版本和路径，在这些切片写入完成后记录
+        pending_versions = []
+        pending_files = []
+        # 片段首次进入pending的文件，提交写入前记录为正在写入
+        pending_starts = []
+        # 已有片段提交写入、但尚未全部写入的文件，由嵌入线程和写入线程共同维护
+        in_flight = set()
+        checkpoint_lock = threading.Lock()
+        
+        def on_written(count, versions, files):
+            stats["written"] += count
+            collection_index.set_source_versions(collection_name, versions)
+            with checkpoint_lock:
+                in_flight.difference_update(files)
+                if checkpoint_callback and files:
+                    checkpoint_callback(files, sorted(in_flight))
+        
+        def flush():
+            embedded_documents = []
+            if pending:
+                # 嵌入器可能原样返回传入的列表，交给写入线程前先取出当前批次
+                documents = list(pending)
+                pending.clear()
+                embedded_documents, embed_result = pipeline.embed_documents(
+                    documents, use_embedding_cache=use_embedding_cache)
+                stats["cache_hits"] += embed_result["cache_hits"]
+                stats["embedded"] += embed_result["embedded"]
+            if pending_starts:
+                # 先记录再写入：中断后只需清理这些文件已写入的部分片段
+                with checkpoint_lock:
+                    in_flight.update(pending_starts)
+                    if checkpoint_callback:
+                        checkpoint_callback([], sorted(in_flight))
+                pending_starts.clear()
+            writer.submit(embedded_documents,
+                          on_written=lambda count, versions=list(pending_versions), files=list(pending_files):
+                          on_written(count, versions, files))
+            pending_versions.clear()
+            pending_files.clear()
+            stats["write"] = writer.stats()
+            if progress_callback:
+                progress_callback(stats)
+        
+        try:
+            while not stats["stopped"]:
+                if should_stop and should_stop():
+                    stats["stopped"] = True
+                    break
+                item = chunk_queue.get()
+                if item is done_marker:
+                    break
                 
-                # 更新统计信息
-                stats["processed"] = len(existing_files)
-                stats["files"] = [os.path.basename(f) for f in existing_files]
+                file_path, chunks = item["path"], item["chunks"]
+                file_name = os.path.basename(file_path)
+                stats["files_done"] += 1
                 
-            except Exception as e:
-                return False, f"加载文档时出错: {str(e)}", stats
-            
-            if not documents:
-                return False, "未能从文件中提取任何文档", stats
-            
-            # 3. 使用rag_assistant的chunk_documents切片
-            try:
-                chunked_documents = chunk_documents(documents, chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-                stats["chunked"] = len(chunked_documents)
-            except Exception as e:
-                return False, f"文档切片时出错: {str(e)}", stats
-            
-            # 4. 使用rag_pipeline.add_documents嵌入
-            try:
-                pipeline.add_documents(chunked_documents, check_duplicates=check_duplicates)
+                if item["unchanged"]:
+                    stats["unchanged"].append(file_name)
+                    if item.get("seeded"):
+                        stats["seeded"].append(file_name)
+                    # 内容未变但修改时间变化时更新记录，下次可直接跳过哈希计算
+                    if item["version"]:
+                        pending_versions.append(item["version"])
+                    pending_files.append(file_path)
+                    continue
+                if item["error"]:
+                    stats["errors"].append(f"加载文件 {file_name} 时出错: {item['error']}")
+                    pending_files.append(file_path)
+                    continue
+                if not chunks:
+                    stats["errors"].append(f"未能从文件中提取任何内容: {file_name}")
+                    pending_files.append(file_path)
+                    continue
                 
-                return True, f"成功处理 {stats['processed']} 个文件，生成 {stats['chunked']} 个文档片段", stats
+                if ((incremental or file_path in replace_sources)
+                        and pipeline.document_store.has_source(file_path)):
+                    # 内容变化或上次只写入了一部分的文件：删除旧片段后重新嵌入
+                    removed = pipeline.document_store.delete_source(file_path)
+                    stats["replaced"].append(file_name)
+                    reason = "上次未写入完成" if file_path in replace_sources else "内容已变化"
+                    logger.info(f"文件 {file_name} {reason}，删除 {removed} 个旧片段后重新嵌入")
+                # 每个文件只检查一次来源，避免同一文件跨越多个微批次时被误判为重复
+                elif check_duplicates and is_duplicate_document(chunks[0], pipeline.document_store):
+                    stats["skipped"].append(file_name)
+                    pending_files.append(file_path)
+                    continue
                 
-            except Exception as e:
-                return False, f"文档嵌入时出错: {str(e)}", stats
-            
+                if check_duplicates:
+                    # 只丢弃集合中已有相同内容的片段（如期刊页眉、许可声明），文件的其余片段照常嵌入
+                    unique_chunks = drop_duplicate_chunks(chunks, pipeline.document_store)
+                    stats["duplicate_chunks"] += len(chunks) - len(unique_chunks)
+                    chunks = unique_chunks
+                    if not chunks:
+                        stats["skipped"].append(file_name)
+                        if item["version"]:
+                            pending_versions.append(item["version"])
+                        pending_files.append(file_path)
+                        continue
+                
+                stats["processed"] += 1
+                stats["chunked"] += len(chunks)
+                stats["files"].append(file_name)
+                
+                pending_starts.append(file_path)
+                for chunk in chunks:
+                    pending.append(chunk)
+                    if len(pending) >= batch_size:
+                        flush()
+                        if should_stop and should_stop():
+                            # 文件只写入了一部分，不记录版本，下次重新嵌入时先删除已写入的片段
+                            stats["stopped"] = True
+                            break
+                if stats["stopped"]:
+                    break
+                if item["version"]:
+                    pending_versions.append(item["version"])
+                pending_files.append(file_path)
+            
+            flush()
+            # 4. 等待写入线程写完剩余的批次
+            stats["write"] = writer.close()
         except Exception as e:
-            return False, f"文件嵌入处理时出错: {str(e)}", stats 
\ No newline at end of file
+            try:
+                stats["write"] = writer.close()
+            except Exception:
+                pass
+            return False, f"文档嵌入时出错（已写入 {stats['written']} 个文档片段）: {str(e)}", stats
+        finally:
+            # 通知加载线程停止，并清空队列以免其阻塞在put上
+            stop_event.set()
+            while loader.is_alive():
+                try:
+                    chunk_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+        
+        if stats["stopped"]:
+            return False, f"嵌入已停止（已写入 {stats['written']} 个文档片段）", stats
+        
+        if stats["processed"] == 0:
+            if stats["unchanged"]:
+                return True, f"{len(stats['unchanged'])} 个文件内容未变化，无需重新嵌入", stats
+            return False, "未能从文件中提取任何文档", stats
+        
+        message = (f"成功处理 {stats['processed']} 个文件，生成 {stats['chunked']} 个文档片段（缓存命中 {stats['cache_hits']} 个），"
+                   f"写入速度 {stats['write']['docs_per_second']} 个/秒")
+        if stats["unchanged"]:
+            message += f"，跳过 {len(stats['unchanged'])} 个未变化的文件"
+        return True, message, stats
+
+    def sync_collection(self, collection_name: str, directory: Optional[str] = None,
+                        add_new: bool = True, remove_missing: bool = True,
+                        **embed_kwargs) -> Tuple[bool, str, Dict[str, Any]]:
+        """
+        将collection与源文件目录同步
+        
+        以集合索引中的来源为准与目录中的文件对比：
+        - 新增：目录中有、集合中没有的文件，嵌入到集合中（add_new为False时忽略）
+        - 变化：两边都有的文件交给增量嵌入，只重新嵌入内容发生变化的文件
+        - 删除：集合中有、源文件已不存在的来源，删除其全部片段和版本记录（remove_missing为False时保留）
+        
+        Args:
+            collection_name: 集合名称
+            directory: 源文件目录，默认为raw_files目录；只检查目录下一层中支持的文件类型
+            add_new: 是否嵌入目录中新增的文件
+            remove_missing: 是否删除源文件已不存在的片段
+            **embed_kwargs: 传递给embed_files的其他参数（如chunk_size、chunk_overlap、progress_callback）
+            
+        Returns:
+            (成功标志, 消息, 结果统计)，结果统计中的added和removed为新增和删除的文件名
+        """
+        directory = os.path.abspath(directory or config.RAW_FILES_PATH)
+        
+        if collection_name not in self.pipelines:
+            success, message, pipeline = self.init_pipeline(collection_name)
+            if not success:
+                return False, message, {"processed": 0, "errors": [message]}
+        else:
+            pipeline = self.pipelines[collection_name]
+        
+        # 集合中来自该目录的来源（按绝对路径对应到索引中记录的原始路径）
+        indexed = {}
+        for source in list(pipeline.document_store.get_sources()) + list(collection_index.get_source_versions(collection_name)):
+            if os.path.dirname(os.path.abspath(source)) == directory:
+                indexed.setdefault(os.path.abspath(source), source)
+        
+        on_disk = {}
+        if os.path.isdir(directory):
+            for filename in sorted(os.listdir(directory)):
+                file_path = os.path.join(directory, filename)
+                if os.path.isfile(file_path) and filename.rsplit('.', 1)[-1].lower() in FILE_LOADERS:
+                    on_disk[file_path] = file_path
+        
+        added = [path for path in on_disk if path not in indexed]
+        current = [source for path, source in indexed.items() if path in on_disk]
+        missing = [source for path, source in indexed.items() if path not in on_disk]
+        
+        removed = []
+        if remove_missing and missing:
+            for source in missing:
+                pipeline.document_store.delete_source(source)
+                removed.append(os.path.basename(source))
+            collection_index.remove_source_versions(collection_name, missing)
+            logger.info(f"集合 '{collection_name}' 中 {len(missing)} 个源文件已不存在，已删除其片段")
+        
+        file_paths = current + (added if add_new else [])
+        if not file_paths:
+            return True, f"集合已同步，删除 {len(removed)} 个文件", {
+                "processed": 0, "added": [], "removed": removed, "errors": []
+            }
+        
+        logger.info(f"同步集合 '{collection_name}'：新增 {len(added) if add_new else 0} 个文件，检查 {len(current)} 个已有文件")
+        embed_kwargs["incremental"] = True
+        success, message, stats = self.embed_files(collection_name, file_paths, **embed_kwargs)
+        stats["added"] = [os.path.basename(path) for path in added] if add_new else []
+        stats["removed"] = removed
+        if removed:
+            message += f"，删除 {len(removed)} 个已不存在的文件"
+        return success, message, stats
@@ -0,0 +1,263 @@
+"""
+Markdown Text Module
+
+逐行解析Markdown并直接输出纯文本，不经过HTML中间表示：
+- 去除行内格式（强调、链接、图片、行内代码、HTML标签和实体）
+- 代码块和公式块原样保留
+- 标题统一输出为 "# 标题" 形式的单独一行，供切片器识别章节
+- 每个块记录所在的章节路径（如 "Methods > Simulation details"）
+"""
+
+import html
+import re
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# 块级结构
+_ATX_HEADING_RE = re.compile(r'^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$')
+_SETEXT_RE = re.compile(r'^ {0,3}(=+|-+)[ \t]*$')
+_FENCE_RE = re.compile(r'^ {0,3}(`{3,}|~{3,})')
+_MATH_FENCE_RE = re.compile(r'^ {0,3}\$\$')
+_RULE_RE = re.compile(r'^ {0,3}([-*_])(?:[ \t]*\1){2,}[ \t]*$')
+_TABLE_SEPARATOR_RE = re.compile(r'^ {0,3}\|?[ \t]*:?-+:?[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)*\|?[ \t]*$')
+_BLOCKQUOTE_RE = re.compile(r'^ {0,3}>[ \t]?')
+_LIST_MARKER_RE = re.compile(r'^([ \t]*)(?:[-*+]|\d{1,9}[.)])[ \t]+')
+_LINK_DEFINITION_RE = re.compile(r'^ {0,3}\[[^\]]+\]:[ \t]*\S+')
+
+# 行内格式
+_HTML_COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+_IMAGE_RE = re.compile(r'!\[([^\]]*)\]\([^)]*\)|!\[([^\]]*)\]\[[^\]]*\]')
+_LINK_RE = re.compile(r'\[([^\]]+)\]\([^)]*\)|\[([^\]]+)\]\[[^\]]*\]')
+_AUTOLINK_RE = re.compile(r'<((?:https?|ftp)://[^>\s]+|[^>\s@]+@[^>\s@]+)>')
+_HTML_TAG_RE = re.compile(r'</?[A-Za-z][^<>]*>')
+_CODE_SPAN_RE = re.compile(r'(`+)(.+?)\1')
+_INLINE_MATH_RE = re.compile(r'(?<![\\$])\$[^$\n]+\$')
+_STRONG_RE = re.compile(r'(\*\*|__)(?=\S)(.+?)(?<=\S)\1')
+_EMPHASIS_STAR_RE = re.compile(r'\*(?=\S)(.+?)(?<=\S)\*')
+_EMPHASIS_UNDERSCORE_RE = re.compile(r'(?<![A-Za-z0-9_])_(?=\S)(.+?)(?<=\S)_(?![A-Za-z0-9_])')
+_STRIKE_RE = re.compile(r'~~(?=\S)(.+?)(?<=\S)~~')
+_ESCAPE_RE = re.compile(r'\\([\\`*_{}\[\]()#+\-.!|>~])')
+
+
+class MarkdownBlock(NamedTuple):
+    kind: str  # heading、paragraph、list、table、code
+    text: str
+    level: int  # 标题级别，其他块为0
+    section: str  # 所在章节路径
+
+
+def strip_inline(text: str) -> str:
+    """
+    去除一行Markdown中的行内格式
+
+    Args:
+        text: Markdown文本
+
+    Returns:
+        纯文本
+    """
+    # 先取出行内代码、转义字符和行内公式，避免其中的符号被当作格式处理
+    code_spans = []
+
+    def keep(value):
+        code_spans.append(value)
+        return f"\x00{len(code_spans) - 1}\x00"
+
+    text = _CODE_SPAN_RE.sub(lambda m: keep(m.group(2).strip()), text)
+    text = _ESCAPE_RE.sub(lambda m: keep(m.group(1)), text)
+    text = _INLINE_MATH_RE.sub(lambda m: keep(m.group(0)), text)
+    text = _HTML_COMMENT_RE.sub('', text)
+    text = _IMAGE_RE.sub(lambda m: m.group(1) or m.group(2) or '', text)
+    text = _LINK_RE.sub(lambda m: m.group(1) or m.group(2), text)
+    text = _AUTOLINK_RE.sub(r'\1', text)
+    text = _HTML_TAG_RE.sub('', text)
+    text = _STRONG_RE.sub(r'\2', text)
+    text = _EMPHASIS_STAR_RE.sub(r'\1', text)
+    text = _EMPHASIS_UNDERSCORE_RE.sub(r'\1', text)
+    text = _STRIKE_RE.sub(r'\1', text)
+    text = html.unescape(text)
+    if code_spans:
+        text = re.sub(r'\x00(\d+)\x00', lambda m: code_spans[int(m.group(1))], text)
+    return text
+
+
+def _table_row(line: str) -> str:
+    """把表格行转换为以 " | " 分隔的单元格文本"""
+    row = line.strip()
+    if row.startswith('|'):
+        row = row[1:]
+    if row.endswith('|') and not row.endswith('\\|'):
+        row = row[:-1]
+    cells = re.split(r'(?<!\\)\|', row)
+    return " | ".join(strip_inline(cell.strip()) for cell in cells)
+
+
+def iter_markdown_blocks(lines: Iterable[str]) -> Iterator[MarkdownBlock]:
+    """
+    逐行解析Markdown，依次产出纯文本块
+
+    Args:
+        lines: Markdown文本行（可以是文件对象）
+
+    Yields:
+        MarkdownBlock，标题块的section包含该标题本身
+    """
+    sections: List[Tuple[int, str]] = []
+    paragraph: List[str] = []
+    paragraph_kind = "paragraph"
+    fence: Optional[str] = None
+    code: List[str] = []
+    in_comment = False
+
+    def section_path() -> str:
+        return " > ".join(title for _, title in sections)
+
+    def flush() -> Optional[MarkdownBlock]:
+        nonlocal paragraph, paragraph_kind
+        block = None
+        text = "\n".join(line for line in paragraph if line.strip())
+        if text.strip():
+            block = MarkdownBlock(paragraph_kind, text, 0, section_path())
+        paragraph, paragraph_kind = [], "paragraph"
+        return block
+
+    def heading(level: int, raw_title: str) -> Optional[MarkdownBlock]:
+        title = " ".join(strip_inline(raw_title).split())
+        if not title:
+            return None
+        while sections and sections[-1][0] >= level:
+            sections.pop()
+        sections.append((level, title))
+        return MarkdownBlock("heading", "#" * level + " " + title, level, section_path())
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+
+        # 代码块和公式块：原样保留内容
+        if fence is not None:
+            if (fence == "$$" and line.strip().endswith("$$")) or (fence != "$$" and line.strip().startswith(fence)):
+                if fence == "$$" and line.strip() != "$$":
+                    code.append(line.strip()[:-2])
+                text = "\n".join(code)
+                if text.strip():
+                    yield MarkdownBlock("code", text, 0, section_path())
+                fence, code = None, []
+            else:
+                code.append(line)
+            continue
+
+        # 跨行的HTML注释
+        if in_comment:
+            if "-->" in line:
+                in_comment = False
+                line = line.split("-->", 1)[1]
+            else:
+                continue
+        if "<!--" in line:
+            line = _HTML_COMMENT_RE.sub('', line)
+            if "<!--" in line:
+                line, in_comment = line.split("<!--", 1)[0], True
+
+        stripped = line.strip()
+        if not stripped:
+            block = flush()
+            if block:
+                yield block
+            continue
+
+        match = _FENCE_RE.match(line)
+        if match or _MATH_FENCE_RE.match(line):
+            block = flush()
+            if block:
+                yield block
+            if match:
+                fence = match.group(1)[0] * 3
+            else:
+                rest = stripped[2:]
+                # 单行公式 $$...$$
+                if rest.endswith("$$"):
+                    if rest[:-2].strip():
+                        yield MarkdownBlock("code", rest[:-2].strip(), 0, section_path())
+                    continue
+                fence = "$$"
+                if rest.strip():
+                    code.append(rest)
+            continue
+
+        match = _ATX_HEADING_RE.match(line)
+        if match:
+            block = flush()
+            if block:
+                yield block
+            block = heading(len(match.group(1)), match.group(2) or "")
+            if block:
+                yield block
+            continue
+
+        # Setext标题：紧跟在单行段落后的 === 或 ---
+        match = _SETEXT_RE.match(line)
+        if match and len(paragraph) == 1 and paragraph_kind == "paragraph":
+            raw_title = paragraph[0]
+            paragraph = []
+            block = heading(1 if match.group(1)[0] == "=" else 2, raw_title)
+            if block:
+                yield block
+            continue
+
+        if _RULE_RE.match(line) or _LINK_DEFINITION_RE.match(line):
+            block = flush()
+            if block:
+                yield block
+            continue
+
+        quote = _BLOCKQUOTE_RE.match(line)
+        while quote:
+            line = line[quote.end():]
+            quote = _BLOCKQUOTE_RE.match(line)
+
+        if "|" in line and (stripped.startswith("|") or paragraph_kind == "table"):
+            if paragraph_kind != "table":
+                block = flush()
+                if block:
+                    yield block
+                paragraph_kind = "table"
+            if not _TABLE_SEPARATOR_RE.match(line):
+                paragraph.append(_table_row(line))
+            continue
+        if paragraph_kind == "table":
+            block = flush()
+            if block:
+                yield block
+
+        match = _LIST_MARKER_RE.match(line)
+        if match:
+            if paragraph_kind != "list":
+                block = flush()
+                if block:
+                    yield block
+                paragraph_kind = "list"
+            line = match.group(1) + line[match.end():]
+
+        paragraph.append(strip_inline(line).rstrip())
+
+    if fence is not None:
+        text = "\n".join(code)
+        if text.strip():
+            yield MarkdownBlock("code", text, 0, section_path())
+    block = flush()
+    if block:
+        yield block
+
+
+def markdown_to_text(md_text: str) -> str:
+    """
+    把Markdown转换为纯文本
+
+    块之间以空行分隔，标题保留为 "# 标题" 形式的单独一行。
+
+    Args:
+        md_text: Markdown文本
+
+    Returns:
+        纯文本
+    """
+    return "\n\n".join(block.text for block in iter_markdown_blocks(md_text.splitlines()))
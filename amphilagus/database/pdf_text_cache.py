@@ -0,0 +1,99 @@
+"""
+PDF Text Cache Module
+
+按文件内容哈希缓存PDF逐页提取的文本。同一个PDF重新切片、重新嵌入或嵌入到其他集合时
+直接读取缓存，无需再次解析。每个PDF对应一个gzip压缩的JSON文件，按哈希前两位分目录存放，
+通过临时文件加原子替换写入，多个加载进程可以安全地并发读写。
+"""
+
+import gzip
+import json
+import os
+import tempfile
+from typing import List, Optional
+
+import pypdf
+
+from .. import config
+from ..logger import get_logger
+
+# 获取日志记录器
+logger = get_logger("pdf_text_cache")
+
+# 提取结果依赖于pypdf版本，版本变化后缓存自动失效
+EXTRACTOR_VERSION = f"pypdf-{pypdf.__version__}"
+
+
+class PdfTextCache:
+    """按文件内容哈希缓存的PDF逐页文本"""
+
+    def __init__(self, cache_dir: str):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+        """
+        self.cache_dir = cache_dir
+
+    def _entry_path(self, file_hash: str) -> str:
+        return os.path.join(self.cache_dir, file_hash[:2], f"{file_hash}.json.gz")
+
+    def get(self, file_hash: str) -> Optional[List[str]]:
+        """
+        读取缓存的逐页文本
+
+        Args:
+            file_hash: 文件内容哈希
+
+        Returns:
+            逐页文本列表，未命中时返回None
+        """
+        path = self._entry_path(file_hash)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"无法读取PDF文本缓存 {path}: {str(e)}")
+            return None
+        if entry.get("extractor") != EXTRACTOR_VERSION:
+            return None
+        return entry.get("pages")
+
+    def put(self, file_hash: str, pages: List[str]) -> None:
+        """
+        写入逐页文本
+
+        Args:
+            file_hash: 文件内容哈希
+            pages: 逐页文本列表
+        """
+        path = self._entry_path(file_hash)
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=1) as f:
+                    f.write(json.dumps({"extractor": EXTRACTOR_VERSION, "pages": pages},
+                                       ensure_ascii=False).encode("utf-8"))
+                os.replace(tmp_path, path)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+        except OSError as e:
+            # 缓存写入失败不影响文档加载
+            logger.warning(f"无法写入PDF文本缓存 {path}: {str(e)}")
+
+    def clear(self) -> None:
+        """清空缓存"""
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    os.remove(os.path.join(root, name))
+
+
+# 创建全局PDF文本缓存实例
+pdf_text_cache = PdfTextCache(config.PDF_TEXT_CACHE_PATH)
@@ -5,6 +5,7 @@ Title Matcher Module
 """
 
 import difflib
+import threading
 import unicodedata
 import time
 import json
@@ -32,6 +33,8 @@ class TitleMatcher:
         self._last_used = {}
         # 最大缓存集合数量
         self.max_collections = 20
+        # 共享的管道会在多个线程中并发访问缓存
+        self._lock = threading.RLock()
         logger.debug("标题匹配器已初始化")
     
     def add_titles_to_cache(self, collection_name: str, titles: List[str]) -> None:
@@ -42,16 +45,17 @@ class TitleMatcher:
             collection_name: 集合名称
             titles: 标题列表
         """
-        # 转换为集合以确保唯一性
-        self._collections_titles_cache[collection_name] = set(titles)
-        # 设置过期时间
-        current_time = time.time()
-        self._cache_expire_time[collection_name] = current_time + self.cache_ttl
-        self._last_used[collection_name] = current_time
-        logger.debug(f"集合 '{collection_name}' 的 {len(titles)} 个标题已添加到缓存")
-        
-        # 如果缓存集合数量超过最大值，删除最旧的
-        self._cleanup_cache()
+        with self._lock:
+            # 转换为集合以确保唯一性
+            self._collections_titles_cache[collection_name] = set(titles)
+            # 设置过期时间
+            current_time = time.time()
+            self._cache_expire_time[collection_name] = current_time + self.cache_ttl
+            self._last_used[collection_name] = current_time
+            logger.debug(f"集合 '{collection_name}' 的 {len(titles)} 个标题已添加到缓存")
+            
+            # 如果缓存集合数量超过最大值，删除最旧的
+            self._cleanup_cache()
     
     def _cleanup_cache(self) -> None:
         """清理过期和最旧的缓存"""
@@ -97,16 +101,17 @@ class TitleMatcher:
         Returns:
             是否有缓存的标题
         """
-        # 更新最后使用时间
-        if collection_name in self._collections_titles_cache:
-            self._last_used[collection_name] = time.time()
-            # 检查是否过期
-            if time.time() > self._cache_expire_time.get(collection_name, 0):
-                logger.debug(f"集合 '{collection_name}' 的标题缓存已过期")
-                self._remove_from_cache(collection_name)
-                return False
-            return True
-        return False
+        with self._lock:
+            # 更新最后使用时间
+            if collection_name in self._collections_titles_cache:
+                self._last_used[collection_name] = time.time()
+                # 检查是否过期
+                if time.time() > self._cache_expire_time.get(collection_name, 0):
+                    logger.debug(f"集合 '{collection_name}' 的标题缓存已过期")
+                    self._remove_from_cache(collection_name)
+                    return False
+                return True
+            return False
     
     def get_cached_titles(self, collection_name: str) -> List[str]:
         """
@@ -118,9 +123,10 @@ class TitleMatcher:
         Returns:
             标题列表，如果没有缓存则返回空列表
         """
-        if self.has_cached_titles(collection_name):
-            return list(self._collections_titles_cache[collection_name])
-        return []
+        with self._lock:
+            if self.has_cached_titles(collection_name):
+                return list(self._collections_titles_cache[collection_name])
+            return []
     
     def normalize_title(self, title: str) -> str:
         """
@@ -160,11 +166,12 @@ class TitleMatcher:
             最相似的标题，如果没有找到则返回None
         """
         # 如果集合标题未缓存，返回None
-        if not self.has_cached_titles(collection_name):
-            logger.debug(f"集合 '{collection_name}' 没有缓存的标题")
-            return None
-        
-        titles = self._collections_titles_cache[collection_name]
+        with self._lock:
+            if not self.has_cached_titles(collection_name):
+                logger.debug(f"集合 '{collection_name}' 没有缓存的标题")
+                return None
+            
+            titles = self._collections_titles_cache[collection_name]
         if not titles:
             logger.debug(f"集合 '{collection_name}' 的标题列表为空")
             return None
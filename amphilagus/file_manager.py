@@ -4,18 +4,90 @@ File management module for raw_files with tagging system.
 import os
 import json
 import shutil
+import hashlib
+import uuid
 from pathlib import Path
+from collections.abc import Mapping
 from typing import List, Dict, Any, Optional, Set, Union
+from contextlib import contextmanager
 from dataclasses import dataclass, field, asdict
 import re
 
 from .logger import get_logger
+from .file_store import FileStore
+from .tag_index import TagIndex, bitmap_ids
 from . import config
 
 logger = get_logger('file_manager')
 # 测试logger是否被激活
 logger.debug("FileManager logger initialized")
 
+# 流式保存上传文件时每次读取的字节数
+STREAM_BLOCK_SIZE = 1024 * 1024
+
+
+def save_stream(stream, destination: Union[str, Path], block_size: int = STREAM_BLOCK_SIZE) -> tuple:
+    """
+    Write a binary stream to disk and compute its SHA-256 while it is written.
+
+    Args:
+        stream: Readable binary stream (e.g. an uploaded file's stream)
+        destination: Target file path
+        block_size: Bytes read per iteration
+
+    Returns:
+        (sha256 hex digest, size in bytes)
+    """
+    digest = hashlib.sha256()
+    size = 0
+    with open(destination, 'wb') as f:
+        for block in iter(lambda: stream.read(block_size), b''):
+            digest.update(block)
+            f.write(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+def place_file(source: Union[str, Path], destination: Union[str, Path], keep_source: bool = False) -> str:
+    """
+    Put a file at destination without copying its data when possible.
+
+    Within one filesystem the file is renamed, or hard-linked when the source has to stay;
+    across devices (or where hard links are not supported) it falls back to a copy.
+    An existing destination is replaced.
+
+    Args:
+        source: Source file path
+        destination: Target file path
+        keep_source: Keep the source file (hard link instead of rename)
+
+    Returns:
+        The method used: 'rename', 'link' or 'copy'
+    """
+    source, destination = str(source), str(destination)
+    if not keep_source:
+        try:
+            os.replace(source, destination)
+            return 'rename'
+        except OSError as e:
+            logger.debug(f"Rename {source} -> {destination} failed ({e}), copying instead")
+        shutil.copy2(source, destination)
+        os.remove(source)
+        return 'copy'
+
+    # 先链接到临时名称再替换，使已存在的目标文件也能被原子地覆盖
+    temp_link = f"{destination}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        os.link(source, temp_link)
+        os.replace(temp_link, destination)
+        return 'link'
+    except OSError as e:
+        logger.debug(f"Hard link {source} -> {destination} failed ({e}), copying instead")
+        if os.path.exists(temp_link):
+            os.remove(temp_link)
+    shutil.copy2(source, destination)
+    return 'copy'
+
 class Tag:
     """
     Base class for all tags. Tags have inheritance properties similar to Python classes.
@@ -83,82 +155,122 @@ class Metadata:
         )
 
 
+class MetadataView(Mapping):
+    """
+    Read-only mapping of filename -> Metadata backed by the metadata store.
+
+    Entries are loaded on access, so the catalog is not held in memory. Changing a
+    returned Metadata object does not persist it; use the FileManager methods instead.
+    """
+    def __init__(self, file_manager: 'FileManager'):
+        self._file_manager = file_manager
+    
+    def __getitem__(self, filename: str) -> Metadata:
+        metadata = self._file_manager.get_file_metadata(filename)
+        if metadata is None:
+            raise KeyError(filename)
+        return metadata
+    
+    def __contains__(self, filename: object) -> bool:
+        return isinstance(filename, str) and self._file_manager.store.has_file(filename)
+    
+    def __iter__(self):
+        return iter(self._file_manager.store.filenames())
+    
+    def __len__(self) -> int:
+        return self._file_manager.store.count_files()
+    
+    def values(self):
+        return self._file_manager.list_files()
+
+
 class FileManager:
     """
     Manages raw_files files with a tag-based system.
     """
     def __init__(self, raw_files_dir: str = config.RAW_FILES_PATH, metadata_file: str = config.RAW_FILES_METADATA_PATH,
-                 backup_files_dir: str = config.BACKUP_FILES_PATH):
+                 backup_files_dir: str = config.BACKUP_FILES_PATH, db_file: Optional[str] = None):
+        """
+        Args:
+            raw_files_dir: Directory of the files
+            metadata_file: Legacy JSON metadata file, imported into the store on first start
+            backup_files_dir: Directory of the original (backup) files
+            db_file: SQLite metadata store, defaults to metadata_file with a .sqlite3 extension
+        """
         self.raw_files_dir = Path(raw_files_dir)
         self.backup_files_dir = Path(backup_files_dir)
         self.metadata_file =  metadata_file
-        self.metadata: Dict[str, Metadata] = {}
-        self.tag_registry: Dict[str, Tag] = {}
+        self.db_file = db_file or os.path.splitext(metadata_file)[0] + '.sqlite3'
+        self.store = FileStore(self.db_file)
+        # 标签倒排索引，首次按标签查询时构建，之后随修改增量更新
+        self._tag_index: Optional[TagIndex] = None
+        self._tag_index_version: Optional[int] = None
         
         # Create raw_files directory if it doesn't exist
         os.makedirs(self.raw_files_dir, exist_ok=True)
         os.makedirs(self.backup_files_dir, exist_ok=True)
-        # Load metadata if file exists
+        # Import the legacy JSON metadata file if it still exists
         if os.path.exists(self.metadata_file):
             self._load_metadata()
     
     def _load_metadata(self) -> None:
-        """Load metadata from file."""
+        """Import the legacy JSON metadata file into the store."""
         try:
-            with open(self.metadata_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                
-            # First pass: create all tags
-            for tag_data in data.get('tags', []):
-                name = tag_data['name']
-                self.tag_registry[name] = Tag(name)
-                # 加载标签的is_base_tag属性
-                if 'is_base_tag' in tag_data:
-                    self.tag_registry[name].is_base_tag = tag_data['is_base_tag']
-                # 加载标签的is_preset_tag属性
-                if 'is_preset_tag' in tag_data:
-                    self.tag_registry[name].is_preset_tag = tag_data['is_preset_tag']
-            
-            # Second pass: establish parent relationships
-            for tag_data in data.get('tags', []):
-                name = tag_data['name']
-                parent_name = tag_data.get('parent')
-                if parent_name and parent_name in self.tag_registry:
-                    self.tag_registry[name].parent = self.tag_registry[parent_name]
-            
-            # Load file metadata
-            for file_data in data.get('files', []):
-                metadata = Metadata.from_dict(file_data, self.tag_registry)
-                self.metadata[metadata.filename] = metadata
-                
-        except (json.JSONDecodeError, FileNotFoundError):
-            # Initialize with empty data if file doesn't exist or is corrupted
-            self.metadata = {}
-            self.tag_registry = {}
-    
-    def _save_metadata(self) -> None:
-        """Save metadata to file."""
-        # Prepare tag data
-        tag_data = []
-        for tag in self.tag_registry.values():
-            tag_info = {
-                'name': tag.name,
-                'is_base_tag': getattr(tag, 'is_base_tag', False),
-                'is_preset_tag': getattr(tag, 'is_preset_tag', False)
-            }
-            if tag.parent:
-                tag_info['parent'] = tag.parent.name
-            tag_data.append(tag_info)
-        
-        # Prepare file data
-        file_data = [metadata.to_dict() for metadata in self.metadata.values()]
-        
-        # Save to file
-        with open(self.metadata_file, 'w', encoding='utf-8') as f:
-            json.dump({
-                'tags': tag_data,
-                'files': file_data
-            }, f, indent=2, ensure_ascii=False)
+            self.store.import_json(self.metadata_file)
+        except (json.JSONDecodeError, KeyError) as e:
+            # 文件损坏时保持原样，使用空的存储
+            logger.error(f"Failed to import metadata from {self.metadata_file}: {str(e)}")
+    
+    @contextmanager
+    def batch(self):
+        """
+        Group several changes into one transaction that is committed once.
+
+        Usage:
+            with file_manager.batch():
+                for filename in filenames:
+                    file_manager.delete_file(filename)
+        """
+        try:
+            with self.store.transaction():
+                yield
+        except BaseException:
+            # 回滚后索引中可能有未提交的修改，下次查询时重建
+            self._tag_index = None
+            raise
+    
+    def _index(self) -> TagIndex:
+        """
+        Tag index, built from the store on first use and rebuilt after another
+        connection (e.g. another process) changed the store. Caller holds store.lock.
+        """
+        version = self.store.data_version()
+        if self._tag_index is None or version != self._tag_index_version:
+            parents = {name: parent for name, parent, _, _ in self.store.load_tags()}
+            self._tag_index = TagIndex.build(parents, self.store.file_tag_ids(), self.store.file_ids())
+            self._tag_index_version = version
+            logger.debug(f"Tag index built: {len(parents)} tags, {len(self._tag_index.file_tags)} files")
+        return self._tag_index
+    
+    @property
+    def metadata(self) -> MetadataView:
+        """Read-only filename -> Metadata mapping, loaded from the store on access."""
+        return MetadataView(self)
+    
+    @property
+    def tag_registry(self) -> Dict[str, Tag]:
+        """Snapshot of all tags by name, with parent links resolved."""
+        tag_rows = self.store.load_tags()
+        registry = {}
+        for name, _, is_base_tag, is_preset_tag in tag_rows:
+            tag = Tag(name)
+            tag.is_base_tag = is_base_tag
+            tag.is_preset_tag = is_preset_tag
+            registry[name] = tag
+        for name, parent_name, _, _ in tag_rows:
+            if parent_name and parent_name in registry:
+                registry[name].parent = registry[parent_name]
+        return registry
     
     def create_tag(self, name: str, parent_name: Optional[str] = None) -> Tag:
         """
@@ -171,18 +283,21 @@ class FileManager:
         Returns:
             The created Tag object
         """
-        if name in self.tag_registry:
-            raise ValueError(f"Tag '{name}' already exists")
-        
-        parent = None
-        if parent_name:
-            if parent_name not in self.tag_registry:
-                raise ValueError(f"Parent tag '{parent_name}' does not exist")
-            parent = self.tag_registry[parent_name]
-        
-        tag = Tag(name, parent)
-        self.tag_registry[name] = tag
-        self._save_metadata()
+        with self.batch():
+            tag_registry = self.tag_registry
+            if name in tag_registry:
+                raise ValueError(f"Tag '{name}' already exists")
+            
+            parent = None
+            if parent_name:
+                if parent_name not in tag_registry:
+                    raise ValueError(f"Parent tag '{parent_name}' does not exist")
+                parent = tag_registry[parent_name]
+            
+            tag = Tag(name, parent)
+            self.store.add_tag(name, parent_name)
+            if self._tag_index is not None:
+                self._tag_index.set_tag(name, parent_name)
         return tag
     
     def delete_tag(self, name: str) -> bool:
@@ -195,30 +310,26 @@ class FileManager:
         Returns:
             True if the tag was deleted, False otherwise
         """
-        if name not in self.tag_registry:
-            return False
-            
-        tag = self.tag_registry[name]
-        
-        # 检查是否为基础类标签，不允许删除
-        # 注意：预设标签(is_preset_tag=True)可以删除
-        if getattr(tag, 'is_base_tag', False):
-            raise ValueError(f"基础类标签 '{name}' 不能被删除")
-        
-        # 检查是否有子标签依赖此标签
-        children = [t for t in self.tag_registry.values() if t.parent and t.parent.name == name]
-        if children:
-            child_names = ", ".join([c.name for c in children])
-            raise ValueError(f"标签 '{name}' 有子标签依赖: {child_names}")
-        
-        # 从所有文件中移除此标签
-        for metadata in self.metadata.values():
-            metadata.tags = {t for t in metadata.tags if t.name != name}
-        
-        # 从注册表中移除
-        del self.tag_registry[name]
-        
-        self._save_metadata()
+        with self.batch():
+            tag = self.get_tag(name)
+            if tag is None:
+                return False
+            
+            # 检查是否为基础类标签，不允许删除
+            # 注意：预设标签(is_preset_tag=True)可以删除
+            if getattr(tag, 'is_base_tag', False):
+                raise ValueError(f"基础类标签 '{name}' 不能被删除")
+            
+            # 检查是否有子标签依赖此标签
+            children = self.store.child_tags(name)
+            if children:
+                child_names = ", ".join(children)
+                raise ValueError(f"标签 '{name}' 有子标签依赖: {child_names}")
+            
+            # 从所有文件中移除此标签，并从注册表中移除
+            self.store.delete_tag(name)
+            if self._tag_index is not None:
+                self._tag_index.remove_tag(name)
         return True
     
     def get_tag(self, name: str) -> Optional[Tag]:
@@ -230,11 +341,23 @@ class FileManager:
         return list(self.tag_registry.values())
     
     def add_file(self, file_path: Union[str, Path], backup_files_path: Union[str, Path], tags: List[str] = None, 
-                description: str = "", additional_info: Dict[str, Any] = None) -> str:
+                description: str = "", additional_info: Dict[str, Any] = None, move: bool = False,
+                content_hash: Optional[str] = None) -> str:
         """
         Add a file to raw_files with optional tags and metadata.
+
+        Args:
+            file_path: File to add to raw_files
+            backup_files_path: Original file (e.g. the uploaded PDF) to keep in backup_files
+            tags: Tag names
+            description: File description
+            additional_info: Extra metadata
+            move: Take ownership of the source files instead of copying them: file_path is renamed
+                into raw_files and backup_files_path is hard-linked into backup_files (the caller
+                removes it), both falling back to a copy across filesystems
+            content_hash: SHA-256 of the backup file, stored for duplicate detection
         """
-        logger.debug(f"add_file called with file_path={file_path}, backup_files_path={backup_files_path}, tags={tags}, description={description}, additional_info={additional_info}")
+        logger.debug(f"add_file called with file_path={file_path}, backup_files_path={backup_files_path}, tags={tags}, description={description}, additional_info={additional_info}, move={move}")
         file_path = Path(file_path)
         backup_files_path = Path(backup_files_path)
         logger.debug(f"Resolved paths: file_path={file_path}, backup_files_path={backup_files_path}")
@@ -242,46 +365,75 @@ class FileManager:
             logger.error(f"Source file does not exist: {file_path}")
             raise FileNotFoundError(f"File {file_path} does not exist")
         
-        # Copy file to raw_files directory
         destination = self.raw_files_dir / file_path.name
-        logger.debug(f"Copying file to raw_files directory: {file_path} -> {destination}")
-        shutil.copy2(file_path, destination)
-        logger.debug(f"File copy completed to {destination}")
         description_backup = self.backup_files_dir / (file_path.name.split('.')[0] + '.' + backup_files_path.name.split('.')[-1])
-        logger.debug(f"Copying backup file to backup_files directory: {backup_files_path} -> {description_backup}")
-        shutil.copy2(backup_files_path, description_backup)
-        logger.debug(f"Backup file copy completed to {description_backup}")
+        if move:
+            # Move file to raw_files directory, rename within the same filesystem
+            method = place_file(file_path, destination)
+            logger.debug(f"File placed in raw_files directory by {method}: {file_path} -> {destination}")
+            method = place_file(backup_files_path, description_backup, keep_source=True)
+            logger.debug(f"Backup file placed in backup_files directory by {method}: {backup_files_path} -> {description_backup}")
+        else:
+            # Copy file to raw_files directory
+            logger.debug(f"Copying file to raw_files directory: {file_path} -> {destination}")
+            shutil.copy2(file_path, destination)
+            logger.debug(f"File copy completed to {destination}")
+            logger.debug(f"Copying backup file to backup_files directory: {backup_files_path} -> {description_backup}")
+            shutil.copy2(backup_files_path, description_backup)
+            logger.debug(f"Backup file copy completed to {description_backup}")
+        
+        additional_info = dict(additional_info or {})
+        if content_hash:
+            additional_info['sha256'] = content_hash
         
         # Create metadata
         tag_objects = set()
         logger.debug(f"Processing tags list: {tags}")
-        if tags:
-            for tag_name in tags:
-                if tag_name in self.tag_registry:
+        with self.batch():
+            tag_registry = self.tag_registry
+            for tag_name in tags or []:
+                if tag_name in tag_registry:
                     logger.debug(f"Existing tag found: {tag_name}")
-                    tag_objects.add(self.tag_registry[tag_name])
+                    tag_objects.add(tag_registry[tag_name])
                 else:
                     logger.debug(f"Creating new tag: {tag_name}")
                     tag = Tag(tag_name)
-                    self.tag_registry[tag_name] = tag
+                    self.store.add_tag(tag_name)
+                    if self._tag_index is not None:
+                        self._tag_index.set_tag(tag_name)
+                    tag_registry[tag_name] = tag
                     tag_objects.add(tag)
-        
-        metadata = Metadata(
-            filename=file_path.name,
-            filepath=destination,
-            tags=tag_objects,
-            description=description,
-            additional_info=additional_info or {}
-        )
-        logger.debug(f"Metadata object created: {metadata}")
-        
-        self.metadata[file_path.name] = metadata
-        logger.debug(f"Metadata stored in registry for file: {file_path.name}")
-        self._save_metadata()
-        logger.debug(f"Metadata file saved to disk at {self.metadata_file if hasattr(self, 'metadata_file') else 'default location'}")
+            
+            metadata = Metadata(
+                filename=file_path.name,
+                filepath=destination,
+                tags=tag_objects,
+                description=description,
+                additional_info=additional_info
+            )
+            logger.debug(f"Metadata object created: {metadata}")
+            
+            self.store.save_file(metadata.filename, str(metadata.filepath), metadata.description,
+                                 metadata.additional_info, [tag.name for tag in metadata.tags])
+            if self._tag_index is not None:
+                self._tag_index.set_file_tags(self.store.file_id(metadata.filename),
+                                              [tag.name for tag in metadata.tags])
+        logger.debug(f"Metadata saved to {self.db_file} for file: {file_path.name}")
         
         return file_path.name
     
+    def find_file_by_hash(self, content_hash: str) -> Optional[str]:
+        """
+        Find a file whose original (backup) file has the given SHA-256.
+
+        Args:
+            content_hash: SHA-256 hex digest
+
+        Returns:
+            The filename, or None if no file with that content has been added
+        """
+        return self.store.find_file_by_hash(content_hash)
+    
     def delete_file(self, filename: str) -> bool:
         """
         Delete a file from raw_files.
@@ -293,7 +445,7 @@ class FileManager:
             True if the file was deleted, False otherwise
         """
         logger.debug(f"delete_file called for filename: {filename}")
-        if filename not in self.metadata:
+        if not self.store.has_file(filename):
             logger.warning(f"File {filename} not found in metadata, cannot delete")
             return False
         
@@ -320,10 +472,12 @@ class FileManager:
         else:
             logger.warning(f"No backup files found for {filename} in {self.backup_files_dir}")
         
-        del self.metadata[filename]
+        with self.batch():
+            file_id = self.store.file_id(filename)
+            self.store.delete_file(filename)
+            if self._tag_index is not None and file_id is not None:
+                self._tag_index.remove_file(file_id)
         logger.debug(f"Removed metadata entry for {filename}")
-        self._save_metadata()
-        logger.debug(f"Saved metadata after deleting {filename}")
         
         return True
     
@@ -338,17 +492,18 @@ class FileManager:
         Returns:
             True if the tags were added, False if the file doesn't exist
         """
-        if filename not in self.metadata:
-            return False
-        
-        for tag_name in tags:
-            if tag_name not in self.tag_registry:
-                # Create tag if it doesn't exist
-                self.tag_registry[tag_name] = Tag(tag_name)
+        with self.batch():
+            if not self.store.has_file(filename):
+                return False
             
-            self.metadata[filename].tags.add(self.tag_registry[tag_name])
-        
-        self._save_metadata()
+            for tag_name in tags:
+                # Create tag if it doesn't exist
+                self.store.add_tag(tag_name)
+                if self._tag_index is not None and tag_name not in self._tag_index.parents:
+                    self._tag_index.set_tag(tag_name)
+            self.store.add_file_tags(filename, tags)
+            if self._tag_index is not None:
+                self._tag_index.add_file_tags(self.store.file_id(filename), tags)
         return True
     
     def remove_tags_from_file(self, filename: str, tags: List[str]) -> bool:
@@ -362,16 +517,13 @@ class FileManager:
         Returns:
             True if the tags were removed, False if the file doesn't exist
         """
-        if filename not in self.metadata:
-            return False
-        
-        for tag_name in tags:
-            if tag_name in self.tag_registry:
-                tag = self.tag_registry[tag_name]
-                if tag in self.metadata[filename].tags:
-                    self.metadata[filename].tags.remove(tag)
-        
-        self._save_metadata()
+        with self.batch():
+            if not self.store.has_file(filename):
+                return False
+            
+            self.store.remove_file_tags(filename, tags)
+            if self._tag_index is not None:
+                self._tag_index.remove_file_tags(self.store.file_id(filename), tags)
         return True
     
     def get_files_by_tag(self, tag_name: str, include_subclasses: bool = True) -> List[Metadata]:
@@ -385,27 +537,79 @@ class FileManager:
         Returns:
             List of Metadata objects for matching files
         """
-        if tag_name not in self.tag_registry:
-            return []
-        
-        tag = self.tag_registry[tag_name]
-        result = []
+        with self.store.lock:
+            bitmap = self._index().files_with(tag_name, include_subclasses)
+        return self._files_from_bitmap(bitmap)
+    
+    def find_files(self, all_tags: List[str] = (), any_tags: List[str] = (), exclude_tags: List[str] = (),
+                   include_subclasses: bool = True) -> List[Metadata]:
+        """
+        Find files by a combination of tags, evaluated as bitmap operations on the tag index.
         
-        for metadata in self.metadata.values():
-            for file_tag in metadata.tags:
-                if file_tag == tag or (include_subclasses and file_tag.is_subclass_of(tag)):
-                    result.append(metadata)
-                    break
+        Args:
+            all_tags: Files must carry all of these tags (AND)
+            any_tags: Files must carry at least one of these tags (OR), ignored when empty
+            exclude_tags: Files must carry none of these tags (NOT)
+            include_subclasses: Whether a tag also matches files carrying its descendant tags
+            
+        Returns:
+            List of Metadata objects for matching files
+        """
+        with self.store.lock:
+            bitmap = self._index().match(all_tags, any_tags, exclude_tags, include_subclasses)
+        return self._files_from_bitmap(bitmap)
+    
+    def query_files(self, expression: str, include_subclasses: bool = True) -> List[Metadata]:
+        """
+        Find files with a boolean tag expression, e.g. 'A AND (B OR C) AND NOT D'.
         
-        return result
+        Args:
+            expression: Query expression (see tag_index.parse_query)
+            include_subclasses: Whether a tag also matches files carrying its descendant tags
+            
+        Returns:
+            List of Metadata objects for matching files
+            
+        Raises:
+            ValueError: The expression is invalid
+        """
+        with self.store.lock:
+            bitmap = self._index().query(expression, include_subclasses)
+        return self._files_from_bitmap(bitmap)
+    
+    def _files_from_bitmap(self, bitmap: int) -> List[Metadata]:
+        """Load the files of a tag index bitmap."""
+        if not bitmap:
+            return []
+        tag_registry = self.tag_registry
+        return [Metadata.from_dict(data, tag_registry) for data in self.store.files_by_ids(bitmap_ids(bitmap))]
     
     def get_file_metadata(self, filename: str) -> Optional[Metadata]:
         """Get metadata for a specific file."""
-        return self.metadata.get(filename)
+        data = self.store.get_file(filename)
+        return Metadata.from_dict(data, self.tag_registry) if data else None
     
     def list_files(self) -> List[Metadata]:
         """List all files in raw_files."""
-        return list(self.metadata.values())
+        tag_registry = self.tag_registry
+        return [Metadata.from_dict(data, tag_registry) for data in self.store.list_files()]
+    
+    def update_description(self, filename: str, description: str) -> bool:
+        """
+        Update the description of a file.
+        
+        Args:
+            filename: Name of the file
+            description: New description
+            
+        Returns:
+            True if the description was updated, False if the file doesn't exist
+        """
+        with self.batch():
+            if not self.store.has_file(filename):
+                return False
+            self.store.update_file(filename, description=description)
+        return True
     
     def clean_markdown_content(self, content: str, tags: List[str]) -> str:
         """
@@ -490,11 +694,11 @@ class FileManager:
         logger.debug(f"开始清洗文件: {filename}")
         
         # 检查文件是否存在
-        if filename not in self.metadata:
+        metadata = self.get_file_metadata(filename)
+        if metadata is None:
             logger.error(f"文件 {filename} 不存在")
             return False
             
-        metadata = self.metadata[filename]
         file_path = metadata.filepath
         
         # 检查文件是否为Markdown
@@ -585,18 +789,18 @@ class FileManager:
         logger.debug(f"开始重命名文件: {old_filename} -> {new_filename}")
         
         # 检查原文件是否存在
-        if old_filename not in self.metadata:
+        old_metadata = self.get_file_metadata(old_filename)
+        if old_metadata is None:
             logger.error(f"文件 {old_filename} 不存在，无法重命名")
             return False
             
         # 检查新文件名是否已存在
-        if new_filename in self.metadata:
+        if self.store.has_file(new_filename):
             logger.error(f"文件名 {new_filename} 已存在，无法重命名")
             return False
             
         try:
-            # 获取原文件的元数据和路径
-            old_metadata = self.metadata[old_filename]
+            # 获取原文件的路径
             old_raw_path = old_metadata.filepath
             
             # 构建新文件的路径
@@ -622,21 +826,8 @@ class FileManager:
                 logger.debug(f"重命名backup_files中的文件: {backup_file} -> {new_backup_path}")
                 shutil.move(backup_file, new_backup_path)
             
-            # 更新元数据
-            new_metadata = Metadata(
-                filename=new_filename,
-                filepath=new_raw_path,
-                tags=old_metadata.tags,
-                description=old_metadata.description,
-                additional_info=old_metadata.additional_info
-            )
-            
-            # 更新元数据字典
-            del self.metadata[old_filename]
-            self.metadata[new_filename] = new_metadata
-            
-            # 保存元数据
-            self._save_metadata()
+            # 更新元数据，标签随文件名一起更新
+            self.store.rename_file(old_filename, new_filename, str(new_raw_path))
             logger.info(f"文件重命名成功: {old_filename} -> {new_filename}")
             return True
             
@@ -0,0 +1,283 @@
+"""
+文件元数据存储模块
+用SQLite保存文件、标签和文件标签关系，替代每次修改都整体重写的raw_files_metadata.json：
+- 每个修改只写入相关的行，开销与文件和标签的数量无关
+- 文件标签关系单独成表并按标签建立索引，按标签查询文件时无需遍历所有文件
+- 多个修改可以放在一个事务中（transaction()可嵌套），批量操作只提交一次
+- 旧版本的raw_files_metadata.json在首次打开时导入
+"""
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .logger import get_logger
+
+# 配置日志
+logger = get_logger('file_store')
+
+# group_concat合并文件标签时使用的分隔符
+_TAG_SEPARATOR = '\x1f'
+
+# 文件查询的列，最后一列是合并后的标签名
+_FILE_SELECT = (
+    "SELECT f.filename, f.filepath, f.description, f.additional_info, "
+    "(SELECT group_concat(tag, char(31)) FROM file_tags WHERE file_tags.filename = f.filename) FROM files f"
+)
+
+
+class FileStore:
+    """SQLite文件元数据存储"""
+
+    def __init__(self, db_path: str):
+        """
+        初始化文件元数据存储，数据库在首次使用时才打开
+
+        Args:
+            db_path: SQLite文件路径
+        """
+        self.db_path = str(db_path)
+        self._conn: Optional[sqlite3.Connection] = None
+        # 可重入锁：同一线程中的事务可以嵌套，其他线程等待事务结束
+        self._lock = threading.RLock()
+        self._depth = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开（必要时创建）数据库，调用方需持有锁"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tags ("
+                "name TEXT PRIMARY KEY, parent TEXT, is_base_tag INTEGER NOT NULL DEFAULT 0, "
+                "is_preset_tag INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                "filename TEXT PRIMARY KEY, filepath TEXT NOT NULL, description TEXT NOT NULL DEFAULT '', "
+                "additional_info TEXT)"
+            )
+            # 文件的标签可以不在标签表中（与旧版本的行为一致），因此只对文件名建立外键
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS file_tags ("
+                "filename TEXT NOT NULL REFERENCES files (filename) ON DELETE CASCADE ON UPDATE CASCADE, "
+                "tag TEXT NOT NULL, PRIMARY KEY (filename, tag))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_file_tags_tag ON file_tags (tag, filename)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tags_parent ON tags (parent)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_files_sha256 ON files (json_extract(additional_info, '$.sha256'))")
+            self._conn = conn
+        return self._conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        在一个事务中执行多个修改，最外层的事务结束时提交一次
+
+        嵌套的事务使用保存点：内层出错时只回滚内层的修改，异常继续向外抛出
+        """
+        with self._lock:
+            conn = self._connect()
+            savepoint = f"sp{self._depth}"
+            conn.execute("BEGIN IMMEDIATE" if self._depth == 0 else f"SAVEPOINT {savepoint}")
+            self._depth += 1
+            try:
+                yield conn
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    conn.execute("ROLLBACK")
+                else:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                raise
+            self._depth -= 1
+            conn.execute("COMMIT" if self._depth == 0 else f"RELEASE {savepoint}")
+
+    @property
+    def lock(self) -> threading.RLock:
+        """存储使用的可重入锁，事务期间由执行事务的线程持有"""
+        return self._lock
+
+    def data_version(self) -> int:
+        """其他连接（如其他进程）提交修改后会变化的版本号，本连接的修改不改变它"""
+        return self._query("PRAGMA data_version")[0][0]
+
+    def _query(self, sql: str, params: Iterable[Any] = ()) -> List[tuple]:
+        with self._lock:
+            return self._connect().execute(sql, tuple(params)).fetchall()
+
+    @staticmethod
+    def _file_from_row(row: tuple) -> Dict[str, Any]:
+        filename, filepath, description, additional_info, tags = row
+        try:
+            info = json.loads(additional_info) if additional_info else {}
+        except ValueError:
+            info = {}
+        return {
+            'filename': filename,
+            'filepath': filepath,
+            'description': description or '',
+            'additional_info': info,
+            'tags': tags.split(_TAG_SEPARATOR) if tags else [],
+        }
+
+    # ---------- 标签 ----------
+
+    def load_tags(self) -> List[Tuple[str, Optional[str], bool, bool]]:
+        """读取全部标签: (名称, 父标签, 是否基础类标签, 是否预设标签)"""
+        rows = self._query("SELECT name, parent, is_base_tag, is_preset_tag FROM tags ORDER BY rowid")
+        return [(name, parent, bool(is_base), bool(is_preset)) for name, parent, is_base, is_preset in rows]
+
+    def has_tag(self, name: str) -> bool:
+        """标签是否存在"""
+        return bool(self._query("SELECT 1 FROM tags WHERE name = ?", (name,)))
+
+    def add_tag(self, name: str, parent: Optional[str] = None,
+                is_base_tag: bool = False, is_preset_tag: bool = False) -> None:
+        """添加标签，已存在时不做修改"""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO tags (name, parent, is_base_tag, is_preset_tag) VALUES (?, ?, ?, ?)",
+                (name, parent, int(is_base_tag), int(is_preset_tag))
+            )
+
+    def delete_tag(self, name: str) -> None:
+        """删除标签，并从所有文件中移除该标签"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM file_tags WHERE tag = ?", (name,))
+            conn.execute("DELETE FROM tags WHERE name = ?", (name,))
+
+    def child_tags(self, name: str) -> List[str]:
+        """获取直接子标签的名称"""
+        return [row[0] for row in self._query("SELECT name FROM tags WHERE parent = ? ORDER BY rowid", (name,))]
+
+    # ---------- 文件 ----------
+
+    def has_file(self, filename: str) -> bool:
+        """文件是否存在"""
+        return bool(self._query("SELECT 1 FROM files WHERE filename = ?", (filename,)))
+
+    def count_files(self) -> int:
+        """文件数量"""
+        return self._query("SELECT COUNT(*) FROM files")[0][0]
+
+    def filenames(self) -> List[str]:
+        """按添加顺序获取全部文件名"""
+        return [row[0] for row in self._query("SELECT filename FROM files ORDER BY rowid")]
+
+    def file_id(self, filename: str) -> Optional[int]:
+        """获取文件的ID（rowid，重命名后保持不变）"""
+        rows = self._query("SELECT rowid FROM files WHERE filename = ?", (filename,))
+        return rows[0][0] if rows else None
+
+    def file_ids(self) -> List[int]:
+        """获取全部文件的ID"""
+        return [row[0] for row in self._query("SELECT rowid FROM files")]
+
+    def file_tag_ids(self) -> List[Tuple[int, str]]:
+        """获取全部 (文件ID, 标签名) 关系"""
+        return self._query("SELECT files.rowid, file_tags.tag FROM file_tags JOIN files USING (filename)")
+
+    def files_by_ids(self, file_ids: Iterable[int]) -> List[Dict[str, Any]]:
+        """按添加顺序读取指定ID的文件"""
+        rows = self._query(
+            f"{_FILE_SELECT} WHERE f.rowid IN (SELECT value FROM json_each(?)) ORDER BY f.rowid",
+            (json.dumps(list(file_ids)),)
+        )
+        return [self._file_from_row(row) for row in rows]
+
+    def get_file(self, filename: str) -> Optional[Dict[str, Any]]:
+        """读取单个文件的元数据（包括标签名列表）"""
+        rows = self._query(f"{_FILE_SELECT} WHERE f.filename = ?", (filename,))
+        return self._file_from_row(rows[0]) if rows else None
+
+    def list_files(self) -> List[Dict[str, Any]]:
+        """按添加顺序读取全部文件的元数据"""
+        return [self._file_from_row(row) for row in self._query(f"{_FILE_SELECT} ORDER BY f.rowid")]
+
+    def find_file_by_hash(self, content_hash: str) -> Optional[str]:
+        """按additional_info中记录的sha256查找文件"""
+        rows = self._query(
+            "SELECT filename FROM files WHERE json_extract(additional_info, '$.sha256') = ? LIMIT 1", (content_hash,)
+        )
+        return rows[0][0] if rows else None
+
+    def save_file(self, filename: str, filepath: str, description: str = '',
+                  additional_info: Optional[Dict[str, Any]] = None, tags: Iterable[str] = ()) -> None:
+        """写入（或覆盖）一个文件及其标签"""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO files (filename, filepath, description, additional_info) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (filename) DO UPDATE SET filepath = excluded.filepath, "
+                "description = excluded.description, additional_info = excluded.additional_info",
+                (filename, filepath, description or '', json.dumps(additional_info or {}, ensure_ascii=False))
+            )
+            conn.execute("DELETE FROM file_tags WHERE filename = ?", (filename,))
+            conn.executemany("INSERT OR IGNORE INTO file_tags (filename, tag) VALUES (?, ?)",
+                             [(filename, tag) for tag in tags])
+
+    def update_file(self, filename: str, **fields: Any) -> None:
+        """
+        更新文件的部分字段
+
+        Args:
+            filename: 文件名
+            **fields: filepath、description或additional_info
+        """
+        if 'additional_info' in fields:
+            fields['additional_info'] = json.dumps(fields['additional_info'] or {}, ensure_ascii=False)
+        with self.transaction() as conn:
+            conn.execute(
+                f"UPDATE files SET {', '.join(f'{column} = ?' for column in fields)} WHERE filename = ?",
+                (*fields.values(), filename)
+            )
+
+    def rename_file(self, old_filename: str, new_filename: str, filepath: str) -> None:
+        """重命名文件，标签关系通过外键级联更新"""
+        with self.transaction() as conn:
+            conn.execute("UPDATE files SET filename = ?, filepath = ? WHERE filename = ?",
+                         (new_filename, filepath, old_filename))
+
+    def delete_file(self, filename: str) -> None:
+        """删除文件，标签关系通过外键级联删除"""
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM files WHERE filename = ?", (filename,))
+
+    def add_file_tags(self, filename: str, tags: Iterable[str]) -> None:
+        """为文件添加标签"""
+        with self.transaction() as conn:
+            conn.executemany("INSERT OR IGNORE INTO file_tags (filename, tag) VALUES (?, ?)",
+                             [(filename, tag) for tag in tags])
+
+    def remove_file_tags(self, filename: str, tags: Iterable[str]) -> None:
+        """移除文件的标签"""
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM file_tags WHERE filename = ? AND tag = ?",
+                             [(filename, tag) for tag in tags])
+
+    def import_json(self, json_path: str) -> int:
+        """
+        导入旧版本的raw_files_metadata.json，导入后将其重命名为raw_files_metadata.json.migrated
+
+        Returns:
+            导入的文件数量
+        """
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        files = data.get('files', [])
+        with self.transaction():
+            for tag in data.get('tags', []):
+                self.add_tag(tag['name'], tag.get('parent'),
+                             tag.get('is_base_tag', False), tag.get('is_preset_tag', False))
+            for file_data in files:
+                self.save_file(file_data['filename'], file_data['filepath'], file_data.get('description', ''),
+                               file_data.get('additional_info', {}), file_data.get('tags', []))
+        os.replace(json_path, f"{json_path}.migrated")
+        logger.info(f"已从 {json_path} 导入 {len(data.get('tags', []))} 个标签和 {len(files)} 个文件")
+        return len(files)
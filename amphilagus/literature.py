@@ -11,6 +11,7 @@ from pathlib import Path
 
 from .logger import get_logger
 from . import config
+from .search_index import InvertedIndex
 
 logger = get_logger('literature')
 
@@ -41,6 +42,8 @@ class Literature:
     
     # 类变量，用于缓存所有文献数据
     _literature_cache: ClassVar[Dict[str, 'Literature']] = {}
+    # 类变量，缓存中所有文献的全文索引，以文献名为文档ID
+    _search_index: ClassVar[InvertedIndex] = InvertedIndex(config.LITERATURE_SEARCH_FIELD_BOOSTS)
     
     def to_dict(self) -> Dict[str, Any]:
         """将文献对象转换为字典以便序列化"""
@@ -63,13 +66,24 @@ class Literature:
             
         return cls(**data)
     
+    def search_fields(self) -> Dict[str, str]:
+        """获取参与全文检索的各字段文本，列表字段以空格连接"""
+        fields = {}
+        for name in config.LITERATURE_SEARCH_FIELD_BOOSTS:
+            value = getattr(self, name, "")
+            if isinstance(value, (list, tuple)):
+                value = " ".join(str(item) for item in value)
+            fields[name] = str(value) if value else ""
+        return fields
+    
     def save(self) -> None:
         """保存文献到JSON文件"""
         # 更新修改时间
         self.updated_at = datetime.datetime.now()
         
-        # 更新缓存
+        # 更新缓存和全文索引
         Literature._literature_cache[self.title] = self
+        Literature._search_index.update(self.title, self.search_fields())
         
         # 将所有缓存中的文献保存到文件
         cls = self.__class__
@@ -109,6 +123,12 @@ class Literature:
                 for item in literature_data
             }
             
+            # 重建全文索引，构建完成后再替换，搜索不会看到构建到一半的索引
+            search_index = InvertedIndex(config.LITERATURE_SEARCH_FIELD_BOOSTS)
+            for title, lit in cls._literature_cache.items():
+                search_index.update(title, lit.search_fields())
+            cls._search_index = search_index
+            
             logger.info(f"已加载 {len(cls._literature_cache)} 篇文献")
             return cls._literature_cache
             
@@ -135,24 +155,27 @@ class Literature:
         return list(cls._literature_cache.values())
     
     @classmethod
-    def search(cls, keyword: str) -> List['Literature']:
-        """搜索文献"""
+    def search(cls, keyword: str, limit: Optional[int] = None, prefix: bool = False) -> List['Literature']:
+        """
+        全文搜索文献，结果按BM25相关度从高到低排列
+        
+        Args:
+            keyword: 查询文本，中英文均可，多个词之间为AND关系
+            limit: 最多返回的结果数量，None表示不限制
+            prefix: 是否将最后一个英文单词作为前缀匹配（边输入边搜索）
+            
+        Returns:
+            匹配的文献列表
+        """
         # 如果缓存为空，先加载所有文献
         if not cls._literature_cache:
             cls.load_all()
-            
-        keyword = keyword.lower()
-        results = []
         
-        for lit in cls._literature_cache.values():
-            # 在标题、期刊、背景、内容、作者中搜索
-            if (keyword in lit.title.lower() or 
-                keyword in lit.journal.lower() or
-                keyword in lit.background.lower() or
-                keyword in lit.content.lower() or
-                any(keyword in author.lower() for author in lit.authors)):
+        results = []
+        for title, _ in cls._search_index.search(keyword, limit=limit, prefix=prefix):
+            lit = cls._literature_cache.get(title)
+            if lit is not None:
                 results.append(lit)
-                
         return results
     
     def delete(self) -> bool:
@@ -161,6 +184,7 @@ class Literature:
         
         if self.title in cls._literature_cache:
             del cls._literature_cache[self.title]
+            cls._search_index.remove(self.title)
             cls._save_all_to_file()
             logger.info(f"文献 '{self.title}'.已删除")
             return True
@@ -180,9 +204,9 @@ class Literature:
             file_manager: FileManager实例
         """
         filename = f"{self.title}.md"
-        if filename in file_manager.metadata:
-            # 从file_manager获取标签
-            metadata = file_manager.metadata[filename]
+        # 从file_manager获取标签
+        metadata = file_manager.get_file_metadata(filename)
+        if metadata:
             # 将Tag对象转换为字符串列表
             self.tags = [tag.name for tag in metadata.tags]
             logger.info(f"从文件 {filename} 加载了 {len(self.tags)} 个标签")
@@ -201,12 +225,13 @@ class Literature:
             return
             
         # 遍历所有标签，查看它们的父标签类型
+        tag_registry = file_manager.tag_registry
         for tag_name in self.tags:
-            if tag_name not in file_manager.tag_registry:
+            if tag_name not in tag_registry:
                 logger.warning(f"标签 '{tag_name}' 不在标签注册表中，跳过")
                 continue
                 
-            tag = file_manager.tag_registry[tag_name]
+            tag = tag_registry[tag_name]
             parent_tag = tag.parent
             
             if not parent_tag:
@@ -250,13 +275,16 @@ class Literature:
             成功返回True，失败返回False
         """
         filename = f"{self.title}.md"
-        if filename not in file_manager.metadata:
+        metadata = file_manager.get_file_metadata(filename)
+        if metadata is None:
             logger.warning(f"未找到文件 {filename} 的元数据，无法更新标签")
             return False
             
         try:
+            # 标签注册表只读取一次，下面的查找都使用这份快照
+            tag_registry = file_manager.tag_registry
             # 获取当前的标签对象集合
-            current_tag_objs = file_manager.metadata[filename].tags
+            current_tag_objs = metadata.tags
             # 获取当前标签的名称列表
             current_tags = [tag.name for tag in current_tag_objs]
             
@@ -267,8 +295,8 @@ class Literature:
             
             # 处理现有标签，识别基础分类标签和其他标签
             for tag_name in current_tags:
-                if tag_name in file_manager.tag_registry:
-                    tag = file_manager.tag_registry[tag_name]
+                if tag_name in tag_registry:
+                    tag = tag_registry[tag_name]
                     parent = tag.parent
                     
                     # 如果有父标签，且父标签是基础分类之一，标记为需要移除
@@ -288,7 +316,7 @@ class Literature:
             if self.journal:
                 # 检查期刊是否已经在标签注册表中
                 journal_tag_exists = False
-                for tag_name, tag in file_manager.tag_registry.items():
+                for tag_name, tag in tag_registry.items():
                     if tag_name.lower() == self.journal.lower() and tag.parent and tag.parent.name == "期刊类型":
                         new_tags.append(tag_name)  # 使用已存在的标签名（保持原大小写）
                         journal_tag_exists = True
@@ -310,7 +338,7 @@ class Literature:
                 year_tag = f"{self.publish_year}年"
                 # 检查年份标签是否存在
                 year_tag_exists = False
-                for tag_name, tag in file_manager.tag_registry.items():
+                for tag_name, tag in tag_registry.items():
                     if tag.parent and tag.parent.name == "发表时间" and str(self.publish_year) in tag_name:
                         new_tags.append(tag_name)
                         year_tag_exists = True
@@ -331,7 +359,7 @@ class Literature:
                 if field not in new_tags:
                     # 检查研究领域标签是否存在
                     field_tag_exists = False
-                    for tag_name, tag in file_manager.tag_registry.items():
+                    for tag_name, tag in tag_registry.items():
                         if tag_name.lower() == field.lower() and tag.parent and tag.parent.name == "研究领域":
                             if tag_name not in new_tags:
                                 new_tags.append(tag_name)
@@ -352,7 +380,7 @@ class Literature:
             if self.review:
                 # 检查评价标签是否存在
                 review_tag_exists = False
-                for tag_name, tag in file_manager.tag_registry.items():
+                for tag_name, tag in tag_registry.items():
                     if tag.parent and tag.parent.name == "评分" and tag_name.lower() == self.review.lower():
                         new_tags.append(tag_name)
                         review_tag_exists = True
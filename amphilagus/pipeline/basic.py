@@ -13,21 +13,24 @@ The pipeline consists of:
 
 import os
 import sys
-from typing import List, Dict, Any, Optional, Set
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Set, Tuple
 from dotenv import load_dotenv
 from haystack import Pipeline, Document
-from haystack.components.embedders import SentenceTransformersDocumentEmbedder, SentenceTransformersTextEmbedder
+from haystack.document_stores.types import DuplicatePolicy
 from haystack_integrations.components.retrievers.chroma import ChromaEmbeddingRetriever
-from haystack.utils import Secret
 from tqdm import tqdm
 from haystack.components.builders import ChatPromptBuilder
-from haystack.components.generators.chat import OpenAIChatGenerator
 from .. import config
 
 # 相对路径导入
 from ..database.custom_document_store import CustomChromaDocumentStore
+from ..database.document_writer import iter_write_batches, store_max_batch_size
+from ..database.embedding_cache import embedding_cache
 from ..database.collection_metadata import save_collection_metadata, get_embedding_model, delete_collection_metadata
 from .prompt_templates import get_template, get_all_templates
+from .model_registry import ModelRegistry, SharedChatGenerator, SharedTextEmbedder, model_registry
 from ..logger import get_logger
 
 # 获取日志记录器
@@ -54,7 +57,8 @@ class RAGPipeline:
                 reset_collection: bool = False,
                 hard_reset: bool = False,
                 use_llm: bool = True,
-                prompt_template: str = "balanced"):
+                prompt_template: str = "balanced",
+                device: Optional[str] = None):
         """
         Initialize the RAG pipeline.
         
@@ -69,10 +73,8 @@ class RAGPipeline:
             hard_reset: If True, completely delete the existing collection instead of creating a new one with timestamp
             use_llm: Whether to include LLM in the pipeline
             prompt_template: Prompt template to use (precise, balanced, creative)
+            device: Device for the embedding model (e.g. "cpu", "cuda:0"), None for automatic selection
         """
-        # 初始化临时文档存储缓存
-        self._title_doc_store_cache = {}
-        
         # 检查集合是否存在及其嵌入模型
         if not reset_collection:
             existing_model = get_embedding_model(collection_name)
@@ -91,17 +93,23 @@ class RAGPipeline:
             "reset_collection": reset_collection,
             "hard_reset": hard_reset,
             "use_llm": use_llm,
-            "prompt_template": prompt_template
+            "prompt_template": prompt_template,
+            "device": device
         }
         
         # Initialize with default settings
         self.create_new_pipeline(use_llm=use_llm)
-        
-        self.busy = True
+
+    # 影响文档存储的设置项，只有这些设置变化时才需要重新打开Chroma集合
+    _STORE_SETTINGS = ("persist_dir", "collection_name", "reset_collection", "hard_reset")
 
     def _initialize_with_settings(self, settings: Dict[str, Any], custom_retriever=None) -> None:
         """
-        Initialize components with given settings.
+        Initialize the document store and shared models with given settings.
+        
+        The document store is only reopened when the collection settings change, and the
+        embedders and LLM client come from the process-wide model registry, so calling this
+        again with the same settings does not reload any weights.
         
         Args:
             settings: Dictionary containing initialization parameters
@@ -116,8 +124,13 @@ class RAGPipeline:
         self.persist_dir = config.CHROMA_DB_PATH
         os.makedirs(self.persist_dir, exist_ok=True)
         
+        # 只有集合相关设置变化时才重新打开文档存储
+        store_settings = {key: settings[key] for key in self._STORE_SETTINGS}
+        reopen_store = custom_retriever is None and store_settings != getattr(self, "_store_settings", None)
+        
         # 处理集合名称和重置
-        self.collection_name = settings["collection_name"]
+        if reopen_store:
+            self.collection_name = settings["collection_name"]
         
         # 检查集合是否存在，如果存在且不重置，强制使用原有嵌入模型
         original_embedding_model = settings["embedding_model"]
@@ -129,7 +142,7 @@ class RAGPipeline:
                 settings["embedding_model"] = existing_model
         
         # 如果需要初始化document_store而非使用自定义retriever
-        if custom_retriever is None:
+        if reopen_store:
             # 如果需要硬重置，直接删除原有collection
             if settings["reset_collection"] and settings["hard_reset"]:
                 print(f"Hard resetting collection: {self.collection_name}")
@@ -164,42 +177,60 @@ class RAGPipeline:
             except Exception as e:
                 print(f"Error initializing document store: {e}")
                 raise ValueError(f"Failed to initialize ChromaDocumentStore: {e}")
+            
+            self._store_settings = store_settings
+        
+        # 从模型注册表获取共享的嵌入模型和LLM客户端
+        self._acquire_models(settings)
 
-        # 使用提示词模板
-        self.chat_template = get_template(settings["prompt_template"])
-        self.current_template = settings["prompt_template"]
+    def _acquire_models(self, settings: Dict[str, Any]) -> None:
+        """
+        从进程级模型注册表获取当前设置所需的模型，并释放不再使用的模型。
         
-        # Initialize components
-        self.text_embedder = SentenceTransformersTextEmbedder(model=settings["embedding_model"])
-        self.document_embedder = SentenceTransformersDocumentEmbedder(model=settings["embedding_model"])
+        Args:
+            settings: Dictionary containing initialization parameters
+        """
+        if not hasattr(self, "_model_keys"):
+            self._model_keys = {}
         
-        # 使用自定义检索器或创建新的检索器
-        if custom_retriever is not None:
-            print("使用自定义检索器")
-            self.retriever = custom_retriever
-        else:
-            self.retriever = ChromaEmbeddingRetriever(
-                document_store=self.document_store,
-                top_k=settings["top_k"]
-            )
-        
-        self.prompt_builder = ChatPromptBuilder(template=self.chat_template)
-        self.generator = OpenAIChatGenerator(
-            model=settings["llm_model"],
-            api_key=Secret.from_token(self.api_key)
-        )
+        wanted_keys = {
+            "text_embedder": model_registry.embedder_key(
+                ModelRegistry.TEXT_EMBEDDER, settings["embedding_model"], settings.get("device")),
+            "document_embedder": model_registry.embedder_key(
+                ModelRegistry.DOCUMENT_EMBEDDER, settings["embedding_model"], settings.get("device")),
+            "generator": model_registry.generator_key(settings["llm_model"], self.api_key),
+        }
         
-        # Warm up the embedders
-        self.text_embedder.warm_up()
-        self.document_embedder.warm_up()
+        for attribute, key in wanted_keys.items():
+            current_key = self._model_keys.get(attribute)
+            if current_key == key:
+                continue
+            setattr(self, attribute, model_registry.acquire(key, api_key=self.api_key))
+            self._model_keys[attribute] = key
+            if current_key is not None:
+                model_registry.release(current_key)
 
-    def _create_pipeline(self, use_llm: bool = True, custom_retriever = None) -> Pipeline:
+    def close(self) -> None:
         """
-        Create a new pipeline using the current components.
+        Release the shared models held by this pipeline.
+        
+        The pipeline must not be used after it has been closed.
+        """
+        for key in getattr(self, "_model_keys", {}).values():
+            model_registry.release(key)
+        self._model_keys = {}
+
+    def _create_pipeline(self, use_llm: bool = True, custom_retriever = None, top_k: Optional[int] = None) -> Pipeline:
+        """
+        Create a new pipeline around the current shared models.
+        
+        Only lightweight components are created here; the embedders and the LLM client are
+        wrapped, not reloaded.
         
         Args:
             use_llm: Whether to include LLM in the pipeline (if False, only retriever will be used)
             custom_retriever: 可选的自定义检索器，如果提供则使用它替代默认检索器
+            top_k: Number of documents to retrieve, defaults to the current setting
             
         Returns:
             Haystack Pipeline
@@ -207,17 +238,25 @@ class RAGPipeline:
         try:
             # Create and connect pipeline
             pipeline = Pipeline()
-            pipeline.add_component("text_embedder", self.text_embedder)
+            pipeline.add_component("text_embedder", SharedTextEmbedder(self.text_embedder))
             
             # 如果提供了自定义检索器，使用它替代默认检索器
-            retriever_to_use = custom_retriever if custom_retriever else self.retriever
-            pipeline.add_component("retriever", retriever_to_use)
+            if custom_retriever is not None:
+                print("使用自定义检索器")
+                self.retriever = custom_retriever
+            else:
+                self.retriever = ChromaEmbeddingRetriever(
+                    document_store=self.document_store,
+                    top_k=top_k or self.default_settings["top_k"]
+                )
+            pipeline.add_component("retriever", self.retriever)
 
             # 根据use_llm参数决定是否添加和连接LLM相关组件
             if use_llm:
+                self.prompt_builder = ChatPromptBuilder(template=self.chat_template)
                 pipeline.add_component("prompt_builder", self.prompt_builder)
                 pipeline.connect("retriever", "prompt_builder.documents")
-                pipeline.add_component("llm", self.generator)
+                pipeline.add_component("llm", SharedChatGenerator(self.generator))
                 pipeline.connect("prompt_builder.prompt", "llm.messages")
             
             # 这个连接在任何情况下都需要的
@@ -233,6 +272,9 @@ class RAGPipeline:
         """
         Create a new pipeline with optional parameter overrides and set it as current.
         
+        Swapping the retriever or the prompt template only rewires components; models are
+        shared through the model registry and are not reloaded.
+        
         Args:
             use_llm: Whether to include LLM in the pipeline
             custom_retriever: Optional custom retriever to use instead of creating a new one
@@ -245,8 +287,12 @@ class RAGPipeline:
         # Initialize components with new settings
         self._initialize_with_settings(settings, custom_retriever=custom_retriever)
         
+        # 使用提示词模板
+        self.chat_template = get_template(settings["prompt_template"])
+        self.current_template = settings["prompt_template"]
+        
         # Create new pipeline
-        new_pipeline = self._create_pipeline(use_llm=use_llm)
+        new_pipeline = self._create_pipeline(use_llm=use_llm, custom_retriever=custom_retriever, top_k=settings["top_k"])
         
         # If this is the first pipeline, set it as default
         if not hasattr(self, 'default_pipeline'):
@@ -261,26 +307,100 @@ class RAGPipeline:
         """
         self.current_pipeline = self.default_pipeline
 
-    def run(self, query: str, *args) -> Dict[str, Any]:
+    def run(self, query: str, *args, filters: Optional[Dict[str, Any]] = None,
+            top_k: Optional[int] = None) -> Dict[str, Any]:
         """
         Run the current pipeline with a user query.
         
+        Retriever parameters are passed per run and never stored on the shared retriever,
+        so the same pipeline can serve concurrent requests.
+        
         Args:
             query: User question
+            filters: Optional Haystack metadata filters passed to the retriever for this run only
+            top_k: Optional number of documents to retrieve for this run only
         
         Returns:
             Pipeline results containing the generated answer
         """
         try:
-            results = self.current_pipeline.run({
-                "text_embedder": {"text": query},
-                "prompt_builder": {"question": query}
-            },
-            include_outputs_from={"retriever", "llm"})
+            results = self.current_pipeline.run(
+                self._build_run_inputs(query, filters, top_k),
+                include_outputs_from={"retriever", "llm"})
             return results
         except Exception as e:
             raise ValueError(f"查询处理失败: {e}")
 
+    def _build_run_inputs(self, query: str, filters: Optional[Dict[str, Any]] = None,
+                          top_k: Optional[int] = None) -> Dict[str, Any]:
+        """
+        构建管道运行输入，检索器参数只作用于本次运行。
+        
+        Args:
+            query: 查询文本
+            filters: 可选的元数据过滤条件
+            top_k: 可选的检索数量，默认使用当前设置
+            
+        Returns:
+            传给Pipeline.run的输入字典
+        """
+        inputs = {"text_embedder": {"text": query}}
+        if self.default_settings.get("use_llm", True):
+            inputs["prompt_builder"] = {"question": query}
+        inputs["retriever"] = {"top_k": self._resolve_top_k(top_k)}
+        if filters:
+            inputs["retriever"]["filters"] = filters
+        return inputs
+
+    @staticmethod
+    def _title_filter(title: str) -> Dict[str, Any]:
+        """构建按标题过滤的元数据过滤条件"""
+        return {"field": "meta.title", "operator": "==", "value": title}
+
+    def _section_filter(self, section: str, title: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        构建按章节过滤的元数据过滤条件。
+        
+        章节名称不区分大小写地与集合中各章节路径的每一级标题做子串匹配，
+        例如 "methods" 会匹配 "2. Methods > Simulation details"。
+        同时按标题过滤时只在该标题的文档的章节中查找。
+        
+        Args:
+            section: 章节名称
+            title: 已生效的标题过滤条件，None表示整个集合
+            
+        Returns:
+            过滤条件；没有匹配的章节（或文档没有章节信息）时返回None
+            
+        Raises:
+            ValueError: 匹配的章节路径超过config.SECTION_FILTER_MAX_VALUES个
+        """
+        if not section or not hasattr(self.document_store, "get_sections"):
+            return None
+        term = section.strip().lower()
+        matches = [
+            path for path in self.document_store.get_sections(title=title)
+            if any(term in part.lower() for part in path.split(" > "))
+        ]
+        if not matches:
+            scope = f"标题 '{title}'" if title is not None else f"集合 '{self.collection_name}'"
+            logger.info(f"{scope} 中没有与 '{section}' 匹配的章节，不按章节过滤")
+            return None
+        if len(matches) > config.SECTION_FILTER_MAX_VALUES:
+            raise ValueError(f"章节 '{section}' 匹配了 {len(matches)} 个章节路径，"
+                             f"超过上限 {config.SECTION_FILTER_MAX_VALUES}，请使用更具体的章节名称或同时指定标题")
+        return {"field": "meta.section", "operator": "in", "value": sorted(matches)}
+    
+    @staticmethod
+    def _combine_filters(*filters: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """用AND组合多个过滤条件，忽略None"""
+        conditions = [f for f in filters if f]
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"operator": "AND", "conditions": conditions}
+
     def _cache_all_titles(self, collection_name: str = None) -> Set[str]:
         """
         预先缓存指定集合中的所有文档标题到title_matcher中。
@@ -302,15 +422,9 @@ class RAGPipeline:
             logger.debug(f"集合 '{collection_name}' 的标题已经被缓存")
             return set(title_matcher.get_cached_titles(collection_name))
             
-        # 从文档存储中获取所有文档
+        # 只从文档存储中读取元数据并提取所有唯一标题
         logger.info(f"正在缓存集合 '{collection_name}' 的所有标题...")
-        all_docs = self.document_store.filter_documents({})
-        
-        # 提取所有唯一标题
-        unique_titles = set()
-        for doc in all_docs:
-            if doc.meta and "title" in doc.meta and doc.meta["title"] is not None:
-                unique_titles.add(doc.meta["title"])
+        unique_titles = self.document_store.get_meta_values("title")
                 
         # 如果找到标题，添加到缓存
         if unique_titles:
@@ -321,137 +435,103 @@ class RAGPipeline:
             
         return unique_titles
 
-    def run_with_selected_title(self, query: str, title: str, soft_match: bool = True, similarity_threshold: float = 0.5):
+    def _resolve_title(self, title: str, soft_match: bool = True, similarity_threshold: float = 0.5) -> Optional[str]:
         """
-        通过创建临时管道实现按标题过滤检索。
+        确定集合中实际存在的标题。
+        
+        精确匹配通过Chroma的where过滤完成，只有在精确匹配失败且启用软匹配时，
+        才需要读取集合中的全部标题。
+        
+        Args:
+            title: 要查找的文档标题
+            soft_match: 是否启用软匹配
+            similarity_threshold: 软匹配的相似度阈值
+            
+        Returns:
+            集合中存在的标题，如果没有找到则返回None
+        """
+        from ..database.title_matcher import title_matcher
+        
+        # 规范化标题
+        normalized_title = title_matcher.normalize_title(title)
+        
+        # 优先使用已缓存的标题列表，缓存未命中时通过where过滤检查单个文档
+        if normalized_title in title_matcher.get_cached_titles(self.collection_name):
+            return normalized_title
+        if self.document_store.has_meta_value("title", normalized_title):
+            return normalized_title
+        
+        if not soft_match:
+            return None
+        
+        logger.info(f"未找到标题为 '{title}' 的文档，尝试软匹配")
+        # 软匹配需要完整的标题列表
+        self._cache_all_titles()
+        closest_title = title_matcher.find_closest_title(
+            self.collection_name, 
+            title,
+            similarity_threshold=similarity_threshold
+        )
+        if closest_title:
+            logger.info(f"使用软匹配找到的标题: '{closest_title}'")
+        return closest_title
+
+    def run_with_selected_title(self, query: str, title: str, soft_match: bool = True, similarity_threshold: float = 0.5,
+                                top_k: Optional[int] = None, section: Optional[str] = None):
+        """
+        按标题过滤检索，标题作为元数据过滤条件下推到Chroma，复用当前管道。
         
         Args:
             query: 用户问题
             title: 要过滤的文档标题
             soft_match: 是否启用软匹配
             similarity_threshold: 软匹配的相似度阈值
+            top_k: 本次检索的文档数量，默认使用当前设置
+            section: 可选的章节名称（如 "Methods"），只检索该章节下的片段
             
         Returns:
             查询结果，如果没有找到匹配的文档，返回空结果
         """
         try:
-            # 导入标题匹配器
-            from ..database.title_matcher import title_matcher
-            import time
-            
-            # 预先缓存所有标题，提高后续查找效率
-            self._cache_all_titles()
-            
-            # 规范化标题
-            normalized_title = title_matcher.normalize_title(title)
-            actual_title = normalized_title
-            
-            # 先尝试精确匹配
-            # 获取指定title的文档，优先使用缓存
-            if hasattr(self, '_title_doc_store_cache') and title in self._title_doc_store_cache:
-                filtered_docs = self._title_doc_store_cache[title]["docs"]
-                logger.info(f"使用缓存的文档，标题 '{title}' 包含 {len(filtered_docs)} 个文档")
-                # 更新最后使用时间
-                self._title_doc_store_cache[title]["last_used"] = time.time()
-            else:
-                # 从主文档存储中获取所有文档
-                all_docs = self.document_store.filter_documents({})
-                
-                # 过滤出指定title的文档
-                filtered_docs = [doc for doc in all_docs if doc.meta and doc.meta.get("title") == actual_title]
-                
-                # 如果没有找到精确匹配且启用了软匹配，尝试找最相似的标题
-                if not filtered_docs and soft_match:
-                    logger.info(f"未找到标题为 '{title}' 的文档，尝试软匹配")
-                    
-                    # 查找最相似的标题 - 我们已经预缓存了所有标题，所以不需要再重新获取
-                    closest_title = title_matcher.find_closest_title(
-                        self.collection_name, 
-                        title,
-                        similarity_threshold=similarity_threshold
-                    )
-                    
-                    if closest_title:
-                        logger.info(f"使用软匹配找到的标题: '{closest_title}'")
-                        actual_title = closest_title
-                        # 使用找到的标题过滤文档
-                        filtered_docs = [doc for doc in all_docs if doc.meta and doc.meta.get("title") == actual_title]
-                
-                # 如果仍然没有找到匹配的文档，返回空结果
-                if not filtered_docs:
-                    logger.warning(f"找不到标题为 '{title}' 的文档，也没有找到足够相似的标题")
-                    return {"retriever": {"documents": []}, "soft_match_used": False, "actual_title": None}
-                
-                # 将过滤后的文档添加到缓存
-                if not hasattr(self, '_title_doc_store_cache'):
-                    self._title_doc_store_cache = {}
-                    
-                self._title_doc_store_cache[actual_title] = {
-                    "docs": filtered_docs,
-                    "docs_count": len(filtered_docs),
-                    "last_used": time.time()
-                }
-                
-                logger.info(f"创建标题为 '{actual_title}' 的文档缓存，包含 {len(filtered_docs)} 个文档")
-            
-            # 为这个查询创建全新的临时文档存储和检索器
-            from haystack.document_stores.in_memory import InMemoryDocumentStore
-            from haystack.components.retrievers.in_memory import InMemoryEmbeddingRetriever
-            
-            # 创建临时文档存储
-            temp_doc_store = InMemoryDocumentStore()
-            temp_doc_store.write_documents(filtered_docs)
-            
-            # 创建临时检索器
-            temp_retriever = InMemoryEmbeddingRetriever(
-                document_store=temp_doc_store,
-                top_k=self.default_settings["top_k"]
-            )
+            actual_title = self._resolve_title(title, soft_match, similarity_threshold)
             
-            # 保存当前的管道
-            current_pipeline_backup = self.current_pipeline
-            
-            # 创建临时管道，使用自定义检索器
-            self.create_new_pipeline(
-                use_llm=self.default_settings["use_llm"],
-                custom_retriever=temp_retriever
-            )
+            # 如果仍然没有找到匹配的文档，返回空结果
+            if actual_title is None:
+                logger.warning(f"找不到标题为 '{title}' 的文档，也没有找到足够相似的标题")
+                return {"retriever": {"documents": []}, "soft_match_used": False, "actual_title": None}
             
             # 运行查询
-            try:
-                results = self.run(query)
-                # 添加软匹配信息到结果
-                soft_match_used = actual_title != title
-                results["soft_match_used"] = soft_match_used
-                results["actual_title"] = actual_title
-                results["query_title"] = title
-            finally:
-                # 恢复原始管道
-                self.current_pipeline = current_pipeline_backup
-            
-            # 管理缓存大小，当缓存项超过10个时，删除最旧的项
-            if hasattr(self, '_title_doc_store_cache') and len(self._title_doc_store_cache) > 10:
-                oldest_title = min(self._title_doc_store_cache.keys(), 
-                                  key=lambda k: self._title_doc_store_cache[k]["last_used"])
-                logger.debug(f"缓存管理：删除最旧的文档缓存 '{oldest_title}'")
-                del self._title_doc_store_cache[oldest_title]
+            section_filter = self._section_filter(section, title=actual_title) if section else None
+            results = self.run(query, filters=self._combine_filters(self._title_filter(actual_title), section_filter),
+                               top_k=top_k)
+            # 添加软匹配信息到结果
+            results["soft_match_used"] = actual_title != title
+            results["actual_title"] = actual_title
+            results["query_title"] = title
+            results["section_filter_used"] = section_filter is not None
             
             return results
         except Exception as e:
             logger.error(f"标题过滤查询处理失败: {str(e)}", exc_info=True)
             raise ValueError(f"标题过滤查询处理失败: {str(e)}")
 
-    def add_documents(self, documents: List[Document], check_duplicates: bool = False) -> None:
+    def add_documents(self, documents: List[Document], check_duplicates: bool = False,
+                      use_embedding_cache: bool = True) -> Dict[str, int]:
         """
         Add documents to the document store.
         
         Args:
             documents: List of Haystack Document objects
             check_duplicates: Whether to check for duplicates before adding
+            use_embedding_cache: Whether to reuse embeddings from the persistent embedding cache
+            
+        Returns:
+            Dictionary with the number of added documents, embedding cache hits and newly embedded documents
         """
+        result = {"added": 0, "cache_hits": 0, "embedded": 0}
         if not documents:
             print("No documents provided to add")
-            return
+            return result
             
         print(f"Processing {len(documents)} documents...")
         
@@ -462,7 +542,7 @@ class RAGPipeline:
         # Check for duplicates if requested
         if check_duplicates:
             print("Checking for duplicate documents...")
-            from ..database.document_loader import is_duplicate_document
+            from ..database.document_loader import is_duplicate_document, drop_duplicate_chunks
             filtered_docs = []
             duplicates_count = 0
             
@@ -484,8 +564,10 @@ class RAGPipeline:
                     print(f"Skipping duplicate documents from source: {source}")
                     duplicates_count += len(docs)
                 else:
-                    # If not duplicate, add all documents from this source
-                    filtered_docs.extend(docs)
+                    # Keep the source, dropping only chunks whose content is already stored
+                    unique_docs = drop_duplicate_chunks(docs, self.document_store)
+                    duplicates_count += len(docs) - len(unique_docs)
+                    filtered_docs.extend(unique_docs)
             
             if duplicates_count > 0:
                 print(f"Skipped {duplicates_count} duplicate documents")
@@ -493,30 +575,129 @@ class RAGPipeline:
                 
             if not documents:
                 print("No new documents to add after duplicate check")
-                return
+                return result
+        
+        embedded_documents, embed_result = self.embed_documents(documents, use_embedding_cache=use_embedding_cache)
+        result.update(embed_result)
+        
+        # Add to document store in batches bounded by Chroma's max batch size and a byte budget
+        print("将文档写入存储...")
+        total_docs = 0
+        max_batch_size = store_max_batch_size(self.document_store)
+        with tqdm(total=len(embedded_documents), desc="写入进度", unit="doc") as progress:
+            for batch, _ in iter_write_batches(embedded_documents, max_batch_size):
+                total_docs += self.document_store.write_documents(batch, policy=DuplicatePolicy.SKIP)
+                progress.update(len(batch))
+        print(f"Added {total_docs} documents to the document store")
+        result["added"] = total_docs
+        
+        # ChromaDocumentStore with persist_path automatically persists data
+        print("Documents are automatically persisted in ChromaDocumentStore")
+        return result
+
+    def embed_documents(self, documents: List[Document],
+                        use_embedding_cache: bool = True) -> Tuple[List[Document], Dict[str, int]]:
+        """
+        Embed documents without writing them to the document store.
         
+        Args:
+            documents: List of Haystack Document objects
+            use_embedding_cache: Whether to reuse embeddings from the persistent embedding cache
+            
+        Returns:
+            (embedded documents, dictionary with embedding cache hits and newly embedded documents)
+        """
         print(f"Embedding {len(documents)} documents...")
         
-        # Embed documents
-        embedded_docs = self.document_embedder.run(documents)
+        # Embed documents, reusing cached embeddings where possible
+        if use_embedding_cache:
+            embedded_documents, cache_hits = self._embed_documents_with_cache(documents)
+        else:
+            embedded_documents, cache_hits = self.document_embedder.run(documents)["documents"], 0
         
         # 确保元数据正确传递
-        for i, doc in enumerate(embedded_docs["documents"]):
+        for i, doc in enumerate(embedded_documents):
             # 验证元数据是否保留
             if not doc.meta and documents[i].meta:
                 print(f"WARNING: Document metadata lost during embedding. Restoring...")
                 doc.meta = documents[i].meta
         
-        # Add to document store
-        print("将文档写入存储...")
-        total_docs = len(embedded_docs["documents"])
-        for i in tqdm(range(0, total_docs, 10), desc="写入进度", unit="batch"):
-            batch = embedded_docs["documents"][i:min(i+10, total_docs)]
-            self.document_store.write_documents(batch)
-        print(f"Added {total_docs} documents to the document store")
+        return embedded_documents, {"cache_hits": cache_hits, "embedded": len(documents) - cache_hits}
+
+    def _embedding_cache_key(self) -> str:
+        """
+        构建嵌入缓存的模型键，包含影响嵌入结果的文档嵌入器设置。
         
-        # ChromaDocumentStore with persist_path automatically persists data
-        print("Documents are automatically persisted in ChromaDocumentStore")
+        Returns:
+            模型键字符串
+        """
+        embedder = self.document_embedder
+        key = self.default_settings["embedding_model"]
+        if embedder.normalize_embeddings:
+            key += "|normalized"
+        if embedder.precision != "float32":
+            key += f"|{embedder.precision}"
+        return key
+
+    def _text_to_embed(self, document: Document) -> str:
+        """
+        构建文档嵌入器实际嵌入的文本（元数据字段、正文以及前后缀）。
+        
+        Args:
+            document: Haystack文档
+            
+        Returns:
+            待嵌入的文本
+        """
+        embedder = self.document_embedder
+        meta_values = [
+            str(document.meta[key]) for key in embedder.meta_fields_to_embed
+            if key in document.meta and document.meta[key]
+        ]
+        text = embedder.embedding_separator.join(meta_values + [document.content or ""])
+        return embedder.prefix + text + embedder.suffix
+
+    def _embed_documents_with_cache(self, documents: List[Document]) -> Tuple[List[Document], int]:
+        """
+        先从持久化嵌入缓存读取嵌入，只对未命中的文档调用文档嵌入模型，并将新结果写回缓存。
+        
+        Args:
+            documents: 待嵌入的文档列表
+            
+        Returns:
+            (带嵌入的文档列表, 缓存命中数)
+        """
+        model_key = self._embedding_cache_key()
+        hashes = [embedding_cache.text_hash(self._text_to_embed(doc)) for doc in documents]
+        
+        try:
+            cached = embedding_cache.get_many(model_key, hashes)
+        except Exception as e:
+            logger.warning(f"读取嵌入缓存失败，将重新嵌入全部文档: {str(e)}")
+            cached = {}
+        
+        missing = []
+        for doc, text_hash in zip(documents, hashes):
+            if text_hash in cached:
+                doc.embedding = cached[text_hash]
+            else:
+                missing.append((doc, text_hash))
+        
+        cache_hits = len(documents) - len(missing)
+        if cache_hits:
+            print(f"Embedding cache: reused {cache_hits}/{len(documents)} embeddings")
+        
+        if missing:
+            embedded = self.document_embedder.run([doc for doc, _ in missing])["documents"]
+            for (doc, _), embedded_doc in zip(missing, embedded):
+                doc.embedding = embedded_doc.embedding
+            try:
+                embedding_cache.put_many(
+                    model_key, [(text_hash, doc.embedding) for doc, text_hash in missing if doc.embedding is not None])
+            except Exception as e:
+                logger.warning(f"写入嵌入缓存失败: {str(e)}")
+        
+        return documents, cache_hits
 
     def get_answer(self, query: str, top_k: int = None, include_references: bool = False) -> str:
         """
@@ -680,8 +861,8 @@ class RAGPipeline:
             True if successful, False otherwise
         """
         try:
-            # 获取新模板
-            new_template = get_template(template_name)
+            # 检查新模板是否可用
+            get_template(template_name)
             
             # 保存当前模板名称
             self.current_template = template_name.lower()
@@ -691,11 +872,7 @@ class RAGPipeline:
             # 更新设置
             self.default_settings["prompt_template"] = self.current_template
             
-            # 创建新的prompt_builder组件
-            self.chat_template = new_template
-            self.prompt_builder = ChatPromptBuilder(template=self.chat_template)
-            
-            # 重新创建pipeline
+            # 重新创建pipeline，只替换prompt_builder，不重新加载模型
             self.create_new_pipeline(use_llm=self.default_settings["use_llm"])
             
             return True
@@ -722,7 +899,10 @@ class RAGPipeline:
         
     def set_top_k(self, top_k: int) -> None:
         """
-        直接设置检索器的top_k参数，而不需要重新创建检索器或管道。
+        设置默认的top_k参数，只影响之后未显式指定top_k的查询。
+        
+        检索器本身不会被修改，需要临时调整检索数量时应在run、run_with_selected_title
+        或run_batch的查询配置中按次传入top_k。
         
         Args:
             top_k: 检索时返回的文档数量
@@ -732,27 +912,27 @@ class RAGPipeline:
             
         # 更新默认设置
         self.default_settings["top_k"] = top_k
-        
-        # 更新检索器的top_k参数（如果检索器支持直接设置）
-        if hasattr(self.retriever, "top_k"):
-            self.retriever.top_k = top_k
-            logger.info(f"已直接设置检索器的top_k参数为{top_k}")
-        else:
-            # 如果检索器不支持直接设置，记录警告
-            logger.warning(f"当前检索器类型 {type(self.retriever).__name__} 不支持直接设置top_k参数，只更新了默认设置")
+        logger.info(f"已设置默认top_k参数为{top_k}")
             
     def run_batch(self, queries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
         批量处理多个查询，每个查询可以有不同的参数和运行模式。
         
+        'run' 和 'run_with_selected_title' 模式的查询文本通过一次批量前向计算完成嵌入，
+        并按 (模式, 过滤条件) 分组，每组只向Chroma发起一次携带多个查询嵌入的query请求
+        （使用组内最大的top_k，再按各查询的top_k截取）。启用LLM时，各查询的生成请求在
+        最多 config.RAG_BATCH_GENERATION_WORKERS 个线程中并发进行。结果按原始顺序返回。
+        
         Args:
             queries: 查询配置列表，每个查询是一个字典，包含以下字段:
                 - query: 查询文本（必须）
-                - mode: 查询模式，可以是 'run' 或 'run_with_selected_title'（必须）
+                - mode: 查询模式，可以是 'run'、'run_with_selected_title' 或 'run_with_references'（必须）
                 - top_k: 检索的文档数量（可选，默认使用当前设置）
                 - title: 当mode为'run_with_selected_title'时的标题（可选）
                 - soft_match: 当mode为'run_with_selected_title'时是否启用软匹配（可选，默认True）
                 - similarity_threshold: 软匹配的相似度阈值（可选，默认0.5）
+                - section: 'run'和'run_with_selected_title'模式下只检索该章节下的片段（可选，
+                  例如 "Methods"；集合中没有匹配的章节时不按章节过滤）
                 - 其他可能由各种mode需要的参数
         
         Returns:
@@ -777,11 +957,11 @@ class RAGPipeline:
         """
         if not queries:
             return []
-            
-        results = []
-        original_top_k = self.default_settings["top_k"]  # 保存原始top_k
         
-
+        # 第一步：校验查询配置，确定每个查询的top_k和过滤条件
+        plans = []
+        resolved_titles = {}
+        resolved_sections = {}
         for query_config in queries:
             # 验证查询配置
             if not isinstance(query_config, dict):
@@ -796,65 +976,215 @@ class RAGPipeline:
                 logger.warning(f"跳过缺少运行模式的配置: {query_config}")
                 continue
             
-            query_text = query_config["query"]
             mode = query_config["mode"]
-            only_most_related_articles = query_config.get("only_most_related_articles", False)
-            # 提取并设置top_k（如果提供）
-            if "top_k" in query_config and query_config["top_k"] != self.default_settings["top_k"]:
+            if mode not in ("run", "run_with_references", "run_with_selected_title"):
+                logger.warning(f"未知的查询模式: {mode}")
+                continue
+            
+            if mode == "run_with_selected_title" and "title" not in query_config:
+                logger.warning(f"缺少title参数，无法执行run_with_selected_title: {query_config}")
+                continue
+            
+            plan = {
+                "config": query_config,
+                "mode": mode,
+                "top_k": self._resolve_top_k(query_config.get("top_k")),
+                "filters": None
+            }
+            
+            if mode == "run_with_selected_title":
+                # 同一批次中相同标题只解析一次
+                title_key = (
+                    query_config["title"],
+                    query_config.get("soft_match", True),
+                    query_config.get("similarity_threshold", 0.5)
+                )
                 try:
-                    top_k = int(query_config["top_k"])
-                    if top_k > 0:
-                        self.set_top_k(top_k)
-                    else:
-                        logger.warning(f"忽略无效的top_k值: {top_k}")
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"设置top_k时出错: {e}")
+                    if title_key not in resolved_titles:
+                        resolved_titles[title_key] = self._resolve_title(*title_key)
+                    plan["actual_title"] = resolved_titles[title_key]
+                    if plan["actual_title"] is not None:
+                        plan["filters"] = self._title_filter(plan["actual_title"])
+                except Exception as e:
+                    logger.error(f"解析标题时出错: {e}", exc_info=True)
+                    plan["error"] = f"标题过滤查询处理失败: {str(e)}"
+            
+            section = query_config.get("section")
+            if section and mode != "run_with_references" and "error" not in plan:
+                # 同一批次中相同标题下的相同章节只解析一次
+                section_key = (section, plan.get("actual_title"))
+                try:
+                    if section_key not in resolved_sections:
+                        resolved_sections[section_key] = self._section_filter(section, title=plan.get("actual_title"))
+                    plan["section_filter"] = resolved_sections[section_key]
+                    plan["filters"] = self._combine_filters(plan["filters"], plan["section_filter"])
+                except Exception as e:
+                    logger.error(f"解析章节时出错: {e}", exc_info=True)
+                    plan["error"] = f"章节过滤查询处理失败: {str(e)}"
             
-            # 根据模式执行查询
+            plans.append(plan)
+        
+        # 需要检索的查询：排除带参考文献模式、出错的查询和找不到标题的查询
+        retrieval_plans = [
+            plan for plan in plans
+            if plan["mode"] != "run_with_references" and "error" not in plan
+            and not (plan["mode"] == "run_with_selected_title" and plan["actual_title"] is None)
+        ]
+        
+        # 第二步：一次批量前向计算所有查询嵌入
+        if retrieval_plans:
             try:
-                if mode == "run":
-                    # 普通查询模式
-                    logger.debug(f"执行普通查询模式: {query_text}")
-                    result = self.run(query_text, only_most_related_articles)
-
-                elif mode == "run_with_references":
-                    # 带参考文献的查询模式
-                    logger.debug(f"执行带参考文献的查询模式: {query_text}")
-                    result = self.get_answer(query_text, top_k=self.default_settings["top_k"], include_references=True)
-                    
-                elif mode == "run_with_selected_title":
-                    # 按标题过滤的查询模式
-                    logger.debug(f"执行按标题过滤的查询模式: {query_text}")
-                    if "title" not in query_config:
-                        logger.warning(f"缺少title参数，无法执行run_with_selected_title: {query_config}")
-                        continue
-                        
-                    title = query_config["title"]
-                    soft_match = query_config.get("soft_match", True)
-                    similarity_threshold = query_config.get("similarity_threshold", 0.5)
-                    
-                    result = self.run_with_selected_title(
-                        query=query_text,
-                        title=title,
-                        soft_match=soft_match,
-                        similarity_threshold=similarity_threshold
-                    )
-                    
-                else:
-                    logger.warning(f"未知的查询模式: {mode}")
-                    continue
-                    
-                # 添加查询配置信息到结果中
-                result["query_config"] = query_config
-                results.append(result)
-                
+                embeddings = self.embed_queries([plan["config"]["query"] for plan in retrieval_plans])
+                for plan, embedding in zip(retrieval_plans, embeddings):
+                    plan["embedding"] = embedding
             except Exception as e:
-                logger.error(f"执行查询时出错: {e}", exc_info=True)
-                # 添加错误信息到结果
-                error_result = {
-                    "error": str(e),
-                    "query_config": query_config
-                }
-                results.append(error_result)
-                    
-        return results
\ No newline at end of file
+                logger.error(f"批量计算查询嵌入时出错: {e}", exc_info=True)
+                for plan in retrieval_plans:
+                    plan["error"] = f"查询处理失败: {e}"
+        
+        # 第三步：按 (模式, 过滤条件) 分组，每组发起一次Chroma查询
+        groups = {}
+        for plan in retrieval_plans:
+            if "error" in plan:
+                continue
+            group_key = (plan["mode"], json.dumps(plan["filters"], sort_keys=True, ensure_ascii=False))
+            groups.setdefault(group_key, []).append(plan)
+        
+        for group in groups.values():
+            group_top_k = max(plan["top_k"] for plan in group)
+            try:
+                documents_per_query = self.document_store.search_embeddings(
+                    query_embeddings=[plan["embedding"] for plan in group],
+                    top_k=group_top_k,
+                    filters=group[0]["filters"]
+                )
+                for plan, documents in zip(group, documents_per_query):
+                    plan["documents"] = documents[:plan["top_k"]]
+            except Exception as e:
+                logger.error(f"批量检索时出错: {e}", exc_info=True)
+                for plan in group:
+                    plan["error"] = f"查询处理失败: {e}"
+        
+        # 第四步：按原始顺序组装结果，启用LLM时各查询的生成请求并发进行
+        workers = min(config.RAG_BATCH_GENERATION_WORKERS, len(plans))
+        if self.default_settings["use_llm"] and workers > 1:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag-batch") as executor:
+                return list(executor.map(self._batch_result, plans))
+        return [self._batch_result(plan) for plan in plans]
+
+    def _batch_result(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        根据run_batch中已完成检索的查询计划构建该查询的结果。
+        
+        Args:
+            plan: run_batch第一至三步得到的查询计划
+            
+        Returns:
+            查询结果，出错时为包含error的字典
+        """
+        query_config = plan["config"]
+        query_text = query_config["query"]
+        mode = plan["mode"]
+        try:
+            if "error" in plan:
+                raise ValueError(plan["error"])
+            
+            if mode == "run_with_references":
+                # 带参考文献的查询模式
+                logger.debug(f"执行带参考文献的查询模式: {query_text}")
+                result = self.get_answer(query_text, top_k=plan["top_k"], include_references=True)
+                
+            elif mode == "run_with_selected_title" and plan["actual_title"] is None:
+                logger.warning(f"找不到标题为 '{query_config['title']}' 的文档，也没有找到足够相似的标题")
+                result = {"retriever": {"documents": []}, "soft_match_used": False, "actual_title": None}
+                
+            else:
+                logger.debug(f"执行{mode}查询模式: {query_text}")
+                result = self._results_from_documents(
+                    query_text,
+                    plan["documents"],
+                    only_most_related_articles=query_config.get("only_most_related_articles", False)
+                )
+                if mode == "run_with_selected_title":
+                    # 添加软匹配信息到结果
+                    result["soft_match_used"] = plan["actual_title"] != query_config["title"]
+                    result["actual_title"] = plan["actual_title"]
+                    result["query_title"] = query_config["title"]
+                if query_config.get("section"):
+                    result["section_filter_used"] = plan.get("section_filter") is not None
+                
+            # 添加查询配置信息到结果中
+            result["query_config"] = query_config
+            return result
+            
+        except Exception as e:
+            logger.error(f"执行查询时出错: {e}", exc_info=True)
+            # 添加错误信息到结果
+            return {
+                "error": str(e),
+                "query_config": query_config
+            }
+
+    def _resolve_top_k(self, top_k: Any) -> int:
+        """
+        解析查询配置中的top_k，无效值时回退到默认设置。
+        
+        Args:
+            top_k: 查询配置中的top_k值
+            
+        Returns:
+            有效的top_k
+        """
+        if top_k is None:
+            return self.default_settings["top_k"]
+        try:
+            top_k = int(top_k)
+        except (ValueError, TypeError) as e:
+            logger.warning(f"设置top_k时出错: {e}")
+            return self.default_settings["top_k"]
+        if top_k <= 0:
+            logger.warning(f"忽略无效的top_k值: {top_k}")
+            return self.default_settings["top_k"]
+        return top_k
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        使用共享的文本嵌入模型，通过一次批量前向计算嵌入多个查询文本。
+        
+        与SentenceTransformersTextEmbedder.run逐条嵌入的结果一致（相同的前后缀和归一化设置）。
+        
+        Args:
+            texts: 查询文本列表
+            
+        Returns:
+            与输入顺序一致的嵌入向量列表
+        """
+        embedder = self.text_embedder
+        texts_to_embed = [embedder.prefix + text + embedder.suffix for text in texts]
+        return embedder.embedding_backend.embed(
+            texts_to_embed,
+            batch_size=embedder.batch_size,
+            show_progress_bar=False,
+            normalize_embeddings=embedder.normalize_embeddings,
+            precision=embedder.precision,
+            **(embedder.encode_kwargs or {})
+        )
+
+    def _results_from_documents(self, query: str, documents: List[Document],
+                                only_most_related_articles: bool = False) -> Dict[str, Any]:
+        """
+        根据检索到的文档构建与run方法相同结构的结果，启用LLM时生成答案。
+        
+        Args:
+            query: 查询文本
+            documents: 检索到的文档
+            only_most_related_articles: 是否只返回最相关的文章（由子类使用）
+            
+        Returns:
+            与run方法结构相同的结果字典
+        """
+        results = {"retriever": {"documents": documents}}
+        if self.default_settings["use_llm"]:
+            prompt = ChatPromptBuilder(template=self.chat_template).run(question=query, documents=documents)["prompt"]
+            results["llm"] = {"replies": self.generator.run(messages=prompt)["replies"]}
+        return results
@@ -2,14 +2,22 @@
 Pipeline Manager Module
 
 This module provides a manager for creating, caching, and retrieving different types of pipelines.
+Pipelines are kept in a bounded pool per (type, collection): callers check a pipeline out with
+a context manager, wait when the pool is exhausted, and a background thread evicts pipelines
+that stay idle for longer than a TTL.
+A pipeline is only reused for callers that pass the same constructor arguments.
 """
 
+import itertools
+import threading
 import time
-from typing import Dict, Any, Optional, List, Union, Type
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, List, Union, Type
 import datetime
 
 from .basic import RAGPipeline
 from .retriever import EmbeddingOnlyPipeline
+from .model_registry import model_registry
 from ..logger import get_logger
 
 # Get logger
@@ -19,188 +27,339 @@ class PipelineManager:
     """
     Manages the creation, caching, and retrieval of different types of pipelines.
     """
-    
-    def __init__(self):
-        """Initialize the pipeline manager with an empty cache."""
+
+    def __init__(self,
+                 max_pipelines_per_collection: int = 2,
+                 idle_ttl: float = 1800,
+                 checkout_timeout: float = 120,
+                 evict_interval: Optional[float] = 60):
+        """
+        Initialize the pipeline manager with an empty pool.
+
+        Args:
+            max_pipelines_per_collection: Maximum number of pipelines kept per (type, collection)
+            idle_ttl: Seconds after which an unused pipeline is evicted and its models released
+            checkout_timeout: Default number of seconds checkout waits for a free pipeline
+            evict_interval: Seconds between idle eviction passes of the background thread, None or 0 disables it
+        """
         self.pipeline_cache = {}  # Dictionary to store pipelines
         self.pipeline_types = {
             "rag": RAGPipeline,
             "embedding": EmbeddingOnlyPipeline
         }
-    
-    def create_pipeline(self, 
-                       pipeline_type: str, 
-                       collection_name: str, 
-                       **kwargs) -> Union[RAGPipeline, EmbeddingOnlyPipeline]:
-        """
-        Create a pipeline of the specified type and add it to the cache.
-        
+        self.max_pipelines_per_collection = max_pipelines_per_collection
+        self.idle_ttl = idle_ttl
+        self.checkout_timeout = checkout_timeout
+
+        # 保护pipeline_cache和_pending的条件变量，释放管道时唤醒等待者
+        self._condition = threading.Condition()
+        # 正在创建中的管道数量: {(type, collection): count}
+        self._pending: Dict[tuple, int] = {}
+        self._sequence = itertools.count(1)
+
+        # 后台线程定期关闭空闲超时的管道，没有新的checkout时也能释放模型
+        self._stop_evictor = threading.Event()
+        self._evictor = None
+        if evict_interval:
+            self._evictor = threading.Thread(target=self._evict_loop, args=(evict_interval,),
+                                             name="pipeline-evictor", daemon=True)
+            self._evictor.start()
+
+    def _evict_loop(self, interval: float) -> None:
+        """Run evict_idle every interval seconds until shutdown() is called."""
+        while not self._stop_evictor.wait(interval):
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.error(f"Evicting idle pipelines failed: {e}", exc_info=True)
+
+    def shutdown(self) -> None:
+        """Stop the eviction thread and close every pooled pipeline."""
+        self._stop_evictor.set()
+        if self._evictor is not None:
+            self._evictor.join()
+        self.clear_cache()
+
+    def _validate_type(self, pipeline_type: str) -> None:
+        """Raise ValueError for unknown pipeline types."""
+        if pipeline_type not in self.pipeline_types:
+            raise ValueError(f"Unknown pipeline type: {pipeline_type}. Available types: {list(self.pipeline_types.keys())}")
+
+    def _build_pipeline(self, pipeline_type: str, collection_name: str, **kwargs) -> Union[RAGPipeline, EmbeddingOnlyPipeline]:
+        """
+        Construct a pipeline outside the lock and give it a unique name.
+
         Args:
             pipeline_type: Type of pipeline to create ("rag" or "embedding")
             collection_name: Name of the collection to use
             **kwargs: Additional arguments to pass to the pipeline constructor
-            
+
         Returns:
             The created pipeline
         """
-        # Validate pipeline type
-        if pipeline_type not in self.pipeline_types:
-            raise ValueError(f"Unknown pipeline type: {pipeline_type}. Available types: {list(self.pipeline_types.keys())}")
-        
         # Generate timestamp
         timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-        
+
         # Generate a unique name for the pipeline
-        pipeline_name = f"{collection_name}_{pipeline_type}_{timestamp}"
-        
+        pipeline_name = f"{collection_name}_{pipeline_type}_{timestamp}_{next(self._sequence)}"
+
         # Get the pipeline class
         pipeline_class = self.pipeline_types[pipeline_type]
-        
+
         # Create the pipeline
         logger.info(f"Creating new {pipeline_type} pipeline for collection '{collection_name}'")
         pipeline = pipeline_class(collection_name=collection_name, **kwargs)
-        
+
         # Add a name attribute to the pipeline
         pipeline.name = pipeline_name
-        
-        # Cache the pipeline
-        self.pipeline_cache[pipeline_name] = {
+        pipeline.created_at = timestamp
+        return pipeline
+
+    def _register(self, pipeline, pipeline_type: str, collection_name: str, options: Dict[str, Any],
+                  in_use: bool) -> None:
+        """Add a freshly built pipeline to the pool. Caller must hold the lock."""
+        self.pipeline_cache[pipeline.name] = {
             "pipeline": pipeline,
             "type": pipeline_type,
             "collection": collection_name,
-            "created_at": timestamp,
-            "last_used": time.time()
+            # 创建管道时的构造参数，只有参数相同的调用方才复用该管道
+            "options": dict(options),
+            "created_at": pipeline.created_at,
+            "last_used": time.time(),
+            "in_use": in_use
         }
-        
-        return pipeline
-    
-    def get_pipeline(self, 
-                    pipeline_type: Optional[str] = None,
-                    collection_name: Optional[str] = None,
-                    create_if_missing: bool = True,
-                    **kwargs) -> Union[RAGPipeline, EmbeddingOnlyPipeline, None]:
-        """
-        Get a pipeline by type and collection.
-        
+
+    def _matching(self, pipeline_type: str, collection_name: str) -> List[tuple]:
+        """Return (name, info) pairs for a type and collection. Caller must hold the lock."""
+        return [
+            (name, info) for name, info in self.pipeline_cache.items()
+            if info["type"] == pipeline_type and info["collection"] == collection_name
+        ]
+
+    @contextmanager
+    def checkout(self,
+                 pipeline_type: str,
+                 collection_name: str,
+                 timeout: Optional[float] = None,
+                 **kwargs) -> Iterator[Union[RAGPipeline, EmbeddingOnlyPipeline]]:
+        """
+        Check a pipeline out of the pool for exclusive use and return it on exit.
+
+        An idle pipeline built with the same constructor arguments is reused when available.
+        Otherwise a new one is created while the pool for this (type, collection) is below
+        max_pipelines_per_collection, evicting an idle pipeline built with other arguments if
+        the pool is full; beyond that the caller waits until a pipeline is checked back in.
+
         Args:
-            pipeline_type: Type of pipeline to retrieve
+            pipeline_type: Type of pipeline to check out ("rag" or "embedding")
             collection_name: Name of the collection to use
-            create_if_missing: Whether to create a new pipeline if none exists
-            **kwargs: Additional arguments to pass to the pipeline constructor if creating
-            
+            timeout: Seconds to wait for a free pipeline, defaults to checkout_timeout
+            **kwargs: Arguments for the pipeline constructor; also select which pooled pipelines can be reused
+
+        Yields:
+            The checked out pipeline
+
+        Raises:
+            TimeoutError: If no pipeline became available within the timeout
+
+        Example:
+            with manager.pipeline.checkout("embedding", "research_papers") as pipeline:
+                results = pipeline.run_batch(queries)
+        """
+        pipeline = self._acquire(pipeline_type, collection_name, timeout, **kwargs)
+        try:
+            yield pipeline
+        finally:
+            self._release(pipeline.name)
+
+    def _acquire(self, pipeline_type: str, collection_name: str, timeout: Optional[float], **kwargs):
+        """Take an idle pipeline or reserve a slot to create one, waiting if the pool is full."""
+        self._validate_type(pipeline_type)
+        key = (pipeline_type, collection_name)
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        with self._condition:
+            while True:
+                self._evict_idle_locked()
+                pooled = self._matching(pipeline_type, collection_name)
+
+                # 优先复用构造参数相同、最近使用过的空闲管道
+                idle = [(name, info) for name, info in pooled if not info["in_use"] and info["options"] == kwargs]
+                if idle:
+                    name, info = max(idle, key=lambda x: x[1]["last_used"])
+                    info["in_use"] = True
+                    info["last_used"] = time.time()
+                    return info["pipeline"]
+
+                # 池已满时关闭最久未用的、构造参数不同的空闲管道，腾出名额
+                if len(pooled) + self._pending.get(key, 0) >= self.max_pipelines_per_collection:
+                    others = [(name, info) for name, info in pooled if not info["in_use"]]
+                    if others:
+                        name, _ = min(others, key=lambda x: x[1]["last_used"])
+                        logger.info(f"Evicting idle pipeline built with other arguments: {name}")
+                        self.pipeline_cache.pop(name)["pipeline"].close()
+                        pooled = self._matching(pipeline_type, collection_name)
+
+                # 池未满时预留一个创建名额，在锁外创建管道
+                if len(pooled) + self._pending.get(key, 0) < self.max_pipelines_per_collection:
+                    self._pending[key] = self._pending.get(key, 0) + 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"No {pipeline_type} pipeline for collection '{collection_name}' became available within {timeout}s")
+                logger.debug(f"All {pipeline_type} pipelines for '{collection_name}' are checked out, waiting")
+                self._condition.wait(remaining)
+
+        try:
+            pipeline = self._build_pipeline(pipeline_type, collection_name, **kwargs)
+        except Exception:
+            with self._condition:
+                self._pending[key] -= 1
+                self._condition.notify_all()
+            raise
+
+        with self._condition:
+            self._pending[key] -= 1
+            self._register(pipeline, pipeline_type, collection_name, kwargs, in_use=True)
+        return pipeline
+
+    def _release(self, name: str) -> None:
+        """Check a pipeline back in and wake up waiting callers."""
+        with self._condition:
+            info = self.pipeline_cache.get(name)
+            if info is not None:
+                info["in_use"] = False
+                info["last_used"] = time.time()
+            self._condition.notify_all()
+
+    def _evict_idle_locked(self) -> int:
+        """Close pipelines idle for longer than idle_ttl. Caller must hold the lock."""
+        now = time.time()
+        expired = [
+            name for name, info in self.pipeline_cache.items()
+            if not info["in_use"] and now - info["last_used"] > self.idle_ttl
+        ]
+        for name in expired:
+            logger.info(f"Evicting idle pipeline: {name}")
+            self.pipeline_cache.pop(name)["pipeline"].close()
+        return len(expired)
+
+    def evict_idle(self) -> int:
+        """
+        Evict pipelines that have not been used for longer than idle_ttl.
+
         Returns:
-            The requested pipeline, or None if not found and create_if_missing is False
-        """
-        # If type and collection are provided, find matching pipelines
-        if pipeline_type and collection_name:
-            matching_pipelines = [
-                (name, info) for name, info in self.pipeline_cache.items()
-                if info["type"] == pipeline_type and info["collection"] == collection_name
-            ]
-            
-            # If matching pipelines found, return the most recently used one
-            if matching_pipelines:
-                # Filter to only include non-busy pipelines
-                available_pipelines = [
-                    (name, info) for name, info in matching_pipelines
-                    if hasattr(info["pipeline"], "busy") and info["pipeline"].busy is False
-                ]
-                
-                # If we have available (non-busy) pipelines, return the most recently used one
-                if available_pipelines:
-                    most_recent = max(available_pipelines, key=lambda x: x[1]["last_used"])
-                    self.pipeline_cache[most_recent[0]]["last_used"] = time.time()
-                    return most_recent[1]["pipeline"]
-                    
-                # If all matching pipelines are busy, log and proceed to create a new one
-                logger.info(f"All matching pipelines are busy, creating new pipeline for {collection_name}")
-                # Fall through to create_if_missing logic below
-            
-            # If no matching pipelines and create_if_missing is True, create a new one
-            if create_if_missing:
-                return self.create_pipeline(pipeline_type, collection_name, **kwargs)
-        
-        return None
-    
-    def list_pipelines(self, 
-                      pipeline_type: Optional[str] = None, 
+            Number of pipelines evicted
+        """
+        with self._condition:
+            evicted = self._evict_idle_locked()
+            if evicted:
+                self._condition.notify_all()
+            return evicted
+
+    def list_pipelines(self,
+                      pipeline_type: Optional[str] = None,
                       collection_name: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         List available pipelines, optionally filtered by type or collection.
-        
+
         Args:
             pipeline_type: Filter by pipeline type
             collection_name: Filter by collection name
-            
+
         Returns:
             List of dictionaries containing pipeline information
         """
         results = []
-        
-        for name, info in self.pipeline_cache.items():
-            # Skip if pipeline_type filter is provided and doesn't match
-            if pipeline_type and info["type"] != pipeline_type:
-                continue
-                
-            # Skip if collection_name filter is provided and doesn't match
-            if collection_name and info["collection"] != collection_name:
-                continue
-                
-            # Add pipeline info to results
-            results.append({
-                "name": name,
-                "type": info["type"],
-                "collection": info["collection"],
-                "created_at": info["created_at"],
-                "last_used": datetime.datetime.fromtimestamp(info["last_used"]).strftime("%Y-%m-%d %H:%M:%S")
-            })
-        
+
+        with self._condition:
+            for name, info in self.pipeline_cache.items():
+                # Skip if pipeline_type filter is provided and doesn't match
+                if pipeline_type and info["type"] != pipeline_type:
+                    continue
+
+                # Skip if collection_name filter is provided and doesn't match
+                if collection_name and info["collection"] != collection_name:
+                    continue
+
+                # Add pipeline info to results
+                results.append({
+                    "name": name,
+                    "type": info["type"],
+                    "collection": info["collection"],
+                    "created_at": info["created_at"],
+                    "last_used": datetime.datetime.fromtimestamp(info["last_used"]).strftime("%Y-%m-%d %H:%M:%S"),
+                    "in_use": info["in_use"]
+                })
+
         return results
-    
+
     def remove_pipeline(self, name: str) -> bool:
         """
         Remove a pipeline from the cache.
-        
+
+        A pipeline that is currently checked out keeps working for its holder; it is simply
+        not returned to the pool.
+
         Args:
             name: Name of the pipeline to remove
-            
+
         Returns:
             True if pipeline was removed, False if it didn't exist
         """
-        if name in self.pipeline_cache:
-            del self.pipeline_cache[name]
-            return True
+        with self._condition:
+            if name in self.pipeline_cache:
+                self.pipeline_cache.pop(name)["pipeline"].close()
+                self._condition.notify_all()
+                return True
         return False
-    
-    def clear_cache(self, 
-                   pipeline_type: Optional[str] = None, 
+
+    def clear_cache(self,
+                   pipeline_type: Optional[str] = None,
                    collection_name: Optional[str] = None) -> int:
         """
         Clear pipelines from the cache, optionally filtered by type or collection.
-        
+
         Args:
             pipeline_type: Filter by pipeline type
             collection_name: Filter by collection name
-            
+
         Returns:
             Number of pipelines removed
         """
         removed_count = 0
-        pipeline_names = list(self.pipeline_cache.keys())
-        
-        for name in pipeline_names:
-            info = self.pipeline_cache[name]
-            
-            # Skip if pipeline_type filter is provided and doesn't match
-            if pipeline_type and info["type"] != pipeline_type:
-                continue
-                
-            # Skip if collection_name filter is provided and doesn't match
-            if collection_name and info["collection"] != collection_name:
-                continue
-                
-            # Remove pipeline from cache
-            del self.pipeline_cache[name]
-            removed_count += 1
-        
+
+        with self._condition:
+            pipeline_names = list(self.pipeline_cache.keys())
+
+            for name in pipeline_names:
+                info = self.pipeline_cache[name]
+
+                # Skip if pipeline_type filter is provided and doesn't match
+                if pipeline_type and info["type"] != pipeline_type:
+                    continue
+
+                # Skip if collection_name filter is provided and doesn't match
+                if collection_name and info["collection"] != collection_name:
+                    continue
+
+                # Remove pipeline from cache and release its shared models
+                self.pipeline_cache.pop(name)["pipeline"].close()
+                removed_count += 1
+
+            if removed_count:
+                self._condition.notify_all()
+
         return removed_count
+
+    def list_models(self) -> List[Dict[str, Any]]:
+        """
+        List the shared models held by the process-wide model registry.
+
+        Returns:
+            List of dictionaries containing model kind, name, device and reference count
+        """
+        return model_registry.list_models()
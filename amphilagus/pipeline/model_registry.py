@@ -0,0 +1,174 @@
+"""
+Model Registry Module
+
+This module provides a process-wide, reference-counted registry of warmed-up models.
+Embedders are keyed by model name and device, LLM clients by model name and API key,
+so every RAGPipeline, EmbeddingOnlyPipeline and PipelineManager shares one instance.
+
+Haystack components can only belong to a single Pipeline, so pipelines never add the
+shared models directly. They add the lightweight Shared* components defined here,
+which delegate to the registry's instances and are cheap to create for every rebuild.
+"""
+
+import hashlib
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from haystack import component
+from haystack.components.embedders import SentenceTransformersDocumentEmbedder, SentenceTransformersTextEmbedder
+from haystack.components.generators.chat import OpenAIChatGenerator
+from haystack.dataclasses import ChatMessage
+from haystack.utils import ComponentDevice, Secret
+
+from ..logger import get_logger
+
+# 获取日志记录器
+logger = get_logger("pipeline")
+
+
+class ModelKey(NamedTuple):
+    """注册表中模型的键"""
+    kind: str  # text_embedder, document_embedder 或 chat_generator
+    name: str  # 模型名称
+    variant: Optional[str] = None  # 嵌入模型的设备，或LLM客户端的API密钥指纹
+
+
+class ModelRegistry:
+    """
+    进程级模型注册表，按键加载一次模型并通过引用计数共享。
+    """
+
+    TEXT_EMBEDDER = "text_embedder"
+    DOCUMENT_EMBEDDER = "document_embedder"
+    CHAT_GENERATOR = "chat_generator"
+
+    def __init__(self):
+        """初始化空的模型注册表"""
+        # 只保护注册表本身，模型加载在锁外进行，不会阻塞其他模型的获取和释放
+        self._lock = threading.RLock()
+        # {ModelKey: {"future": 加载完成时得到模型实例的Future, "ref_count": 引用计数}}
+        self._entries: Dict[ModelKey, Dict[str, Any]] = {}
+
+    @staticmethod
+    def embedder_key(kind: str, model: str, device: Optional[str] = None) -> ModelKey:
+        """构建嵌入模型的键"""
+        return ModelKey(kind, model, device)
+
+    @staticmethod
+    def generator_key(model: str, api_key: str) -> ModelKey:
+        """构建LLM客户端的键，只保存API密钥的指纹"""
+        fingerprint = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+        return ModelKey(ModelRegistry.CHAT_GENERATOR, model, fingerprint)
+
+    def acquire(self, key: ModelKey, api_key: Optional[str] = None) -> Any:
+        """
+        获取共享模型，不存在时加载并预热，引用计数加一。
+        同一模型的并发请求只加载一次，其余请求等待加载完成。
+
+        Args:
+            key: 模型键
+            api_key: 创建LLM客户端时使用的API密钥
+
+        Returns:
+            已预热的Haystack组件实例
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            loading = entry is None
+            if loading:
+                entry = {"future": Future(), "ref_count": 0}
+                self._entries[key] = entry
+            entry["ref_count"] += 1
+
+        future = entry["future"]
+        if loading:
+            logger.info(f"加载共享模型: {key.kind} '{key.name}'")
+            try:
+                future.set_result(self._load(key, api_key))
+            except BaseException as e:
+                # 加载失败时移除条目，等待中的请求收到同一异常，之后的请求重新加载
+                with self._lock:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+                future.set_exception(e)
+                raise
+        return future.result()
+
+    def release(self, key: ModelKey) -> None:
+        """
+        释放共享模型的一个引用，引用计数归零时从注册表移除。
+
+        Args:
+            key: 模型键
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry["ref_count"] -= 1
+            if entry["ref_count"] <= 0:
+                logger.info(f"卸载共享模型: {key.kind} '{key.name}'")
+                del self._entries[key]
+
+    def list_models(self) -> List[Dict[str, Any]]:
+        """
+        列出注册表中的模型及其引用计数。
+
+        Returns:
+            模型信息列表
+        """
+        with self._lock:
+            return [
+                {
+                    "kind": key.kind,
+                    "name": key.name,
+                    "device": key.variant if key.kind != self.CHAT_GENERATOR else None,
+                    "ref_count": entry["ref_count"]
+                }
+                for key, entry in self._entries.items()
+                if entry["future"].done() and entry["future"].exception() is None
+            ]
+
+    def _load(self, key: ModelKey, api_key: Optional[str]) -> Any:
+        """根据键创建并预热模型"""
+        if key.kind == self.CHAT_GENERATOR:
+            return OpenAIChatGenerator(model=key.name, api_key=Secret.from_token(api_key))
+
+        device = ComponentDevice.from_str(key.variant) if key.variant else None
+        if key.kind == self.TEXT_EMBEDDER:
+            model = SentenceTransformersTextEmbedder(model=key.name, device=device)
+        elif key.kind == self.DOCUMENT_EMBEDDER:
+            model = SentenceTransformersDocumentEmbedder(model=key.name, device=device)
+        else:
+            raise ValueError(f"未知的模型类型: {key.kind}")
+        model.warm_up()
+        return model
+
+
+@component
+class SharedTextEmbedder:
+    """将查询嵌入委托给注册表中共享的文本嵌入模型"""
+
+    def __init__(self, embedder: SentenceTransformersTextEmbedder):
+        self._embedder = embedder
+
+    @component.output_types(embedding=List[float])
+    def run(self, text: str):
+        return {"embedding": self._embedder.run(text=text)["embedding"]}
+
+
+@component
+class SharedChatGenerator:
+    """将生成请求委托给注册表中共享的LLM客户端"""
+
+    def __init__(self, generator: OpenAIChatGenerator):
+        self._generator = generator
+
+    @component.output_types(replies=List[ChatMessage])
+    def run(self, messages: List[ChatMessage], generation_kwargs: Optional[Dict[str, Any]] = None):
+        return {"replies": self._generator.run(messages=messages, generation_kwargs=generation_kwargs)["replies"]}
+
+
+# 创建全局模型注册表实例
+model_registry = ModelRegistry()
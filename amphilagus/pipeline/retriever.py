@@ -30,7 +30,8 @@ class EmbeddingOnlyPipeline(RAGPipeline):
                 persist_dir: str = None,
                 collection_name: str = "documents",
                 reset_collection: bool = False,
-                hard_reset: bool = False):
+                hard_reset: bool = False,
+                device: Optional[str] = None):
         """
         Initialize an embedding-only pipeline.
         
@@ -42,6 +43,7 @@ class EmbeddingOnlyPipeline(RAGPipeline):
             collection_name: Name of the Chroma collection to use
             reset_collection: Whether to reset (clear) the collection if it exists
             hard_reset: If True, completely delete the existing collection
+            device: Device for the embedding model, None for automatic selection
         """
         # Initialize parent class with use_llm=False to skip LLM components
         super().__init__(
@@ -52,27 +54,43 @@ class EmbeddingOnlyPipeline(RAGPipeline):
             collection_name=collection_name,
             reset_collection=reset_collection,
             hard_reset=hard_reset,
-            use_llm=False  # Key setting: don't initialize LLM components
+            use_llm=False,  # Key setting: don't initialize LLM components
+            device=device
         )
         
         logger.info(f"Initialized EmbeddingOnlyPipeline with model {embedding_model}")
     
-    def run(self, query: str, only_most_related_articles: bool = False) -> Dict[str, Any]:
+    def run(self, query: str, only_most_related_articles: bool = False,
+            filters: Optional[Dict[str, Any]] = None, top_k: Optional[int] = None) -> Dict[str, Any]:
         """
         Override the run method to provide additional metadata with retrieved documents.
         
         Args:
             query: User query text
             only_most_related_articles: If True, only return most related articles based on scores (default: False)
+            filters: Optional Haystack metadata filters passed to the retriever for this run only
+            top_k: Optional number of documents to retrieve for this run only
             
         Returns:
             Dictionary with retrieved documents and organized metadata
         """
-        results = self.current_pipeline.run({
-                "text_embedder": {"text": query},
-            })
+        results = self.current_pipeline.run(self._build_run_inputs(query, filters, top_k))
         # logger.debug(results)
-        retrieved_documents = results["retriever"]["documents"]
+        return self._results_from_documents(query, results["retriever"]["documents"], only_most_related_articles)
+
+    def _results_from_documents(self, query: str, retrieved_documents: List[Document],
+                                only_most_related_articles: bool = False) -> Dict[str, Any]:
+        """
+        Organize retrieved documents into the result format returned by run.
+        
+        Args:
+            query: User query text
+            retrieved_documents: Documents returned by the retriever
+            only_most_related_articles: If True, only return most related articles based on scores
+            
+        Returns:
+            Dictionary with retrieved documents and organized metadata
+        """
         retrieved_contents = []
         
         for doc in retrieved_documents:
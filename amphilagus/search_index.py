@@ -0,0 +1,248 @@
+"""
+全文检索模块
+在内存中维护文献字段的倒排索引，用于文献搜索：
+- 中文按字切分，文档同时索引单字和相邻两字（二元组），查询使用二元组，无需分词词典
+- 英文和数字按单词切分，统一做NFKC规范化并转为小写
+- 每个词项按字段记录词频，打分使用BM25并按字段加权（如标题命中的权重高于正文）
+- 文档增删时只更新其自身的词项，无需重建索引
+- 查询的最后一个英文单词可作为前缀展开，用于边输入边搜索
+"""
+import bisect
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from typing import Dict, Hashable, List, Mapping, Optional, Tuple
+
+# 中日韩统一表意文字（含扩展A区和兼容区）
+_CJK = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+# 连续的汉字，或不含汉字和下划线的单词字符
+_TOKEN_PATTERN = re.compile(f'([{_CJK}]+)|([^\\W_{_CJK}]+)')
+
+# BM25参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 一个前缀最多展开的词项数量，避免单个字母匹配到大量词项
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def tokenize(text: str, query: bool = False) -> List[str]:
+    """
+    切分文本为词项
+
+    Args:
+        text: 文本
+        query: 是否为查询文本。文档中的汉字同时产生单字和二元组；
+               查询中的汉字只产生二元组（单个汉字时为该字），使多字查询要求字序相邻
+
+    Returns:
+        词项列表（保持原顺序，可能重复）
+    """
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKC', text).lower()
+    terms = []
+    for cjk, word in _TOKEN_PATTERN.findall(text):
+        if word:
+            terms.append(word)
+            continue
+        bigrams = [cjk[i:i + 2] for i in range(len(cjk) - 1)]
+        if query:
+            terms.extend(bigrams or [cjk])
+        else:
+            terms.extend(cjk)
+            terms.extend(bigrams)
+    return terms
+
+
+class InvertedIndex:
+    """
+    多字段BM25倒排索引
+
+    用法:
+        index = InvertedIndex({"title": 3.0, "content": 1.0})
+        index.update("doc1", {"title": "忆阻器综述", "content": "..."})
+        results = index.search("忆阻 mem", prefix=True)  # [(文档ID, 分数), ...]
+    """
+
+    def __init__(self, field_boosts: Mapping[str, float]):
+        """
+        Args:
+            field_boosts: 字段名 -> 权重，只索引其中列出的字段
+        """
+        self.field_boosts = dict(field_boosts)
+        # 词项 -> 文档ID -> 字段 -> 词频
+        self._postings: Dict[str, Dict[Hashable, Dict[str, int]]] = {}
+        # 文档ID -> 字段 -> 词项 -> 词频，删除文档时据此清理倒排表
+        self._documents: Dict[Hashable, Dict[str, Dict[str, int]]] = {}
+        # 文档ID -> 字段 -> 长度（词项数）
+        self._lengths: Dict[Hashable, Dict[str, int]] = {}
+        # 各字段的总长度，用于计算平均长度
+        self._field_totals: Dict[str, int] = {name: 0 for name in self.field_boosts}
+        # 按字典序排列的词项，用于前缀展开，词项集合变化后延迟重建
+        self._sorted_terms: Optional[List[str]] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._documents
+
+    # ---------- 维护 ----------
+
+    def update(self, doc_id: Hashable, fields: Mapping[str, str]) -> None:
+        """
+        添加文档，文档已存在时替换其内容
+
+        Args:
+            doc_id: 文档ID
+            fields: 字段名 -> 文本，未配置权重的字段被忽略
+        """
+        document: Dict[str, Dict[str, int]] = {}
+        for name, text in fields.items():
+            if name not in self.field_boosts:
+                continue
+            counts: Dict[str, int] = {}
+            for term in tokenize(text):
+                counts[term] = counts.get(term, 0) + 1
+            if counts:
+                document[name] = counts
+
+        with self._lock:
+            self._remove(doc_id)
+            lengths = {name: sum(counts.values()) for name, counts in document.items()}
+            for name, counts in document.items():
+                self._field_totals[name] += lengths[name]
+                for term, frequency in counts.items():
+                    postings = self._postings.get(term)
+                    if postings is None:
+                        postings = self._postings[term] = {}
+                        self._sorted_terms = None
+                    postings.setdefault(doc_id, {})[name] = frequency
+            self._documents[doc_id] = document
+            self._lengths[doc_id] = lengths
+
+    def remove(self, doc_id: Hashable) -> bool:
+        """删除文档，返回文档是否存在"""
+        with self._lock:
+            return self._remove(doc_id)
+
+    def _remove(self, doc_id: Hashable) -> bool:
+        document = self._documents.pop(doc_id, None)
+        if document is None:
+            return False
+        lengths = self._lengths.pop(doc_id)
+        for name, counts in document.items():
+            self._field_totals[name] -= lengths[name]
+            for term in counts:
+                postings = self._postings.get(term)
+                if postings is None:
+                    continue
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+                    self._sorted_terms = None
+        return True
+
+    def clear(self) -> None:
+        """清空索引"""
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._lengths.clear()
+            self._field_totals = {name: 0 for name in self.field_boosts}
+            self._sorted_terms = None
+
+    # ---------- 查询 ----------
+
+    def _expand_prefix(self, prefix: str) -> List[str]:
+        """获取以prefix开头的词项，调用方需持有锁"""
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self._postings)
+        terms = self._sorted_terms
+        start = bisect.bisect_left(terms, prefix)
+        expansions = []
+        for term in terms[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            expansions.append(term)
+        return expansions
+
+    def _query_groups(self, query: str, prefix: bool) -> List[List[str]]:
+        """
+        将查询切分为词项组，文档需命中每一组中的至少一个词项，调用方需持有锁
+
+        前缀模式下最后一个词项为英文单词时展开为以其开头的所有词项
+        """
+        terms = list(dict.fromkeys(tokenize(query, query=True)))
+        groups = [[term] for term in terms]
+        if prefix and terms and not re.match(f'[{_CJK}]', terms[-1]):
+            groups[-1] = self._expand_prefix(terms[-1])
+        return groups
+
+    def search(self, query: str, limit: Optional[int] = None, prefix: bool = False) -> List[Tuple[Hashable, float]]:
+        """
+        搜索文档
+
+        Args:
+            query: 查询文本，所有词项都需命中（AND）
+            limit: 最多返回的结果数量，None表示不限制
+            prefix: 是否将最后一个英文单词作为前缀匹配
+
+        Returns:
+            (文档ID, BM25分数) 列表，按分数从高到低排列
+        """
+        with self._lock:
+            # 不在索引中的词项没有匹配的文档
+            groups = [[term for term in group if term in self._postings]
+                      for group in self._query_groups(query, prefix)]
+            if not groups or not all(groups):
+                return []
+
+            # 先用文档数最少的词项组确定候选集，再依次求交集
+            group_docs = []
+            for group in groups:
+                docs = set()
+                for term in group:
+                    docs.update(self._postings[term])
+                group_docs.append(docs)
+            group_docs.sort(key=len)
+            candidates = group_docs[0]
+            for docs in group_docs[1:]:
+                candidates = candidates & docs
+                if not candidates:
+                    return []
+
+            # BM25: boost * idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * 字段长度 / 平均长度))
+            total_docs = len(self._documents)
+            length_factors = {
+                name: BM25_K1 * BM25_B * total_docs / total for name, total in self._field_totals.items() if total
+            }
+            scores = dict.fromkeys(candidates, 0.0)
+            for group in groups:
+                for term in group:
+                    postings = self._postings[term]
+                    idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                    weights = {name: boost * idf * (BM25_K1 + 1) for name, boost in self.field_boosts.items()}
+                    # 遍历候选集和倒排表中较小的一个
+                    if len(candidates) < len(postings):
+                        matches = ((doc_id, postings.get(doc_id)) for doc_id in candidates)
+                    else:
+                        matches = ((doc_id, postings[doc_id]) for doc_id in postings if doc_id in scores)
+                    for doc_id, field_frequencies in matches:
+                        if not field_frequencies:
+                            continue
+                        lengths = self._lengths[doc_id]
+                        score = 0.0
+                        for name, frequency in field_frequencies.items():
+                            norm = BM25_K1 * (1 - BM25_B) + length_factors[name] * lengths[name]
+                            score += weights[name] * frequency / (frequency + norm)
+                        scores[doc_id] += score
+
+        if limit is not None:
+            return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
@@ -161,12 +161,14 @@ document.addEventListener('DOMContentLoaded', () => {
         
         if (result.success) {
           progressBar.style.width = '100%';
-          statusText.textContent = '上传成功！正在重定向...';
+          statusText.textContent = result.duplicates && result.duplicates.length
+            ? `${result.message}，正在重定向...`
+            : '上传成功！正在重定向...';
           setTimeout(() => {
             window.location.href = result.task_id 
               ? `${TASKS_URL}/${result.task_id}`
               : TASKS_URL;
-          }, 1000);
+          }, result.duplicates && result.duplicates.length ? 3000 : 1000);
         } else {
           throw new Error(result.message || '上传失败');
         }
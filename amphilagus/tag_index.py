@@ -0,0 +1,321 @@
+"""
+标签倒排索引模块
+在内存中维护标签到文件集合的映射，用于按标签筛选文件：
+- 文件集合用位图表示（Python整数，第i位对应文件ID为i的文件），集合运算即位运算
+- 每个标签记录直接带有该标签的文件（精确匹配），以及带有该标签或其任一后代标签的文件（包含子类）
+- 标签的祖先闭包预先计算，文件增删标签时只更新相关祖先的位图，标签或父标签变化时重新计算闭包
+- 支持AND/OR/NOT组合的布尔查询表达式
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 查询表达式的词法单元：括号、带引号的标签名或不含空白和括号的标签名
+_TOKEN_PATTERN = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+
+# 查询表达式中的运算符关键字（不区分大小写）
+_OPERATORS = {'AND': 'AND', '&': 'AND', 'OR': 'OR', '|': 'OR', 'NOT': 'NOT', '-': 'NOT', '!': 'NOT'}
+
+# bitmap_ids每次处理的位数
+_WORD_BITS = 256
+_WORD_MASK = (1 << _WORD_BITS) - 1
+
+
+def bitmap_ids(bitmap: int) -> List[int]:
+    """
+    获取位图中所有为1的位，即文件ID列表（升序）
+
+    Args:
+        bitmap: 文件位图
+
+    Returns:
+        文件ID列表
+    """
+    ids = []
+    base = 0
+    while bitmap:
+        # 跳过低位连续的0，再在一个字内逐个取出最低的为1的位；按字移位避免每取一位都复制整个大整数
+        shift = (bitmap & -bitmap).bit_length() - 1
+        bitmap >>= shift
+        base += shift
+        word = bitmap & _WORD_MASK
+        while word:
+            lowest = word & -word
+            ids.append(base + lowest.bit_length() - 1)
+            word ^= lowest
+        bitmap >>= _WORD_BITS
+        base += _WORD_BITS
+    return ids
+
+
+def parse_query(expression: str) -> tuple:
+    """
+    解析布尔标签查询表达式
+
+    语法（运算符不区分大小写，需用空白与标签名分开，紧贴标签名的 ! 或 - 除外；
+    优先级 NOT > AND > OR，相邻的标签之间默认为AND）:
+        A AND (B OR C) AND NOT D
+        A & (B | C) & !D
+        "带 空格 的标签" OR E
+
+    Args:
+        expression: 查询表达式
+
+    Returns:
+        语法树: ('tag', 名称) | ('not', 子树) | ('and', 子树列表) | ('or', 子树列表)
+
+    Raises:
+        ValueError: 表达式语法错误
+    """
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN_PATTERN.match(expression, position)
+        if not match:
+            raise ValueError(f"无法解析查询表达式: {expression[position:]}")
+        position = match.end()
+        left, right, quoted, word = match.groups()
+        if left:
+            tokens.append(('(', None))
+        elif right:
+            tokens.append((')', None))
+        elif quoted is not None:
+            tokens.append(('tag', re.sub(r'\\(.)', r'\1', quoted)))
+        elif word.upper() in _OPERATORS:
+            tokens.append((_OPERATORS[word.upper()], None))
+        elif word[0] in '!-' and len(word) > 1:
+            # 紧贴标签名的 ! 或 - 表示NOT，如 !D
+            tokens.extend([('NOT', None), ('tag', word[1:])])
+        else:
+            tokens.append(('tag', word))
+    if not tokens:
+        raise ValueError("查询表达式为空")
+
+    index = 0
+
+    def peek():
+        return tokens[index][0] if index < len(tokens) else None
+
+    def take(kind):
+        nonlocal index
+        if peek() != kind:
+            found = tokens[index][1] or tokens[index][0] if index < len(tokens) else "表达式结尾"
+            raise ValueError(f"查询表达式语法错误: 期望 {kind}，实际为 {found}")
+        token = tokens[index]
+        index += 1
+        return token
+
+    def parse_or():
+        terms = [parse_and()]
+        while peek() == 'OR':
+            take('OR')
+            terms.append(parse_and())
+        return terms[0] if len(terms) == 1 else ('or', terms)
+
+    def parse_and():
+        factors = [parse_not()]
+        while peek() in ('AND', 'NOT', 'tag', '('):
+            if peek() == 'AND':
+                take('AND')
+            factors.append(parse_not())
+        return factors[0] if len(factors) == 1 else ('and', factors)
+
+    def parse_not():
+        if peek() == 'NOT':
+            take('NOT')
+            return ('not', parse_not())
+        if peek() == '(':
+            take('(')
+            node = parse_or()
+            take(')')
+            return node
+        return ('tag', take('tag')[1])
+
+    tree = parse_or()
+    if index != len(tokens):
+        raise ValueError(f"查询表达式语法错误: 多余的 {tokens[index][1] or tokens[index][0]}")
+    return tree
+
+
+class TagIndex:
+    """
+    标签倒排索引
+
+    用法:
+        index = TagIndex.build(parents, file_tags)
+        bitmap = index.match(all_tags=["忆阻器"], exclude_tags=["综述"])
+        file_ids = bitmap_ids(bitmap)
+    """
+
+    def __init__(self):
+        self.parents: Dict[str, Optional[str]] = {}
+        # 标签的祖先闭包，包括标签本身
+        self.ancestors: Dict[str, Tuple[str, ...]] = {}
+        # 直接带有标签的文件位图
+        self.exact: Dict[str, int] = {}
+        # 带有标签或其任一后代标签的文件位图
+        self.closure: Dict[str, int] = {}
+        # 每个文件的标签，用于移除标签时判断祖先位图是否仍需保留该文件
+        self.file_tags: Dict[int, Set[str]] = {}
+        self.all_files = 0
+
+    @classmethod
+    def build(cls, parents: Dict[str, Optional[str]], file_tags: Iterable[Tuple[int, str]],
+              file_ids: Iterable[int] = ()) -> "TagIndex":
+        """
+        从标签层级和文件标签关系构建索引
+
+        Args:
+            parents: 标签名 -> 父标签名（没有父标签时为None）
+            file_tags: (文件ID, 标签名) 列表
+            file_ids: 所有文件ID（包括没有标签的文件），用于NOT运算
+        """
+        index = cls()
+        index.parents = dict(parents)
+        for file_id in file_ids:
+            index.file_tags.setdefault(file_id, set())
+            index.all_files |= 1 << file_id
+        for file_id, tag in file_tags:
+            index.file_tags.setdefault(file_id, set()).add(tag)
+            index.exact[tag] = index.exact.get(tag, 0) | (1 << file_id)
+            index.all_files |= 1 << file_id
+        index._rebuild_closure()
+        return index
+
+    def _ancestors_of(self, tag: str) -> Tuple[str, ...]:
+        chain = [tag]
+        parent = self.parents.get(tag)
+        while parent is not None and parent not in chain:
+            chain.append(parent)
+            parent = self.parents.get(parent)
+        return tuple(chain)
+
+    def _rebuild_closure(self) -> None:
+        """重新计算所有标签的祖先闭包和包含子类的位图"""
+        self.ancestors = {tag: self._ancestors_of(tag) for tag in set(self.parents) | set(self.exact)}
+        closure: Dict[str, int] = {}
+        for tag, bitmap in self.exact.items():
+            for ancestor in self.ancestors[tag]:
+                closure[ancestor] = closure.get(ancestor, 0) | bitmap
+        self.closure = closure
+
+    # ---------- 维护 ----------
+
+    def set_tag(self, name: str, parent: Optional[str] = None) -> None:
+        """添加标签或修改标签的父标签"""
+        self.parents[name] = parent
+        self._rebuild_closure()
+
+    def remove_tag(self, name: str) -> None:
+        """删除标签，并从所有文件中移除该标签"""
+        self.parents.pop(name, None)
+        bitmap = self.exact.pop(name, 0)
+        for file_id in bitmap_ids(bitmap):
+            self.file_tags[file_id].discard(name)
+        self._rebuild_closure()
+
+    def add_file_tags(self, file_id: int, tags: Iterable[str]) -> None:
+        """为文件添加标签（文件不存在时同时添加文件）"""
+        bit = 1 << file_id
+        self.all_files |= bit
+        current = self.file_tags.setdefault(file_id, set())
+        for tag in tags:
+            if tag in current:
+                continue
+            current.add(tag)
+            self.exact[tag] = self.exact.get(tag, 0) | bit
+            if tag not in self.ancestors:
+                self.ancestors[tag] = self._ancestors_of(tag)
+            for ancestor in self.ancestors[tag]:
+                self.closure[ancestor] = self.closure.get(ancestor, 0) | bit
+
+    def remove_file_tags(self, file_id: int, tags: Iterable[str]) -> None:
+        """移除文件的标签"""
+        current = self.file_tags.get(file_id)
+        if not current:
+            return
+        removed = [tag for tag in tags if tag in current]
+        if not removed:
+            return
+        current.difference_update(removed)
+        mask = ~(1 << file_id)
+        # 文件剩余标签的祖先仍然包含该文件
+        kept = {ancestor for tag in current for ancestor in self.ancestors.get(tag, (tag,))}
+        for tag in removed:
+            self.exact[tag] &= mask
+            for ancestor in self.ancestors.get(tag, (tag,)):
+                if ancestor not in kept:
+                    self.closure[ancestor] &= mask
+
+    def set_file_tags(self, file_id: int, tags: Iterable[str]) -> None:
+        """设置文件的全部标签"""
+        tags = set(tags)
+        self.remove_file_tags(file_id, self.file_tags.get(file_id, set()) - tags)
+        self.add_file_tags(file_id, tags)
+
+    def remove_file(self, file_id: int) -> None:
+        """删除文件"""
+        self.remove_file_tags(file_id, list(self.file_tags.get(file_id, ())))
+        self.file_tags.pop(file_id, None)
+        self.all_files &= ~(1 << file_id)
+
+    # ---------- 查询 ----------
+
+    def files_with(self, tag: str, include_subclasses: bool = True) -> int:
+        """获取带有标签的文件位图，不在标签注册表中的标签没有匹配的文件"""
+        if tag not in self.parents:
+            return 0
+        return (self.closure if include_subclasses else self.exact).get(tag, 0)
+
+    def match(self, all_tags: Iterable[str] = (), any_tags: Iterable[str] = (),
+              exclude_tags: Iterable[str] = (), include_subclasses: bool = True) -> int:
+        """
+        组合查询
+
+        Args:
+            all_tags: 必须带有的标签（AND）
+            any_tags: 至少带有其中一个的标签（OR），为空时不限制
+            exclude_tags: 不能带有的标签（NOT）
+            include_subclasses: 是否包含子类标签
+
+        Returns:
+            匹配的文件位图
+        """
+        result = self.all_files
+        for tag in all_tags:
+            result &= self.files_with(tag, include_subclasses)
+        any_tags = list(any_tags)
+        if any_tags:
+            matched = 0
+            for tag in any_tags:
+                matched |= self.files_with(tag, include_subclasses)
+            result &= matched
+        for tag in exclude_tags:
+            result &= ~self.files_with(tag, include_subclasses)
+        return result
+
+    def evaluate(self, tree: tuple, include_subclasses: bool = True) -> int:
+        """计算parse_query得到的语法树，返回匹配的文件位图"""
+        kind, value = tree
+        if kind == 'tag':
+            return self.files_with(value, include_subclasses)
+        if kind == 'not':
+            return self.all_files & ~self.evaluate(value, include_subclasses)
+        if kind == 'and':
+            result = self.all_files
+            for child in value:
+                result &= self.evaluate(child, include_subclasses)
+            return result
+        result = 0
+        for child in value:
+            result |= self.evaluate(child, include_subclasses)
+        return result
+
+    def query(self, expression: str, include_subclasses: bool = True) -> int:
+        """
+        执行布尔查询表达式（语法见parse_query）
+
+        Raises:
+            ValueError: 表达式语法错误
+        """
+        return self.evaluate(parse_query(expression), include_subclasses)
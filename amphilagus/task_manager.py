@@ -8,7 +8,6 @@ import time
 import uuid
 import json
 import threading
-import queue
 from datetime import datetime
 from pathlib import Path
 import tempfile
@@ -17,11 +16,21 @@ from .logger import get_logger
 from .file_manager import FileManager, Tag
 from werkzeug.utils import secure_filename
 from . import config
-from .utils.pdf_converter.pdf2md import convert_pdf_to_markdown
+from .utils.pdf_converter.marker_pool import MarkerWorkerPool
+from .task_store import TaskStore
 
 # 配置日志
 logger = get_logger('task_manager')
 
+
+class TaskStopped(Exception):
+    """任务在检查点处响应取消或抢占请求而停止"""
+    
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
 class Task:
     """任务类，表示一个文件处理任务"""
     
@@ -29,10 +38,20 @@ class Task:
     STATUS_PROCESSING = 'processing'
     STATUS_COMPLETED = 'completed'
     STATUS_FAILED = 'failed'
+    STATUS_CANCELLED = 'cancelled'
+    
+    # 交互式任务（如上传单个PDF）优先于批量任务执行，并可抢占正在运行的批量任务
+    PRIORITY_INTERACTIVE = 'interactive'
+    PRIORITY_BULK = 'bulk'
     
-    def __init__(self, task_id=None, task_type=None, files=None, params=None):
+    # 停止请求的原因
+    STOP_CANCEL = 'cancel'
+    STOP_PREEMPT = 'preempt'
+    
+    def __init__(self, task_id=None, task_type=None, files=None, params=None, priority=None):
         self.task_id = task_id or str(uuid.uuid4())
         self.task_type = task_type
+        self.priority = priority or self.PRIORITY_BULK
         self.status = self.STATUS_PENDING
         self.progress = 0
         self.files = files or []
@@ -42,12 +61,20 @@ class Task:
         self.completed_at = None
         self.error = None
         self.result = {}
+        self.checkpoint = {}  # 断点信息，重启后据此继续执行
+        self.stop_requested = None  # 取消或抢占请求，任务在下一个检查点处停止
+        # 实时进度（不持久化）：已完成/总数及各任务类型的附加信息，version在每次变化时递增
+        self.detail = {}
+        self.version = 0
+        self.run_started = None  # 本次运行开始统计速度的时间和当时的完成数，用于计算吞吐量和剩余时间
+        self.run_done_start = 0
     
     def to_dict(self):
         """转换为字典格式"""
         return {
             'task_id': self.task_id,
             'task_type': self.task_type,
+            'priority': self.priority,
             'status': self.status,
             'progress': self.progress,
             'file_count': len(self.files),
@@ -59,6 +86,13 @@ class Task:
             'result': self.result
         }
     
+    def to_record(self):
+        """转换为存储记录，比to_dict多包含文件列表和断点"""
+        data = self.to_dict()
+        data['files'] = self.files
+        data['checkpoint'] = self.checkpoint
+        return data
+    
     @classmethod
     def from_dict(cls, data):
         """从字典创建任务"""
@@ -66,7 +100,8 @@ class Task:
             task_id=data.get('task_id'),
             task_type=data.get('task_type'),
             files=data.get('files', []),
-            params=data.get('params', {})
+            params=data.get('params', {}),
+            priority=data.get('priority')
         )
         task.status = data.get('status', cls.STATUS_PENDING)
         task.progress = data.get('progress', 0)
@@ -75,6 +110,7 @@ class Task:
         task.completed_at = datetime.fromisoformat(data.get('completed_at')) if data.get('completed_at') else None
         task.error = data.get('error')
         task.result = data.get('result', {})
+        task.checkpoint = data.get('checkpoint') or {}
         return task
 
 
@@ -90,28 +126,54 @@ class TaskManager:
             cls._instance = cls(storage_path, file_manager, db_manager)
         return cls._instance
     
-    def __init__(self, storage_path=None, file_manager=None, db_manager=None):
-        """初始化任务管理器"""
+    def __init__(self, storage_path=None, file_manager=None, db_manager=None, workers=None, concurrency=None):
+        """
+        初始化任务管理器
+
+        Args:
+            storage_path: 任务存储目录
+            file_manager: FileManager实例
+            db_manager: DatabaseManager实例
+            workers: 工作线程数量，默认使用config.TASK_WORKERS
+            concurrency: 各任务类型同时运行的上限，默认使用config.TASK_CONCURRENCY
+        """
         if storage_path is None:
             storage_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tasks')
         
         self.storage_path = Path(storage_path)
         self.file_manager = file_manager
         self.db_manager = db_manager
-        self.task_queue = queue.Queue()
         self.tasks = {}  # 任务ID到任务对象的映射
-        self.current_task = None
-        self.is_processing = False
-        self.worker_thread = None
+        self.pending = []  # 等待调度的任务，按提交顺序排列
+        self.running = {}  # 任务ID到正在处理的任务对象的映射
+        self.num_workers = max(1, workers or config.TASK_WORKERS)
+        self.concurrency = dict(config.TASK_CONCURRENCY if concurrency is None else concurrency)
+        self.worker_threads = []
+        # 保护任务表、等待队列和任务存储；任务入队或结束时通过条件变量唤醒工作线程
+        self._lock = threading.RLock()
+        self._task_available = threading.Condition(self._lock)
+        # FileManager不是线程安全的，并发任务修改文件元数据时需要串行
+        self._file_lock = threading.Lock()
+        self.store = TaskStore(self.storage_path / 'tasks.sqlite3')
+        # 任务状态或进度变化时通知订阅者（如SSE连接）
+        self._progress_changed = threading.Condition()
+        # 常驻的Marker转换进程，模型只在进程启动时加载一次
+        self.marker_pool = MarkerWorkerPool(
+            workers=config.MARKER_WORKERS,
+            max_jobs_per_worker=config.MARKER_MAX_JOBS_PER_WORKER,
+            max_memory_mb=config.MARKER_MAX_MEMORY_MB,
+            job_timeout=config.MARKER_JOB_TIMEOUT
+        )
         
         # 确保存储目录存在
         os.makedirs(self.storage_path, exist_ok=True)
         
-        # 从磁盘加载任务
+        # 从磁盘加载任务，并重新排队未完成的任务
         self._load_tasks()
+        self._requeue_tasks()
         
         # 启动工作线程
-        self._start_worker()
+        self._start_workers()
         
         logger.info(f"任务管理器初始化完成，存储路径: {self.storage_path}")
     
@@ -120,58 +182,250 @@ class TaskManager:
         try:
             tasks_file = self.storage_path / 'tasks.json'
             if tasks_file.exists():
-                with open(tasks_file, 'r', encoding='utf-8') as f:
-                    tasks_data = json.load(f)
-                    for task_data in tasks_data:
-                        task = Task.from_dict(task_data)
-                        self.tasks[task.task_id] = task
-                logger.info(f"从磁盘加载了 {len(self.tasks)} 个任务")
-            else:
-                logger.debug(f"任务文件不存在：{tasks_file}")
+                # 旧版本的JSON任务文件，导入到SQLite存储
+                self.store.import_json(str(tasks_file))
+            self.store.apply_retention(config.TASK_RETENTION_DAYS, config.TASK_RETENTION_MAX_FINISHED)
+            for task_data in self.store.load_all():
+                task = Task.from_dict(task_data)
+                self.tasks[task.task_id] = task
+            logger.info(f"从磁盘加载了 {len(self.tasks)} 个任务")
         except Exception as e:
             logger.error(f"加载任务失败: {str(e)}")
     
-    def _save_tasks(self):
-        """保存任务到磁盘"""
+    def _requeue_tasks(self):
+        """重新排队等待中的任务和进程退出时被中断的任务"""
+        for task_id in self.store.ids_with_status(Task.STATUS_PENDING, Task.STATUS_PROCESSING):
+            task = self.tasks.get(task_id)
+            if task is None:
+                continue
+            if task.status == Task.STATUS_PROCESSING:
+                # 中断的任务从断点继续执行
+                task.status = Task.STATUS_PENDING
+                task.checkpoint['interrupted'] = task.checkpoint.get('interrupted', 0) + 1
+                self._save_task(task)
+                logger.info(f"任务 {task_id} 在上次运行时被中断，将从断点继续执行")
+            self._enqueue(task)
+        if self.pending:
+            logger.info(f"重新排队了 {len(self.pending)} 个未完成的任务")
+    
+    def _save_task(self, task):
+        """保存单个任务的完整记录（状态变化时调用）"""
         try:
-            tasks_data = [task.to_dict() for task in self.tasks.values()]
-            tasks_file = self.storage_path / 'tasks.json'
-            with open(tasks_file, 'w', encoding='utf-8') as f:
-                json.dump(tasks_data, f, ensure_ascii=False, indent=2)
-            logger.debug(f"已将 {len(tasks_data)} 个任务保存到磁盘")
+            self.store.save(task.to_record())
+        except Exception as e:
+            logger.error(f"保存任务 {task.task_id} 失败: {str(e)}")
+        self._publish(task)
+    
+    def _save_checkpoint(self, task):
+        """保存任务断点和进度"""
+        try:
+            self.store.update_checkpoint(task.task_id, task.checkpoint, task.progress)
+        except Exception as e:
+            logger.error(f"保存任务 {task.task_id} 断点失败: {str(e)}")
+        self._publish(task)
+    
+    def _save_progress(self, task):
+        """只保存任务进度"""
+        try:
+            self.store.update_progress(task.task_id, task.progress)
         except Exception as e:
-            logger.error(f"保存任务失败: {str(e)}")
+            logger.error(f"保存任务 {task.task_id} 进度失败: {str(e)}")
+        self._publish(task)
+    
+    def _set_detail(self, task, done, total, **extra):
+        """
+        更新任务的实时进度，不写入存储也不通知订阅者（随后的保存或_publish会通知）
+
+        Args:
+            task: 任务对象
+            done: 已完成的数量（文件数）
+            total: 总数量
+            **extra: 附加信息，如当前文件、已写入的片段数
+        """
+        if task.run_started is None:
+            task.run_started = time.monotonic()
+            task.run_done_start = done
+        task.detail.update(extra, done=done, total=total)
+    
+    def _publish(self, task):
+        """通知订阅者任务有变化"""
+        with self._progress_changed:
+            task.version += 1
+            self._progress_changed.notify_all()
     
-    def _start_worker(self):
+    def wait_for_update(self, task_id, last_version, timeout=15.0):
+        """
+        阻塞等待任务状态或进度变化，供SSE等推送接口使用
+
+        Args:
+            task_id: 任务ID
+            last_version: 订阅者已收到的版本号，首次调用传入None立即返回当前状态
+            timeout: 最长等待秒数
+
+        Returns:
+            (版本号, 任务状态)，任务已被删除时任务状态为None；超时且没有变化时返回None
+        """
+        deadline = time.monotonic() + timeout
+        with self._progress_changed:
+            while True:
+                task = self.tasks.get(task_id)
+                if task is None:
+                    return last_version, None
+                if task.version != last_version:
+                    version = task.version
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._progress_changed.wait(remaining)
+        return version, self.get_task_status(task_id)
+
+    def wait_for_updates(self, last_versions, timeout=15.0):
+        """
+        阻塞等待任一未结束任务的状态或进度变化，供多路复用的SSE接口使用
+
+        Args:
+            last_versions: 订阅者已收到的{任务ID: 版本号}，首次调用传入None立即返回所有未结束的任务
+            timeout: 最长等待秒数
+
+        Returns:
+            (版本号, 有变化的任务状态列表, 已被删除的任务ID列表)；超时且没有变化时返回None。
+            返回的版本号只包含未结束的任务，任务结束后推送一次最终状态即不再跟踪
+        """
+        first = last_versions is None
+        last_versions = last_versions or {}
+        active = (Task.STATUS_PENDING, Task.STATUS_PROCESSING)
+        deadline = time.monotonic() + timeout
+        with self._progress_changed:
+            while True:
+                tasks = list(self.tasks.values())
+                changed = [task.task_id for task in tasks
+                           if (task.status in active or task.task_id in last_versions)
+                           and task.version != last_versions.get(task.task_id)]
+                current_ids = {task.task_id for task in tasks}
+                deleted = [task_id for task_id in last_versions if task_id not in current_ids]
+                if first or changed or deleted:
+                    versions = {task.task_id: task.version for task in tasks if task.status in active}
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._progress_changed.wait(remaining)
+        statuses = [status for status in map(self.get_task_status, changed) if status]
+        return versions, statuses, deleted
+
+    def _apply_retention(self):
+        """按保留策略清理已结束的旧任务"""
+        try:
+            expired = self.store.apply_retention(config.TASK_RETENTION_DAYS, config.TASK_RETENTION_MAX_FINISHED)
+        except Exception as e:
+            logger.error(f"清理旧任务失败: {str(e)}")
+            return
+        with self._lock:
+            for task_id in expired:
+                self.tasks.pop(task_id, None)
+    
+    def _start_workers(self):
         """启动工作线程"""
-        if self.worker_thread is None or not self.worker_thread.is_alive():
-            self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
-            self.worker_thread.start()
-            logger.info("工作线程已启动")
+        for index in range(self.num_workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"task-worker-{index}", daemon=True)
+            thread.start()
+            self.worker_threads.append(thread)
+        logger.info(f"已启动 {self.num_workers} 个工作线程，并发上限: {self.concurrency}")
+    
+    @staticmethod
+    def _exclusive_key(task):
+        """同一资源上的任务互斥执行：同一集合同时只有一个嵌入或同步任务写入"""
+        if task.task_type in ('batch_embed', 'collection_sync'):
+            return ('collection', task.params.get('collection_name'))
+        return None
+    
+    def _can_start(self, task, running=None):
+        """检查任务是否满足并发限制，调用时需持有锁"""
+        running = list(self.running.values()) if running is None else running
+        if len(running) >= self.num_workers:
+            return False
+        limit = self.concurrency.get(task.task_type)
+        if limit is not None and sum(1 for t in running if t.task_type == task.task_type) >= limit:
+            return False
+        key = self._exclusive_key(task)
+        if key is not None and any(self._exclusive_key(t) == key for t in running):
+            return False
+        return True
+    
+    def _next_task(self):
+        """按优先级取出第一个可以开始的任务，没有时返回None，调用时需持有锁"""
+        for priority in (Task.PRIORITY_INTERACTIVE, Task.PRIORITY_BULK):
+            for index, task in enumerate(self.pending):
+                if task.priority == priority and self._can_start(task):
+                    del self.pending[index]
+                    self.running[task.task_id] = task
+                    return task
+        return None
+    
+    def _enqueue(self, task, front=False):
+        """把任务放入等待队列并唤醒一个空闲的工作线程"""
+        with self._task_available:
+            if front:
+                self.pending.insert(0, task)
+            else:
+                self.pending.append(task)
+            if task.priority == Task.PRIORITY_INTERACTIVE:
+                self._preempt_for(task)
+            self._task_available.notify()
+    
+    def _preempt_for(self, task):
+        """
+        交互式任务无法立即开始时，请求一个正在运行的批量任务在下一个检查点处让出位置，
+        被抢占的任务重新排队并从断点继续。调用时需持有锁
+        """
+        running = list(self.running.values())
+        if self._can_start(task, running):
+            return
+        # 等待中的交互式任务（包括本任务）各需要一个位置，已在让出的批量任务会释放位置
+        yielding = sum(1 for t in running if t.stop_requested)
+        waiting = sum(1 for t in self.pending if t.priority == Task.PRIORITY_INTERACTIVE)
+        if yielding >= waiting:
+            return
+        candidates = [t for t in running if t.priority == Task.PRIORITY_BULK and not t.stop_requested]
+        # 优先抢占最近开始的任务，损失的进度最少
+        candidates.sort(key=lambda t: t.started_at or datetime.min, reverse=True)
+        for victim in candidates:
+            if self._can_start(task, [t for t in running if t is not victim]):
+                victim.stop_requested = Task.STOP_PREEMPT
+                logger.info(f"交互式任务 {task.task_id} 抢占批量任务 {victim.task_id}")
+                return
+    
+    def _check_stop(self, task):
+        """检查点：任务收到取消或抢占请求时抛出TaskStopped"""
+        if task.stop_requested:
+            raise TaskStopped(task.stop_requested)
     
     def _worker_loop(self):
-        """工作线程主循环"""
-        logger.debug("工作线程主循环开始运行")
+        """工作线程主循环，没有可执行的任务时阻塞在条件变量上"""
+        logger.debug(f"工作线程 {threading.current_thread().name} 开始运行")
         while True:
+            with self._task_available:
+                task = self._next_task()
+                while task is None:
+                    self._task_available.wait()
+                    task = self._next_task()
+            logger.debug(f"{threading.current_thread().name} 获取到任务：{task.task_id}")
             try:
-                # 如果当前没有处理任务，则从队列中获取一个
-                if not self.is_processing:
-                    try:
-                        task = self.task_queue.get(timeout=1)  # 1秒超时
-                        self.current_task = task
-                        self.is_processing = True
-                        logger.debug(f"从队列中获取到任务：{task.task_id}")
-                        self._process_task(task)
-                    except queue.Empty:
-                        # 队列为空，继续等待
-                        pass
-                else:
-                    # 等待当前任务完成
-                    time.sleep(0.5)
+                self._process_task(task)
             except Exception as e:
                 logger.error(f"工作线程处理出错: {str(e)}")
-                self.is_processing = False
-                self.current_task = None
+            finally:
+                with self._task_available:
+                    self.running.pop(task.task_id, None)
+                    task.stop_requested = None
+                    if task.status == Task.STATUS_PENDING:
+                        # 被抢占的任务排到队首，交互式任务执行完后从断点继续
+                        self.pending.insert(0, task)
+                    # 释放了并发名额，被限制的任务可能可以开始了
+                    self._task_available.notify_all()
+                self._apply_retention()
+                logger.debug(f"任务 {task.task_id} 处理结束，等待中的任务数: {len(self.pending)}")
     
     def _process_task(self, task):
         """处理任务"""
@@ -179,7 +433,8 @@ class TaskManager:
             logger.info(f"开始处理任务: {task.task_id}, 类型: {task.task_type}")
             task.status = Task.STATUS_PROCESSING
             task.started_at = datetime.now()
-            self._save_tasks()
+            task.detail, task.run_started = {}, None
+            self._save_task(task)
             
             # 根据任务类型处理
             if task.task_type == 'file_upload':
@@ -191,6 +446,9 @@ class TaskManager:
             elif task.task_type == 'batch_clean':
                 logger.info(f"处理批量清洗任务: {task.task_id}")
                 self._process_batch_clean_task(task)
+            elif task.task_type == 'collection_sync':
+                logger.info(f"处理集合同步任务: {task.task_id}")
+                self._process_collection_sync_task(task)
             else:
                 task.error = f"未知任务类型: {task.task_type}"
                 task.status = Task.STATUS_FAILED
@@ -205,19 +463,25 @@ class TaskManager:
                 logger.error(f"任务 {task.task_id} 处理失败: {task.error}")
             
             task.completed_at = datetime.now()
-            self._save_tasks()
+            self._save_task(task)
             logger.info(f"任务处理完成: {task.task_id}, 状态: {task.status}, 耗时: {(task.completed_at - task.started_at).total_seconds():.2f}秒")
+        except TaskStopped as e:
+            if e.reason == Task.STOP_PREEMPT:
+                # 让位给交互式任务，重新排队后从断点继续
+                task.status = Task.STATUS_PENDING
+                task.checkpoint['preempted'] = task.checkpoint.get('preempted', 0) + 1
+                logger.info(f"任务 {task.task_id} 被抢占，已保存断点并重新排队")
+            else:
+                task.status = Task.STATUS_CANCELLED
+                task.completed_at = datetime.now()
+                logger.info(f"任务 {task.task_id} 已取消")
+            self._save_task(task)
         except Exception as e:
             logger.error(f"处理任务 {task.task_id} 出错: {str(e)}")
             task.status = Task.STATUS_FAILED
             task.error = str(e)
             task.completed_at = datetime.now()
-            self._save_tasks()
-        finally:
-            self.is_processing = False
-            self.current_task = None
-            self.task_queue.task_done()
-            logger.debug(f"任务 {task.task_id} 处理结束，任务队列剩余任务数: {self.task_queue.qsize()}")
+            self._save_task(task)
     
     def _process_file_upload_task(self, task):
         """处理文件上传任务"""
@@ -241,228 +505,281 @@ class TaskManager:
         logger.info(f"文件上传任务参数: 标签={tags}, 使用LLM={use_llm}, 清理MD={clean_md}")
         
         total_files = len(task.files)
-        processed_files = 0
-        results = {'success': [], 'error': []}
+        # 断点续传：跳过中断前已处理的文件，沿用已有的结果
+        done_files = set(task.checkpoint.get('done_files', []))
+        processed_files = len(done_files)
+        results = task.checkpoint.get('results') or {'success': [], 'error': []}
+        if done_files:
+            logger.info(f"从断点继续文件上传任务，已处理 {len(done_files)}/{total_files} 个文件")
+        
+        def mark_done(index):
+            # 记录已处理的文件和当前结果，重启后从下一个文件继续
+            task.checkpoint['done_files'] = task.checkpoint.get('done_files', []) + [index]
+            task.checkpoint['results'] = results
+            self._save_checkpoint(task)
+        
+        # PDF按顺序提交给转换进程，转换与后续文件的处理重叠进行。转换进程由所有任务共享且按提交顺序处理，
+        # 每个任务最多同时提交与转换进程数相同的PDF，避免批量任务占满队列使后来的小任务长时间等待
+        conversions = {}
+        pending_pdfs = iter([
+            index for index, file_info in enumerate(task.files)
+            if index not in done_files and file_info.get('filename', '').lower().endswith('.pdf')
+        ] if config.PDF_CONVERTER_AVAILABLE else [])
+        
+        def submit_conversions():
+            while len(conversions) < self.marker_pool.workers:
+                index = next(pending_pdfs, None)
+                if index is None:
+                    return
+                filename = task.files[index].get('filename')
+                temp_path = task.files[index].get('temp_path')
+                if not os.path.exists(temp_path):
+                    continue
+                # 不使用with语句，手动创建临时目录以便于调试
+                # 使用mkdtemp()创建一个持久的临时目录，放在暂存目录中，转换结果入库时可直接重命名
+                temp_output_dir = tempfile.mkdtemp(prefix=f"pdf_convert_{os.path.splitext(filename)[0]}_",
+                                                   dir=config.UPLOAD_TEMP_PATH)
+                logger.debug(f"提交PDF转换，输入路径: {temp_path}, 输出目录: {temp_output_dir}, 使用LLM: {use_llm}")
+                future = self.marker_pool.submit(temp_path, temp_output_dir, use_llm=use_llm)  # 使用用户选择的LLM选项
+                conversions[index] = (temp_output_dir, future)
         
-        for file_info in task.files:
-            filename = file_info.get('filename')
-            temp_path = file_info.get('temp_path')
+        try:
+            submit_conversions()
+            for index, file_info in enumerate(task.files):
+                if index in done_files:
+                    continue
+                self._check_stop(task)
+                filename = file_info.get('filename')
+                temp_path = file_info.get('temp_path')
             
-            logger.info(f"开始处理文件: {filename}")
+                logger.info(f"开始处理文件: {filename}")
+                self._set_detail(task, processed_files, total_files, current_file=filename)
+                self._publish(task)
             
-            if not os.path.exists(temp_path):
-                logger.error(f"临时文件不存在: {temp_path}")
-                results['error'].append({
-                    "filename": filename,
-                    "message": "临时文件不存在"
-                })
-                continue
+                if not os.path.exists(temp_path):
+                    logger.error(f"临时文件不存在: {temp_path}")
+                    results['error'].append({
+                        "filename": filename,
+                        "message": "临时文件不存在"
+                    })
+                    mark_done(index)
+                    continue
             
-            if not config.allowed_file(filename):
-                logger.error(f"不支持的文件类型: {filename}")
-                results['error'].append({
-                    "filename": filename,
-                    "message": f"不支持的文件类型 ({filename})"
-                })
-                continue
+                if not config.allowed_file(filename):
+                    logger.error(f"不支持的文件类型: {filename}")
+                    results['error'].append({
+                        "filename": filename,
+                        "message": f"不支持的文件类型 ({filename})"
+                    })
+                    mark_done(index)
+                    continue
             
-            # 检查是否为PDF文件
-            is_pdf = filename.lower().endswith('.pdf')
+                # 检查是否为PDF文件
+                is_pdf = filename.lower().endswith('.pdf')
             
-            # 如果是PDF文件且PDF转换器可用，转换为Markdown
-            if is_pdf and config.PDF_CONVERTER_AVAILABLE:
-                logger.info(f"处理PDF文件: {filename}")
-                
-                # 不使用with语句，手动创建临时目录以便于调试
-                import tempfile
-                # 使用mkdtemp()创建一个持久的临时目录
-                temp_output_dir = tempfile.mkdtemp(prefix=f"pdf_convert_{os.path.splitext(filename)[0]}_")
-                logger.info(f"创建临时目录: {temp_output_dir}")
+                # 如果是PDF文件且PDF转换器可用，转换为Markdown
+                if is_pdf and config.PDF_CONVERTER_AVAILABLE:
+                    logger.info(f"处理PDF文件: {filename}")
                 
-                # 调用PDF转换器
-                logger.debug(f"调用PDF转换器，输入路径: {temp_path}, 输出目录: {temp_output_dir}, 使用LLM: {use_llm}")
-                conversion_success = convert_pdf_to_markdown(
-                    input_path=temp_path,
-                    output_dir=temp_output_dir,
-                    use_llm=use_llm  # 使用用户选择的LLM选项
-                )
+                    # 等待转换进程完成该文件，然后补充提交后续的PDF
+                    temp_output_dir, future = conversions[index]
+                    try:
+                        conversion_success = future.result()
+                    except Exception as e:
+                        logger.error(f"PDF转换进程出错: {str(e)}")
+                        conversion_success = False
+                    del conversions[index]
+                    submit_conversions()
                 
-                # 处理转换结果
-                if conversion_success:
-                    logger.info(f"PDF文件 {filename} 转换成功")
-                    # 基本文件名（不含扩展名）
-                    base_name = os.path.splitext(filename)[0]
+                    # 处理转换结果
+                    if conversion_success:
+                        logger.info(f"PDF文件 {filename} 转换成功")
+                        # 基本文件名（不含扩展名）
+                        base_name = os.path.splitext(filename)[0]
                     
-                    # 查找生成的markdown文件和meta.json文件
-                    md_file_path = os.path.join(temp_output_dir, base_name, f"{base_name}.md")
-                    meta_json_path = os.path.join(temp_output_dir, base_name, f"{base_name}_meta.json")
+                        # 查找生成的markdown文件和meta.json文件
+                        md_file_path = os.path.join(temp_output_dir, base_name, f"{base_name}.md")
+                        meta_json_path = os.path.join(temp_output_dir, base_name, f"{base_name}_meta.json")
                     
-                    logger.debug(f"查找生成的文件: MD={md_file_path}, Meta={meta_json_path}")
+                        logger.debug(f"查找生成的文件: MD={md_file_path}, Meta={meta_json_path}")
 
-                    # 检查是否保持原文件名
-                    keep_original_filename = task.params.get('keep_original_filename', 'off') == 'on'
-                    if keep_original_filename:
-                        title = base_name
-                        logger.info(f"由于设置了保持原文件名选项，使用原文件名: {base_name}")
-                    else:
-                        # 如果meta.json文件存在，提取标题
-                        if os.path.exists(meta_json_path):
-                            try:
-                                with open(meta_json_path, 'r', encoding='utf-8') as f:
-                                    meta_data = json.load(f)
-                                    # 确定使用哪种标题提取策略
-                                    method = "first_non_empty"  # 目前只支持first_non_empty方法
-                                    journal = "default"  # 默认期刊配置
+                        # 检查是否保持原文件名
+                        keep_original_filename = task.params.get('keep_original_filename', 'off') == 'on'
+                        if keep_original_filename:
+                            title = base_name
+                            logger.info(f"由于设置了保持原文件名选项，使用原文件名: {base_name}")
+                        else:
+                            # 如果meta.json文件存在，提取标题
+                            if os.path.exists(meta_json_path):
+                                try:
+                                    with open(meta_json_path, 'r', encoding='utf-8') as f:
+                                        meta_data = json.load(f)
+                                        # 确定使用哪种标题提取策略
+                                        method = "first_non_empty"  # 目前只支持first_non_empty方法
+                                        journal = "default"  # 默认期刊配置
                                     
-                                    # 查找匹配的期刊类型标签
-                                    # 创建小写版本的配置键映射到原始键
-                                    journals = config.TITLE_EXTRACTOR_CONFIG.get(method, {}).get("journals", {})
-                                    lowercase_journal_keys = {k.lower(): k for k in journals.keys()}
+                                        # 查找匹配的期刊类型标签
+                                        # 创建小写版本的配置键映射到原始键
+                                        journals = config.TITLE_EXTRACTOR_CONFIG.get(method, {}).get("journals", {})
+                                        lowercase_journal_keys = {k.lower(): k for k in journals.keys()}
                                     
-                                    for tag in tags:
-                                        # 检查标签是否是已配置的期刊类型（忽略大小写）
-                                        if tag.lower() in lowercase_journal_keys:
-                                            # 使用原始大小写的配置键
-                                            journal = lowercase_journal_keys[tag.lower()]
-                                            logger.debug(f"找到匹配的期刊: {journal}")
-                                            break
+                                        for tag in tags:
+                                            # 检查标签是否是已配置的期刊类型（忽略大小写）
+                                            if tag.lower() in lowercase_journal_keys:
+                                                # 使用原始大小写的配置键
+                                                journal = lowercase_journal_keys[tag.lower()]
+                                                logger.debug(f"找到匹配的期刊: {journal}")
+                                                break
                                     
-                                    # 获取策略配置
-                                    journal_config = journals.get(journal, journals.get("default", {}))
-                                    start_index = journal_config.get("start_index", 0)
-                                    logger.info(f"使用标题提取方法: {method}, 期刊: {journal}, 起始索引: {start_index} ({journal_config.get('description', '无描述')})")
+                                        # 获取策略配置
+                                        journal_config = journals.get(journal, journals.get("default", {}))
+                                        start_index = journal_config.get("start_index", 0)
+                                        logger.info(f"使用标题提取方法: {method}, 期刊: {journal}, 起始索引: {start_index} ({journal_config.get('description', '无描述')})")
                                     
-                                    # 基于策略提取标题
-                                    title = base_name  # 默认使用基本文件名
+                                        # 基于策略提取标题
+                                        title = base_name  # 默认使用基本文件名
                                     
-                                    # 从目录中提取标题，使用start_index参数
-                                    if meta_data.get('table_of_contents') and len(meta_data['table_of_contents']) > 0:
-                                        # 找出所有非空标题
-                                        non_empty_titles = []
-                                        for toc_item in meta_data['table_of_contents']:
-                                            raw_title = toc_item.get('title', '')
-                                            if raw_title and raw_title.strip():
-                                                non_empty_titles.append(raw_title)
+                                        # 从目录中提取标题，使用start_index参数
+                                        if meta_data.get('table_of_contents') and len(meta_data['table_of_contents']) > 0:
+                                            # 找出所有非空标题
+                                            non_empty_titles = []
+                                            for toc_item in meta_data['table_of_contents']:
+                                                raw_title = toc_item.get('title', '')
+                                                if raw_title and raw_title.strip():
+                                                    non_empty_titles.append(raw_title)
                                         
-                                        # 根据start_index获取标题
-                                        if len(non_empty_titles) > start_index:
-                                            # 处理标题，移除换行符
-                                            raw_title = non_empty_titles[start_index]
-                                            # 如果当前标题包含"article"，则尝试使用下一个标题
-                                            if "article" in raw_title.lower() and start_index + 1 < len(non_empty_titles):
-                                                raw_title = non_empty_titles[start_index+1]
-                                            title = raw_title.replace('\n', ' ').strip()
-                                            logger.debug(f"从meta.json提取到标题 (索引 {start_index}): {title}")
+                                            # 根据start_index获取标题
+                                            if len(non_empty_titles) > start_index:
+                                                # 处理标题，移除换行符
+                                                raw_title = non_empty_titles[start_index]
+                                                # 如果当前标题包含"article"，则尝试使用下一个标题
+                                                if "article" in raw_title.lower() and start_index + 1 < len(non_empty_titles):
+                                                    raw_title = non_empty_titles[start_index+1]
+                                                title = raw_title.replace('\n', ' ').strip()
+                                                logger.debug(f"从meta.json提取到标题 (索引 {start_index}): {title}")
+                                            else:
+                                                logger.warning(f"meta.json中找不到索引为 {start_index} 的非空标题，使用默认标题: {title}")
                                         else:
-                                            logger.warning(f"meta.json中找不到索引为 {start_index} 的非空标题，使用默认标题: {title}")
-                                    else:
-                                        logger.warning(f"meta.json中没有table_of_contents或为空，使用默认标题: {title}")
-                            except (json.JSONDecodeError, KeyError, IndexError) as e:
-                                logger.error(f"从meta.json提取标题时出错: {str(e)}")
-                                title = base_name
-                        else:
-                            # 直接报错 终止程序
-                            logger.error(f"未找到meta.json文件，理论路径为：{meta_json_path}，临时目录：{temp_output_dir}")
-                            raise ValueError(f"未找到meta.json文件，理论路径为：{meta_json_path}，临时目录：{temp_output_dir}")
+                                            logger.warning(f"meta.json中没有table_of_contents或为空，使用默认标题: {title}")
+                                except (json.JSONDecodeError, KeyError, IndexError) as e:
+                                    logger.error(f"从meta.json提取标题时出错: {str(e)}")
+                                    title = base_name
+                            else:
+                                # 直接报错 终止程序
+                                logger.error(f"未找到meta.json文件，理论路径为：{meta_json_path}，临时目录：{temp_output_dir}")
+                                raise ValueError(f"未找到meta.json文件，理论路径为：{meta_json_path}，临时目录：{temp_output_dir}")
                         
-                    # 安全处理标题，去除非法字符
-                    safe_title = secure_filename(title)
-                    if not safe_title:
-                        safe_title = base_name
-                        logger.warning(f"安全处理后标题为空，使用基本文件名: {base_name}")
-                    else:
-                        logger.debug(f"安全处理后的标题: {safe_title}")
+                        # 安全处理标题，去除非法字符
+                        safe_title = secure_filename(title)
+                        if not safe_title:
+                            safe_title = base_name
+                            logger.warning(f"安全处理后标题为空，使用基本文件名: {base_name}")
+                        else:
+                            logger.debug(f"安全处理后的标题: {safe_title}")
                     
-                    # 如果markdown文件存在
-                    if os.path.exists(md_file_path):
-                        logger.debug(f"找到markdown文件: {md_file_path}")
-                        # 读取原始Markdown内容
-                        with open(md_file_path, 'r', encoding='utf-8') as src:
-                            md_content = src.read()
+                        # 如果markdown文件存在
+                        if os.path.exists(md_file_path):
+                            logger.debug(f"找到markdown文件: {md_file_path}")
+                            # 读取原始Markdown内容
+                            with open(md_file_path, 'r', encoding='utf-8') as src:
+                                md_content = src.read()
 
-                        # 如果选择了清理选项，则应用清理规则
-                        if clean_md:
-                            try:
-                                # 使用文件管理器清理Markdown内容
-                                logger.debug(f"请求清理Markdown，使用标签: {tags}")
-                                original_content = md_content
-                                md_content = self.file_manager.clean_markdown_content(md_content, tags)
+                            # 如果选择了清理选项，则应用清理规则
+                            if clean_md:
+                                try:
+                                    # 使用文件管理器清理Markdown内容
+                                    logger.debug(f"请求清理Markdown，使用标签: {tags}")
+                                    original_content = md_content
+                                    md_content = self.file_manager.clean_markdown_content(md_content, tags)
                                 
-                                # 检查内容是否有变化
-                                if md_content == original_content:
-                                    logger.info("内容未发生变化，没有应用清理规则")
+                                    # 检查内容是否有变化
+                                    if md_content == original_content:
+                                        logger.info("内容未发生变化，没有应用清理规则")
+                                        clean_md = False
+                                    else:
+                                        logger.info("已应用Markdown清理规则")
+                                except Exception as e:
+                                    logger.error(f"清理Markdown时出错: {str(e)}")
                                     clean_md = False
-                                else:
-                                    logger.info("已应用Markdown清理规则")
-                            except Exception as e:
-                                logger.error(f"清理Markdown时出错: {str(e)}")
-                                clean_md = False
                         
-                        # 生成新的文件名
-                        md_filename = f"{safe_title}.md"
-                        md_file_path = os.path.join(temp_output_dir, md_filename)
-                        logger.debug(f"保存处理后的markdown文件: {md_file_path}")
-                        with open(md_file_path, 'w', encoding='utf-8') as dst:
-                            dst.write(md_content)
+                            # 生成新的文件名
+                            md_filename = f"{safe_title}.md"
+                            md_file_path = os.path.join(temp_output_dir, md_filename)
+                            logger.debug(f"保存处理后的markdown文件: {md_file_path}")
+                            with open(md_file_path, 'w', encoding='utf-8') as dst:
+                                dst.write(md_content)
 
-                        # 添加到数据库
-                        md_description = description or f"由PDF文件自动转换生成{'，已进行内容清理' if clean_md else ''}"
-                        logger.info(f"添加文件到数据库: {md_filename}, 描述: {md_description}")
-                        add_result = self.file_manager.add_file(md_file_path, temp_path, tags, md_description)
+                            # 添加到数据库
+                            md_description = description or f"由PDF文件自动转换生成{'，已进行内容清理' if clean_md else ''}"
+                            logger.info(f"添加文件到数据库: {md_filename}, 描述: {md_description}")
+                            with self._file_lock:
+                                # 转换结果和原始PDF都在暂存目录中，以重命名和硬链接入库，无需复制
+                                add_result = self.file_manager.add_file(md_file_path, temp_path, tags, md_description,
+                                                                        move=True, content_hash=file_info.get('sha256'))
                         
-                        if add_result:
-                            logger.info(f"文件 {md_filename} 添加成功")
-                            results['success'].append({
-                                "filename": md_filename,
-                                "message": f"PDF已转换为Markdown: {md_filename}"
-                            })
+                            if add_result:
+                                logger.info(f"文件 {md_filename} 添加成功")
+                                results['success'].append({
+                                    "filename": md_filename,
+                                    "message": f"PDF已转换为Markdown: {md_filename}"
+                                })
+                            else:
+                                logger.error(f"文件 {md_filename} 添加到数据库失败")
+                                results['error'].append({
+                                    "filename": md_filename,
+                                    "message": "PDF转换成功但添加到数据库失败"
+                                })
                         else:
-                            logger.error(f"文件 {md_filename} 添加到数据库失败")
+                            logger.error(f"未找到转换后的Markdown文件: {md_file_path}")
                             results['error'].append({
-                                "filename": md_filename,
-                                "message": "PDF转换成功但添加到数据库失败"
+                                "filename": filename,
+                                "message": "PDF转换后未找到Markdown文件"
                             })
                     else:
-                        logger.error(f"未找到转换后的Markdown文件: {md_file_path}")
-                        results['error'].append({
-                            "filename": filename,
-                            "message": "PDF转换后未找到Markdown文件"
-                        })
-                else:
-                    # PDF转换失败，直接报错
-                    logger.error(f"PDF文件 {filename} 转换失败")
-                    raise ValueError(f"PDF转换失败!!!")
+                        # PDF转换失败，直接报错
+                        logger.error(f"PDF文件 {filename} 转换失败")
+                        raise ValueError(f"PDF转换失败!!!")
                 
-                # DEBUG模式会保留临时文件
-                # 检查logger记录等级是否为DEBUG级，如果是，不删除临时目录
-                if logger.getEffectiveLevel() <= logging.DEBUG:
-                    logger.debug(f"DEBUG模式下保留临时目录: {temp_output_dir}")
-                    continue
-                import shutil
-                shutil.rmtree(temp_output_dir, ignore_errors=True)
-                logger.info(f"已删除临时目录: {temp_output_dir}")
+                    # DEBUG模式会保留临时文件
+                    # 检查logger记录等级是否为DEBUG级，如果是，不删除临时目录
+                    if logger.getEffectiveLevel() <= logging.DEBUG:
+                        logger.debug(f"DEBUG模式下保留临时目录: {temp_output_dir}")
+                    else:
+                        import shutil
+                        shutil.rmtree(temp_output_dir, ignore_errors=True)
+                        logger.info(f"已删除临时目录: {temp_output_dir}")
 
-            else:
-                # 非PDF文件或PDF转换器不可用时直接报错
-                logger.error(f"文件 {filename} 不是PDF文件或PDF转换器不可用")
-                results['error'].append({
-                    "filename": filename,
-                    "message": "不是PDF文件或PDF转换器不可用"
-                })
-                raise ValueError(f"文件 {filename} 不是PDF文件或PDF转换器不可用")
+                else:
+                    # 非PDF文件或PDF转换器不可用时直接报错
+                    logger.error(f"文件 {filename} 不是PDF文件或PDF转换器不可用")
+                    results['error'].append({
+                        "filename": filename,
+                        "message": "不是PDF文件或PDF转换器不可用"
+                    })
+                    raise ValueError(f"文件 {filename} 不是PDF文件或PDF转换器不可用")
 
-            # 清理临时文件
-            try:
-                if os.path.exists(temp_path):
-                    logger.debug(f"清理临时文件: {temp_path}")
-                    os.remove(temp_path)
-            except Exception as e:
-                logger.error(f"清理临时文件 {temp_path} 时出错: {str(e)}")
+                # 清理临时文件
+                try:
+                    if os.path.exists(temp_path):
+                        logger.debug(f"清理临时文件: {temp_path}")
+                        os.remove(temp_path)
+                except Exception as e:
+                    logger.error(f"清理临时文件 {temp_path} 时出错: {str(e)}")
             
-            # 更新进度
-            processed_files += 1
-            task.progress = int((processed_files / total_files) * 100)
-            logger.debug(f"文件处理进度: {task.progress}% ({processed_files}/{total_files})")
+                # 更新进度
+                processed_files += 1
+                task.progress = int((processed_files / total_files) * 100)
+                self._set_detail(task, processed_files, total_files)
+                mark_done(index)
+                logger.debug(f"文件处理进度: {task.progress}% ({processed_files}/{total_files})")
+            
+        finally:
+            # 任务中断时取消尚未开始的转换，并删除未使用的临时目录
+            import shutil
+            for temp_output_dir, future in conversions.values():
+                future.cancel()
+                # 正在进行的转换无法取消，在其完成后再删除目录
+                future.add_done_callback(lambda _, path=temp_output_dir: shutil.rmtree(path, ignore_errors=True))
             
         # 保存结果
         task.result = {
@@ -492,6 +809,9 @@ class TaskManager:
         chunk_overlap = task.params.get('chunk_overlap', 200)
         check_duplicates = task.params.get('check_duplicates', False)
         file_paths = task.params.get('file_paths', [])
+        batch_size = task.params.get('batch_size', 64)
+        incremental = task.params.get('incremental', True)
+        chunker = task.params.get('chunker', 'character')
         
         # 新增参数
         create_collection = task.params.get('create_collection', False)
@@ -499,7 +819,7 @@ class TaskManager:
         reset_collection = task.params.get('reset_collection', False)
         
         logger.info(f"批量嵌入任务参数: 集合名称={collection_name}, 块大小={chunk_size}, 块重叠={chunk_overlap}, "
-                   f"检查重复={check_duplicates}, 文件数={len(file_paths)}, 创建集合={create_collection}, "
+                   f"切片方式={chunker}, 检查重复={check_duplicates}, 文件数={len(file_paths)}, 创建集合={create_collection}, "
                    f"嵌入模型={embedding_model}, 重置集合={reset_collection}")
         
         if not collection_name:
@@ -516,11 +836,11 @@ class TaskManager:
         
         # 更新进度
         task.progress = 5
-        self._save_tasks()
+        self._save_progress(task)
         logger.debug(f"嵌入任务开始进度: {task.progress}%")
         
-        # 检查是否需要创建新集合
-        if create_collection:
+        # 检查是否需要创建新集合（从断点继续时集合已经创建，不能再重置）
+        if create_collection and not task.checkpoint.get('collection_ready'):
             try:
                 # 检查集合是否已存在
                 existing_model = get_embedding_model(collection_name)
@@ -544,12 +864,14 @@ class TaskManager:
                         hard_reset=True,
                         use_llm=False  # 不使用LLM
                     )
+                    # 集合已创建，释放临时管道持有的共享模型
+                    pipeline.close()
                     
                     logger.info(f"成功创建/初始化集合 '{collection_name}'")
                     
                 # 更新进度
                 task.progress = 10
-                self._save_tasks()
+                self._save_progress(task)
             except Exception as e:
                 logger.error(f"创建/初始化集合 '{collection_name}' 时出错: {str(e)}")
                 task.error = f"创建/初始化集合失败: {str(e)}"
@@ -558,22 +880,65 @@ class TaskManager:
         else:
             # 更新进度
             task.progress = 10
-            self._save_tasks()
+        task.checkpoint['collection_ready'] = True
+        self._save_checkpoint(task)
+        
+        # 断点续传：跳过中断前片段已全部写入的文件
+        done_files = set(task.checkpoint.get('done_files', []))
+        remaining_paths = [path for path in file_paths if path not in done_files]
+        resumed_count = len(file_paths) - len(remaining_paths)
+        if resumed_count:
+            logger.info(f"从断点继续嵌入任务，已完成 {resumed_count} 个文件，剩余 {len(remaining_paths)} 个")
+        if not remaining_paths:
+            task.result = {
+                "success": True,
+                "message": f"全部 {len(file_paths)} 个文件已在中断前完成嵌入",
+                "stats": {"resumed_files": resumed_count}
+            }
+            return
         
         try:
             # 调用数据库管理器的embed_files方法处理嵌入
-            logger.info(f"开始执行嵌入，集合: {collection_name}, 文件数: {len(file_paths)}")
+            logger.info(f"开始执行嵌入，集合: {collection_name}, 文件数: {len(remaining_paths)}")
+            
+            def update_progress(stats):
+                # 嵌入阶段占10%到90%的进度区间，每个微批次更新一次
+                if file_paths:
+                    task.progress = 10 + int(80 * (resumed_count + stats["files_done"]) / len(file_paths))
+                    self._set_detail(task, resumed_count + stats["files_done"], len(file_paths),
+                                     chunks_embedded=stats["embedded"], cache_hits=stats["cache_hits"],
+                                     chunks_written=stats["written"],
+                                     write_docs_per_second=stats["write"].get("docs_per_second"))
+                    self._save_progress(task)
+            
+            def save_checkpoint(paths, in_flight):
+                # paths的片段已经写入Chroma；in_flight只写入了一部分片段，中断后续传时需先删除
+                task.checkpoint['done_files'] = task.checkpoint.get('done_files', []) + list(paths)
+                task.checkpoint['in_flight'] = list(in_flight)
+                self._save_checkpoint(task)
+            
             success, message, stats = self.db_manager.embed_files(
                 collection_name=collection_name,
-                file_paths=file_paths,
+                file_paths=remaining_paths,
                 chunk_size=chunk_size,
                 chunk_overlap=chunk_overlap,
-                check_duplicates=check_duplicates
+                check_duplicates=check_duplicates,
+                batch_size=batch_size,
+                progress_callback=update_progress,
+                incremental=incremental,
+                chunker=chunker,
+                checkpoint_callback=save_checkpoint,
+                # 中断或被抢占前正在写入的文件可能只写入了一部分片段，重新嵌入前先删除
+                replace_sources=task.checkpoint.get('in_flight', []),
+                should_stop=lambda: task.stop_requested is not None
             )
+            stats["resumed_files"] = resumed_count
+            # 嵌入在检查点处停止时，已写入的文件已记录在断点中
+            self._check_stop(task)
             
             # 更新进度
             task.progress = 90
-            self._save_tasks()
+            self._save_progress(task)
             logger.debug(f"嵌入任务完成进度: {task.progress}%")
             
             # 设置任务结果
@@ -591,6 +956,8 @@ class TaskManager:
             else:
                 logger.info(f"嵌入任务成功: {message}")
                 
+        except TaskStopped:
+            raise
         except Exception as e:
             logger.error(f"批量嵌入任务处理失败: {str(e)}")
             task.error = f"批量嵌入任务处理失败: {str(e)}"
@@ -615,21 +982,25 @@ class TaskManager:
         
         logger.info(f"开始批量清洗任务，文件数: {len(files)}")
         
-        # 初始化结果
-        results = []
-        success_count = 0
-        error_count = 0
-        skipped_count = 0
+        # 初始化结果，从断点继续时沿用已处理文件的结果（每个文件对应一条结果）
+        results = task.checkpoint.get('results', [])
+        success_count = sum(1 for result in results if result['status'] == 'success')
+        error_count = sum(1 for result in results if result['status'] == 'error')
+        skipped_count = sum(1 for result in results if result['status'] == 'skipped')
+        done_count = len(results)
         
         # 更新进度初始值
         task.progress = 10
-        self._save_tasks()
+        self._save_progress(task)
         
         # 计算每个文件的进度增量
         progress_per_file = 80 / len(files) if len(files) > 0 else 0
         
         # 逐个清洗文件
         for index, filename in enumerate(files):
+            if index < done_count:
+                continue
+            self._check_stop(task)
             try:
                 logger.debug(f"开始清洗文件 ({index+1}/{len(files)}): {filename}")
                 
@@ -650,13 +1021,14 @@ class TaskManager:
                     
                     # 更新文件描述，添加清洗标记
                     try:
-                        file_metadata = self.file_manager.get_file_metadata(filename)
-                        if file_metadata:
-                            # 避免重复添加清洗标记
-                            if "已进行内容清理" not in file_metadata.description:
-                                file_metadata.description += "，已进行内容清理"
-                                self.file_manager._save_metadata()
-                                logger.debug(f"已更新文件 {filename} 的描述，添加了清洗标记")
+                        with self._file_lock:
+                            file_metadata = self.file_manager.get_file_metadata(filename)
+                            if file_metadata:
+                                # 避免重复添加清洗标记
+                                if "已进行内容清理" not in file_metadata.description:
+                                    self.file_manager.update_description(
+                                        filename, file_metadata.description + "，已进行内容清理")
+                                    logger.debug(f"已更新文件 {filename} 的描述，添加了清洗标记")
                     except Exception as e:
                         logger.warning(f"更新文件 {filename} 描述时出错: {str(e)}")
                     
@@ -683,9 +1055,11 @@ class TaskManager:
                     'message': str(e)
                 })
             
-            # 更新进度
+            # 更新进度和断点
             task.progress = 10 + int((index + 1) * progress_per_file)
-            self._save_tasks()
+            self._set_detail(task, index + 1, len(files))
+            task.checkpoint['results'] = results
+            self._save_checkpoint(task)
         
         # 设置任务结果
         summary_message = f"批量清洗完成: 总数={len(files)}, 成功={success_count}, 跳过={skipped_count}, 错误={error_count}"
@@ -701,16 +1075,101 @@ class TaskManager:
         
         # 设置最终进度
         task.progress = 90
-        self._save_tasks()
+        self._save_progress(task)
 
+    def _process_collection_sync_task(self, task):
+        """处理集合同步任务：嵌入目录中新增和变化的文件，删除源文件已不存在的片段"""
+        if not self.db_manager:
+            logger.error("DatabaseManager实例未初始化")
+            raise ValueError("DatabaseManager实例未初始化")
+        
+        collection_name = task.params.get('collection_name')
+        if not collection_name:
+            logger.error("未指定集合名称")
+            task.error = "未指定集合名称"
+            task.status = Task.STATUS_FAILED
+            return
+        
+        task.progress = 10
+        self._save_progress(task)
+        
+        def update_progress(stats):
+            # 同步阶段占10%到90%的进度区间
+            if stats["total_files"]:
+                task.progress = 10 + int(80 * stats["files_done"] / stats["total_files"])
+                self._set_detail(task, stats["files_done"], stats["total_files"],
+                                 chunks_embedded=stats["embedded"], cache_hits=stats["cache_hits"],
+                                 chunks_written=stats["written"])
+                self._save_progress(task)
+        
+        def save_checkpoint(paths, in_flight):
+            # 已写入的文件由增量嵌入的版本记录跳过，断点只需记录只写入了一部分片段的文件
+            task.checkpoint['in_flight'] = list(in_flight)
+            self._save_checkpoint(task)
+        
+        success, message, stats = self.db_manager.sync_collection(
+            collection_name,
+            directory=task.params.get('directory'),
+            add_new=task.params.get('add_new', True),
+            remove_missing=task.params.get('remove_missing', True),
+            chunk_size=task.params.get('chunk_size', 1000),
+            chunk_overlap=task.params.get('chunk_overlap', 200),
+            chunker=task.params.get('chunker', 'character'),
+            check_duplicates=task.params.get('check_duplicates', False),
+            progress_callback=update_progress,
+            checkpoint_callback=save_checkpoint,
+            replace_sources=task.checkpoint.get('in_flight', []),
+            should_stop=lambda: task.stop_requested is not None
+        )
+        self._check_stop(task)
+        
+        task.progress = 90
+        self._save_progress(task)
+        task.result = {
+            "success": success,
+            "message": message,
+            "stats": stats
+        }
+        if not success:
+            logger.error(f"集合同步任务失败: {message}")
+            task.error = message
+            task.status = Task.STATUS_FAILED
+        else:
+            logger.info(f"集合同步任务成功: {message}")
+
+    
+    @staticmethod
+    def _default_priority(task_type, files, params):
+        """文件数不超过config.INTERACTIVE_TASK_MAX_FILES的任务视为交互式任务"""
+        params = params or {}
+        if task_type == 'batch_embed':
+            count = len(params.get('file_paths', []))
+        elif task_type == 'batch_clean':
+            count = len(params.get('files', []))
+        elif task_type == 'collection_sync':
+            # 同步前无法知道需要重新嵌入的文件数量，按批量任务处理
+            return Task.PRIORITY_BULK
+        else:
+            count = len(files or [])
+        return Task.PRIORITY_INTERACTIVE if count <= config.INTERACTIVE_TASK_MAX_FILES else Task.PRIORITY_BULK
     
-    def create_task(self, task_type, files=None, params=None):
-        """创建新任务"""
-        task = Task(task_type=task_type, files=files, params=params)
-        self.tasks[task.task_id] = task
-        self.task_queue.put(task)
-        self._save_tasks()
-        logger.info(f"创建新任务: {task.task_id}, 类型: {task.task_type}, 文件数: {len(files) if files else 0}")
+    def create_task(self, task_type, files=None, params=None, priority=None):
+        """
+        创建新任务
+
+        Args:
+            task_type: 任务类型
+            files: 文件列表
+            params: 任务参数
+            priority: Task.PRIORITY_INTERACTIVE或Task.PRIORITY_BULK，None时按文件数量确定
+        """
+        priority = priority or self._default_priority(task_type, files, params)
+        task = Task(task_type=task_type, files=files, params=params, priority=priority)
+        with self._lock:
+            self.tasks[task.task_id] = task
+        self._save_task(task)
+        self._enqueue(task)
+        logger.info(f"创建新任务: {task.task_id}, 类型: {task.task_type}, 优先级: {task.priority}, 文件数: {len(files) if files else 0}")
         return task
     
     def get_task(self, task_id):
@@ -721,55 +1180,125 @@ class TaskManager:
     def get_all_tasks(self):
         """获取所有任务"""
         logger.debug(f"获取所有任务，总数: {len(self.tasks)}")
-        return list(self.tasks.values())
+        with self._lock:
+            return list(self.tasks.values())
     
     def get_recent_tasks(self, limit=10):
         """获取最近的任务"""
-        tasks = list(self.tasks.values())
-        tasks.sort(key=lambda t: t.created_at, reverse=True)
         logger.debug(f"获取最近 {limit} 个任务")
-        return tasks[:limit]
+        # 存储按创建时间建有索引，无需排序全部任务
+        task_ids = self.store.recent_ids(limit)
+        with self._lock:
+            return [self.tasks[task_id] for task_id in task_ids if task_id in self.tasks]
+    
+    def get_queue_status(self):
+        """获取调度器状态：等待队列深度和工作线程占用情况"""
+        with self._lock:
+            queued_by_type = {}
+            for task in self.pending:
+                queued_by_type[task.task_type] = queued_by_type.get(task.task_type, 0) + 1
+            running_by_type = {}
+            for task in self.running.values():
+                running_by_type[task.task_type] = running_by_type.get(task.task_type, 0) + 1
+            return {
+                'workers': self.num_workers,
+                'busy_workers': len(self.running),
+                'queued': len(self.pending),
+                'queued_by_type': queued_by_type,
+                'running_by_type': running_by_type,
+                'limits': dict(self.concurrency)
+            }
+    
+    def _progress_detail(self, task):
+        """实时进度，正在处理的任务附带吞吐量（个/分钟）和预计剩余秒数"""
+        detail = dict(task.detail)
+        done, total = detail.get('done'), detail.get('total')
+        if task.status == Task.STATUS_PROCESSING and task.run_started is not None and done is not None and total:
+            elapsed = time.monotonic() - task.run_started
+            done_this_run = done - task.run_done_start
+            if elapsed > 0 and done_this_run > 0:
+                rate = done_this_run / elapsed
+                detail['items_per_minute'] = round(rate * 60, 2)
+                detail['eta_seconds'] = int((total - done) / rate)
+        return detail
     
     def get_task_status(self, task_id):
         """获取任务状态"""
         task = self.get_task(task_id)
         if task:
             logger.debug(f"获取任务 {task_id} 状态: {task.status}, 进度: {task.progress}%")
+            with self._lock:
+                queue_position = next((index + 1 for index, t in enumerate(self.pending) if t.task_id == task_id), None)
             return {
                 'task_id': task.task_id,
                 'status': task.status,
                 'progress': task.progress,
-                'error': task.error
+                'error': task.error,
+                'priority': task.priority,
+                'stop_requested': task.stop_requested,
+                'detail': self._progress_detail(task),
+                'queue_position': queue_position,
+                'queue': self.get_queue_status()
             }
         logger.warning(f"获取任务状态失败，任务不存在: {task_id}")
         return None
     
+    def cancel_task(self, task_id):
+        """
+        取消任务：等待中的任务直接取消，正在处理的任务在下一个检查点（文件或微批次之间）停止
+        """
+        with self._lock:
+            task = self.tasks.get(task_id)
+            if task is None:
+                logger.warning(f"取消任务失败，任务不存在: {task_id}")
+                return False, "任务不存在"
+            if task_id in self.running:
+                task.stop_requested = Task.STOP_CANCEL
+                self._publish(task)
+                logger.info(f"已请求取消正在处理的任务: {task_id}")
+                return True, "任务将在当前文件处理完后停止"
+            if task.status != Task.STATUS_PENDING:
+                return False, "任务已结束"
+            self.pending = [t for t in self.pending if t.task_id != task_id]
+            task.status = Task.STATUS_CANCELLED
+            task.completed_at = datetime.now()
+            self._save_task(task)
+            logger.info(f"已取消等待中的任务: {task_id}")
+            return True, "任务已取消"
+    
     def delete_task(self, task_id):
         """删除任务"""
-        if task_id in self.tasks:
-            # 不能删除正在处理的任务
-            if self.current_task and self.current_task.task_id == task_id and self.current_task.status == Task.STATUS_PROCESSING:
-                logger.warning(f"无法删除正在处理的任务: {task_id}")
-                return False, "不能删除正在处理的任务"
-            
-            del self.tasks[task_id]
-            self._save_tasks()
-            logger.info(f"删除任务: {task_id}")
-            return True, "任务已删除"
+        with self._lock:
+            if task_id in self.tasks:
+                # 不能删除正在处理的任务
+                if task_id in self.running:
+                    logger.warning(f"无法删除正在处理的任务: {task_id}")
+                    return False, "不能删除正在处理的任务"
+                
+                # 等待中的任务从队列中移除，不再执行
+                self.pending = [t for t in self.pending if t.task_id != task_id]
+                del self.tasks[task_id]
+                self.store.delete([task_id])
+                with self._progress_changed:
+                    # 通知订阅者任务已删除
+                    self._progress_changed.notify_all()
+                logger.info(f"删除任务: {task_id}")
+                return True, "任务已删除"
         
         logger.warning(f"删除任务失败，任务不存在: {task_id}")
         return False, "任务不存在"
     
     def clear_completed_tasks(self):
         """清除已完成的任务"""
-        completed_task_ids = [
-            task_id for task_id, task in self.tasks.items()
-            if task.status in [Task.STATUS_COMPLETED, Task.STATUS_FAILED]
-        ]
-        
-        for task_id in completed_task_ids:
-            del self.tasks[task_id]
-        
-        self._save_tasks()
+        with self._lock:
+            completed_task_ids = [
+                task_id for task_id, task in self.tasks.items()
+                if task.status in [Task.STATUS_COMPLETED, Task.STATUS_FAILED, Task.STATUS_CANCELLED]
+            ]
+            
+            for task_id in completed_task_ids:
+                del self.tasks[task_id]
+            
+            self.store.delete(completed_task_ids)
         logger.info(f"清除了 {len(completed_task_ids)} 个已完成的任务")
         return len(completed_task_ids) 
\ No newline at end of file
@@ -0,0 +1,204 @@
+"""
+任务存储模块
+用SQLite保存后台任务记录，每个任务一行：
+- 状态变化只写入该任务的一行，进度更新只更新一个字段，开销与任务历史的长度无关
+- 按状态和创建时间建立索引，用于查询最近的任务和执行保留策略
+- 长任务的断点（如已写入的文件）单独更新，重启后据此继续执行
+- 旧版本的tasks.json在首次打开时导入
+"""
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from .logger import get_logger
+
+# 配置日志
+logger = get_logger('task_store')
+
+# 已结束的任务状态，保留策略只清理这些任务
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+_COLUMNS = ('task_id', 'task_type', 'status', 'progress', 'files', 'params',
+            'created_at', 'started_at', 'completed_at', 'error', 'result', 'checkpoint', 'priority')
+_JSON_COLUMNS = {'files': [], 'params': {}, 'result': {}, 'checkpoint': {}}
+
+
+class TaskStore:
+    """SQLite任务存储"""
+
+    def __init__(self, db_path: str):
+        """
+        初始化任务存储，数据库在首次使用时才打开
+
+        Args:
+            db_path: SQLite文件路径
+        """
+        self.db_path = str(db_path)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """打开（必要时创建）数据库，调用方需持有锁"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # 进度更新频繁，WAL模式下NORMAL同步已能保证数据库一致性
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tasks ("
+                "task_id TEXT PRIMARY KEY, task_type TEXT, status TEXT NOT NULL, progress INTEGER NOT NULL DEFAULT 0, "
+                "files TEXT, params TEXT, created_at TEXT, started_at TEXT, completed_at TEXT, error TEXT, result TEXT, "
+                "checkpoint TEXT, priority TEXT)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(tasks)")}
+            for column in ("checkpoint", "priority"):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE tasks ADD COLUMN {column} TEXT")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks (created_at)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _to_row(data: Dict[str, Any]) -> tuple:
+        return tuple(
+            json.dumps(data.get(column, _JSON_COLUMNS[column]), ensure_ascii=False) if column in _JSON_COLUMNS
+            else data.get(column)
+            for column in _COLUMNS
+        )
+
+    @staticmethod
+    def _from_row(row: tuple) -> Dict[str, Any]:
+        data = dict(zip(_COLUMNS, row))
+        for column, default in _JSON_COLUMNS.items():
+            try:
+                data[column] = json.loads(data[column]) if data[column] else type(default)()
+            except ValueError:
+                data[column] = type(default)()
+        return data
+
+    def save(self, task_data: Dict[str, Any]) -> None:
+        """
+        写入（或覆盖）一个任务
+
+        Args:
+            task_data: Task.to_dict()的结果，需包含files
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                f"INSERT OR REPLACE INTO tasks ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                self._to_row(task_data)
+            )
+
+    def save_many(self, tasks_data: Iterable[Dict[str, Any]]) -> None:
+        """在一个事务中写入多个任务"""
+        rows = [self._to_row(data) for data in tasks_data]
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO tasks ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+                    rows
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def update_progress(self, task_id: str, progress: int) -> None:
+        """只更新任务的进度"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute("UPDATE tasks SET progress = ? WHERE task_id = ?", (progress, task_id))
+
+    def update_checkpoint(self, task_id: str, checkpoint: Dict[str, Any], progress: int) -> None:
+        """只更新任务的断点和进度"""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                "UPDATE tasks SET checkpoint = ?, progress = ? WHERE task_id = ?",
+                (json.dumps(checkpoint, ensure_ascii=False), progress, task_id)
+            )
+
+    def delete(self, task_ids: Iterable[str]) -> None:
+        """删除任务"""
+        with self._lock:
+            conn = self._connect()
+            conn.executemany("DELETE FROM tasks WHERE task_id = ?", [(task_id,) for task_id in task_ids])
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        """按创建时间顺序读取全部任务"""
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(f"SELECT {', '.join(_COLUMNS)} FROM tasks ORDER BY created_at").fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def recent_ids(self, limit: int) -> List[str]:
+        """按创建时间倒序获取最近的任务ID"""
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute("SELECT task_id FROM tasks ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [row[0] for row in rows]
+
+    def ids_with_status(self, *statuses: str) -> List[str]:
+        """获取处于指定状态的任务ID，按创建时间顺序"""
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute(
+                f"SELECT task_id FROM tasks WHERE status IN ({', '.join('?' * len(statuses))}) ORDER BY created_at",
+                statuses
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def apply_retention(self, max_age_days: Optional[float] = None, max_finished: Optional[int] = None) -> List[str]:
+        """
+        清理已结束的旧任务
+
+        Args:
+            max_age_days: 删除结束时间早于该天数的任务，None或0表示不限制
+            max_finished: 最多保留的已结束任务数量（保留最新的），None表示不限制
+
+        Returns:
+            被删除的任务ID
+        """
+        placeholders = ', '.join('?' * len(FINISHED_STATUSES))
+        with self._lock:
+            conn = self._connect()
+            expired = set()
+            if max_age_days:
+                cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+                expired.update(row[0] for row in conn.execute(
+                    f"SELECT task_id FROM tasks WHERE status IN ({placeholders}) AND completed_at < ?",
+                    (*FINISHED_STATUSES, cutoff)
+                ))
+            if max_finished is not None:
+                expired.update(row[0] for row in conn.execute(
+                    f"SELECT task_id FROM tasks WHERE status IN ({placeholders}) "
+                    f"ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+                    (*FINISHED_STATUSES, max_finished)
+                ))
+            if expired:
+                conn.executemany("DELETE FROM tasks WHERE task_id = ?", [(task_id,) for task_id in expired])
+        if expired:
+            logger.info(f"保留策略清理了 {len(expired)} 个已结束的任务")
+        return list(expired)
+
+    def import_json(self, json_path: str) -> int:
+        """
+        导入旧版本的tasks.json，导入后将其重命名为tasks.json.migrated
+
+        Returns:
+            导入的任务数量
+        """
+        with open(json_path, 'r', encoding='utf-8') as f:
+            tasks_data = json.load(f)
+        self.save_many(data for data in tasks_data if data.get('task_id'))
+        os.replace(json_path, f"{json_path}.migrated")
+        logger.info(f"已从 {json_path} 导入 {len(tasks_data)} 个任务")
+        return len(tasks_data)
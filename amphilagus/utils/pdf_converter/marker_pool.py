@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# Pool of persistent Marker conversion workers
+#
+# Each worker is a marker_worker.py process that loads the Marker models once and then
+# converts PDFs sent to it over its stdin, so the model loading cost is paid per worker
+# instead of per PDF. Workers are started on the first job, restarted after a crash,
+# killed when a single conversion runs past the job timeout, and recycled after a number
+# of documents or when their memory grows too large.
+
+import atexit
+import concurrent.futures
+import json
+import logging
+import os
+import queue
+import subprocess
+import sys
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "marker_worker.py")
+
+# Sentinel that stops a serving thread
+_STOP = object()
+
+
+class MarkerWorkerPool:
+    """
+    Long-lived Marker worker processes fed from a local job queue
+
+    Usage:
+        pool = MarkerWorkerPool(workers=2)
+        future = pool.submit(pdf_path, output_dir)
+        ok = future.result()
+        pool.shutdown()
+    """
+
+    def __init__(self, workers=1, max_jobs_per_worker=20, max_memory_mb=None, job_timeout=None):
+        """
+        Args:
+            workers: Number of worker processes
+            max_jobs_per_worker: Restart a worker after it converted this many PDFs (None or 0 = never)
+            max_memory_mb: Restart a worker when its resident memory exceeds this size (None or 0 = never)
+            job_timeout: Kill a worker whose conversion takes longer than this many seconds and fail
+                         the job; the next job starts a new worker (None or 0 = no limit)
+        """
+        self.workers = max(1, int(workers))
+        self.max_jobs_per_worker = max_jobs_per_worker or 0
+        self.max_memory_mb = max_memory_mb or 0
+        self.job_timeout = job_timeout or None
+        self._jobs = queue.Queue()
+        self._lock = threading.Lock()
+        self._threads = []
+        self._processes = [None] * self.workers
+        self._closed = False
+        atexit.register(self.shutdown)
+
+    def submit(self, pdf_path, output_dir, max_pages=None, languages=None, use_llm=False):
+        """
+        Queue a PDF for conversion
+
+        Returns:
+            concurrent.futures.Future resolving to True when <output_dir>/<stem>/<stem>.md was written
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MarkerWorkerPool has been shut down")
+            if not self._threads:
+                # Start the serving threads on the first job; each one starts its own worker process
+                for index in range(self.workers):
+                    thread = threading.Thread(target=self._serve, args=(index,),
+                                              name=f"marker-worker-{index}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+
+        os.makedirs(output_dir, exist_ok=True)
+        job = {
+            "pdf_path": os.path.abspath(str(pdf_path)),
+            "output_dir": os.path.abspath(str(output_dir)),
+            "max_pages": max_pages,
+            "languages": languages,
+            "use_llm": bool(use_llm),
+        }
+        future = concurrent.futures.Future()
+        self._jobs.put((future, job))
+        return future
+
+    def convert(self, pdf_path, output_dir, max_pages=None, languages=None, use_llm=False):
+        """
+        Convert a PDF and wait for the result
+        """
+        return self.submit(pdf_path, output_dir, max_pages, languages, use_llm).result()
+
+    def shutdown(self):
+        """
+        Stop all workers; queued jobs that have not started are cancelled
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            threads = list(self._threads)
+
+        while True:
+            try:
+                item = self._jobs.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                item[0].cancel()
+        for _ in threads:
+            self._jobs.put(_STOP)
+        for thread in threads:
+            thread.join()
+
+    def _serve(self, index):
+        while True:
+            item = self._jobs.get()
+            if item is _STOP:
+                break
+            future, job = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(self._run_job(index, job))
+            except BaseException as e:
+                future.set_exception(e)
+        self._stop_worker(index)
+
+    def _start_worker(self, index):
+        cmd = [sys.executable, WORKER_SCRIPT,
+               "--max_jobs", str(self.max_jobs_per_worker),
+               "--max_memory_mb", str(self.max_memory_mb)]
+        # Worker stderr (Marker progress output) is inherited so it shows up in the server log
+        process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   text=True, encoding="utf-8", bufsize=1)
+        logger.info(f"Starting Marker worker {index} (pid {process.pid}), loading models")
+        message = self._read_message(process)
+        if not message or not message.get("ready"):
+            error = message.get("error") if message else f"exit code {process.wait()}"
+            self._terminate(process)
+            raise RuntimeError(f"Marker worker failed to start: {error}")
+        logger.info(f"Marker worker {index} (pid {process.pid}) is ready")
+        self._processes[index] = process
+        return process
+
+    def _run_job(self, index, job):
+        process = self._processes[index]
+        if process is None or process.poll() is not None:
+            process = self._start_worker(index)
+
+        pdf_name = Path(job["pdf_path"]).name
+        try:
+            process.stdin.write(json.dumps(job, ensure_ascii=False) + "\n")
+            process.stdin.flush()
+        except OSError as e:
+            self._stop_worker(index)
+            logger.error(f"✗ Failed: {pdf_name} (worker {index} unavailable: {e})")
+            return False
+
+        # readline has no deadline of its own: a watchdog kills a worker that hangs on a PDF,
+        # which ends the read below like a crash
+        timed_out = threading.Event()
+        watchdog = None
+        if self.job_timeout:
+            def kill():
+                timed_out.set()
+                process.kill()
+            watchdog = threading.Timer(self.job_timeout, kill)
+            watchdog.daemon = True
+            watchdog.start()
+        try:
+            message = self._read_message(process)
+        finally:
+            if watchdog is not None:
+                watchdog.cancel()
+        if timed_out.is_set():
+            logger.error(f"✗ Failed: {pdf_name} (timed out after {self.job_timeout}s, killed Marker worker {index})")
+            self._stop_worker(index)
+            return False
+        if message is None:
+            # The worker died during the conversion (e.g. out of memory); the next job starts a new one
+            logger.error(f"✗ Failed: {pdf_name} (Marker worker {index} exited with code {process.wait()})")
+            self._stop_worker(index)
+            return False
+
+        if message.get("ok"):
+            logger.info(f"✓ Completed: {pdf_name} in {message.get('seconds')}s (worker {index}, rss {message.get('rss_mb')} MB)")
+        else:
+            logger.error(f"✗ Failed: {pdf_name} ({message.get('error')})")
+        if message.get("recycle"):
+            logger.info(f"Recycling Marker worker {index} (rss {message.get('rss_mb')} MB)")
+            self._stop_worker(index)
+        return bool(message.get("ok"))
+
+    @staticmethod
+    def _read_message(process):
+        line = process.stdout.readline()
+        if not line:
+            return None
+        try:
+            return json.loads(line)
+        except ValueError:
+            logger.error(f"Unexpected output from Marker worker: {line.strip()}")
+            return None
+
+    def _stop_worker(self, index):
+        process = self._processes[index]
+        self._processes[index] = None
+        if process is not None:
+            self._terminate(process)
+
+    @staticmethod
+    def _terminate(process):
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
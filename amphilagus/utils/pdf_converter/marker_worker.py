@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# Persistent Marker conversion worker
+#
+# Loads the Marker layout, OCR and table models once and then converts PDFs in a loop.
+# Started by MarkerWorkerPool (marker_pool.py); it is run as a standalone script so that
+# it does not import the amphilagus package.
+#
+# Protocol: one JSON job per line on stdin, one JSON message per line on the original stdout.
+# Everything Marker itself prints is redirected to stderr.
+#   -> {"ready": true} | {"ready": false, "error": "..."}   once, after loading the models
+#   <- {"pdf_path": ..., "output_dir": ..., "max_pages": ..., "languages": ..., "use_llm": ...}
+#   -> {"ok": bool, "error": str|null, "seconds": float, "rss_mb": float|null, "recycle": bool}
+# The worker exits after reporting a job with "recycle": true, or when stdin is closed.
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import traceback
+from pathlib import Path
+
+
+def rss_mb():
+    """
+    Current resident memory of this process in MB, None if it cannot be determined
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def load_models():
+    """
+    Load the Marker models once for the lifetime of the worker
+    """
+    from marker.models import create_model_dict
+    return create_model_dict()
+
+
+def convert(models, job):
+    """
+    Convert one PDF with the already loaded models, writing the same output layout as marker_single:
+    <output_dir>/<pdf stem>/<pdf stem>.md, <pdf stem>_meta.json and images
+    """
+    from marker.config.parser import ConfigParser
+    from marker.output import save_output
+
+    if job.get("use_llm"):
+        # Load API keys from the .env file, as convert_pdf_to_markdown does
+        from dotenv import load_dotenv
+        load_dotenv(override=True)
+
+    options = {
+        "output_dir": job["output_dir"],
+        "output_format": "markdown",
+        "use_llm": bool(job.get("use_llm")),
+    }
+    if job.get("max_pages"):
+        options["page_range"] = f"0-{int(job['max_pages']) - 1}"
+    if job.get("languages"):
+        options["languages"] = job["languages"]
+
+    config_parser = ConfigParser(options)
+    converter_cls = config_parser.get_converter_cls()
+    converter = converter_cls(
+        config=config_parser.generate_config_dict(),
+        artifact_dict=models,
+        processor_list=config_parser.get_processors(),
+        renderer=config_parser.get_renderer(),
+        llm_service=config_parser.get_llm_service(),
+    )
+    rendered = converter(job["pdf_path"])
+    pdf_path = job["pdf_path"]
+    save_output(rendered, config_parser.get_output_folder(pdf_path), config_parser.get_base_filename(pdf_path))
+
+
+def output_exists(job):
+    output_file = f"{Path(job['pdf_path']).stem}.md"
+    return any(os.path.exists(os.path.join(root, output_file)) for root, _, _ in os.walk(job["output_dir"]))
+
+
+def release_memory():
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+    except (ImportError, AttributeError):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Persistent Marker conversion worker")
+    parser.add_argument("--max_jobs", type=int, default=0,
+                        help="Exit after converting this many PDFs (0 = no limit)")
+    parser.add_argument("--max_memory_mb", type=float, default=0,
+                        help="Exit after a conversion that leaves the resident memory above this size (0 = no limit)")
+    args = parser.parse_args()
+
+    # Keep a private handle on stdout for the protocol and send everything else to stderr
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8", buffering=1)
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    def send(message):
+        protocol.write(json.dumps(message, ensure_ascii=False) + "\n")
+        protocol.flush()
+
+    os.environ.setdefault("PYTORCH_CUDA_ALLOC_CONF", "max_split_size_mb:128")
+
+    try:
+        models = load_models()
+    except Exception as e:
+        traceback.print_exc()
+        send({"ready": False, "error": f"{type(e).__name__}: {e}"})
+        return 1
+    send({"ready": True})
+
+    done = 0
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        job = json.loads(line)
+        start_time = time.time()
+        try:
+            convert(models, job)
+            ok = output_exists(job)
+            error = None if ok else "output file not found"
+        except Exception as e:
+            traceback.print_exc()
+            ok, error = False, f"{type(e).__name__}: {e}"
+
+        done += 1
+        release_memory()
+        memory = rss_mb()
+        recycle = bool(
+            (args.max_jobs and done >= args.max_jobs)
+            or (args.max_memory_mb and memory is not None and memory > args.max_memory_mb)
+        )
+        send({
+            "ok": ok,
+            "error": error,
+            "seconds": round(time.time() - start_time, 2),
+            "rss_mb": round(memory, 1) if memory is not None else None,
+            "recycle": recycle,
+        })
+        if recycle:
+            break
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,68 +6,26 @@ import os
 import sys
 import argparse
 import time
-import subprocess
 import gc
 import threading
 import concurrent.futures
 from pathlib import Path
 from dotenv import load_dotenv
 
-def process_single_pdf(pdf_path, output_dir, max_pages=None, languages=None, use_llm=False):
-    """
-    Process a single PDF file using marker_single
-    """
-    # Ensure output directory exists
-    os.makedirs(output_dir, exist_ok=True)
-    
-    # Build command arguments
-    cmd = ["marker_single", pdf_path, "--output_dir", output_dir]
-    
-    # Add optional parameters
-    if max_pages:
-        cmd.extend(["--max_pages", str(max_pages)])
-    if languages:
-        cmd.extend(["--langs", languages])
-    if use_llm:
-        cmd.append("--use_llm")
-    
-    # Execute the command
-    pdf_name = Path(pdf_path).name
-    print(f"Processing: {pdf_name}")
-    
-    try:
-        subprocess.run(cmd, check=True)
-        
-        # Force garbage collection to clean up memory
-        gc.collect()
-        try:
-            import torch
-            if torch.cuda.is_available():
-                torch.cuda.empty_cache()
-        except (ImportError, AttributeError):
-            pass
-            
-        base_name = Path(pdf_path).stem
-        output_file = f"{base_name}.md"
-        if any(os.path.exists(os.path.join(root, output_file)) for root, _, _ in os.walk(output_dir)):
-            print(f"✓ Completed: {pdf_name} -> {output_file}")
-            return True
-        else:
-            print(f"✗ Failed: {pdf_name} (output file not found)")
-            return False
-            
-    except subprocess.CalledProcessError as e:
-        print(f"✗ Failed: {pdf_name} (exit code: {e.returncode})")
-        return False
-    except Exception as e:
-        print(f"✗ Failed: {pdf_name} ({str(e)})")
-        return False
+try:
+    from .marker_pool import MarkerWorkerPool
+except ImportError:
+    from marker_pool import MarkerWorkerPool
 
-def convert_pdf_to_markdown(input_path, output_dir, max_pages=None, languages=None, workers=1, max_files=None, min_length=0, use_llm=False):
+def convert_pdf_to_markdown(input_path, output_dir, max_pages=None, languages=None, workers=1, max_files=None, min_length=0, use_llm=False, pool=None):
     """
-    Convert PDF(s) to Markdown using the Marker library via command line
-    Works for both single files and directories by calling marker_single on each file
+    Convert PDF(s) to Markdown using persistent Marker worker processes
+    Works for both single files and directories; the Marker models are loaded once per worker
+    instead of once per file. Pass an existing MarkerWorkerPool to reuse its loaded workers.
     """
+    own_pool = None
+    if pool is None:
+        pool = own_pool = MarkerWorkerPool(workers=workers)
     try:
         # Load environment variables from .env file
         if use_llm:
@@ -103,7 +61,9 @@ def convert_pdf_to_markdown(input_path, output_dir, max_pages=None, languages=No
                 print(f"Processing maximum {max_pages} pages")
                 
             start_time = time.time()
-            result = process_single_pdf(input_path, output_dir, max_pages, languages, use_llm)
+            print(f"Processing: {Path(input_path).name}")
+            result = pool.convert(input_path, output_dir, max_pages, languages, use_llm)
+            print(f"{'✓ Completed' if result else '✗ Failed'}: {Path(input_path).name}")
             elapsed_time = time.time() - start_time
             
             print(f"Conversion completed in {elapsed_time:.2f} seconds")
@@ -139,51 +99,33 @@ def convert_pdf_to_markdown(input_path, output_dir, max_pages=None, languages=No
             successful = 0
             failed = 0
             
-            # Determine if we should use parallel processing
-            if workers > 1:
-                print(f"Processing with {workers} parallel workers")
-                with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
-                    futures = []
-                    for pdf_path in pdf_files:
-                        # Skip files smaller than min_length if specified
-                        if min_length > 0:
-                            file_size = os.path.getsize(pdf_path)
-                            if file_size < min_length:
-                                print(f"Skipping {pdf_path.name} (size: {file_size} bytes < minimum {min_length} bytes)")
-                                continue
-                                
-                        futures.append(
-                            executor.submit(
-                                process_single_pdf, 
-                                str(pdf_path), 
-                                output_dir, 
-                                max_pages, 
-                                languages, 
-                                use_llm
-                            )
-                        )
-                    
-                    for future in concurrent.futures.as_completed(futures):
-                        if future.result():
-                            successful += 1
-                        else:
-                            failed += 1
-            else:
-                # Process files sequentially
-                print("Processing files sequentially")
-                for pdf_path in pdf_files:
-                    # Skip files smaller than min_length if specified
-                    if min_length > 0:
-                        file_size = os.path.getsize(pdf_path)
-                        if file_size < min_length:
-                            print(f"Skipping {pdf_path.name} (size: {file_size} bytes < minimum {min_length} bytes)")
-                            continue
-                            
-                    if process_single_pdf(str(pdf_path), output_dir, max_pages, languages, use_llm):
-                        successful += 1
-                    else:
-                        failed += 1
-            
+            # Queue every file; the pool converts up to `workers` files at a time
+            print(f"Processing with {pool.workers} persistent Marker worker(s)")
+            futures = {}
+            for pdf_path in pdf_files:
+                # Skip files smaller than min_length if specified
+                if min_length > 0:
+                    file_size = os.path.getsize(pdf_path)
+                    if file_size < min_length:
+                        print(f"Skipping {pdf_path.name} (size: {file_size} bytes < minimum {min_length} bytes)")
+                        continue
+
+                futures[pool.submit(str(pdf_path), output_dir, max_pages, languages, use_llm)] = pdf_path
+
+            for future in concurrent.futures.as_completed(futures):
+                pdf_name = futures[future].name
+                try:
+                    result = future.result()
+                except Exception as e:
+                    print(f"✗ Failed: {pdf_name} ({str(e)})")
+                    result = False
+                if result:
+                    print(f"✓ Completed: {pdf_name}")
+                    successful += 1
+                else:
+                    print(f"✗ Failed: {pdf_name}")
+                    failed += 1
+
             elapsed_time = time.time() - start_time
             print(f"\nConversion summary:")
             print(f"- Total files: {len(pdf_files)}")
@@ -207,6 +149,8 @@ def convert_pdf_to_markdown(input_path, output_dir, max_pages=None, languages=No
         traceback.print_exc()
         return False
     finally:
+        if own_pool is not None:
+            own_pool.shutdown()
         # Final memory cleanup
         gc.collect()
         try:
@@ -225,7 +169,7 @@ def main():
     parser.add_argument("--langs", 
                         help="Comma-separated list of languages for OCR (e.g., 'en,fr,de')")
     parser.add_argument("--workers", type=int, default=1,
-                        help="Number of PDFs to process in parallel (when processing a directory)")
+                        help="Number of persistent Marker workers converting PDFs in parallel")
     parser.add_argument("--max_files", type=int,
                         help="Maximum number of PDF files to process from directory")
     parser.add_argument("--min_length", type=int, default=0,
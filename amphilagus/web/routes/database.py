@@ -99,4 +99,24 @@ def delete_collection(collection_name):
     except Exception as e:
         import traceback
         traceback.print_exc()
-        return redirect(url_for('database.database_dashboard', error=f'删除集合时出错: {str(e)}')) 
\ No newline at end of file
+        return redirect(url_for('database.database_dashboard', error=f'删除集合时出错: {str(e)}')) 
+@database_bp.route('/collections/<collection_name>/sync', methods=['POST'])
+def sync_collection(collection_name):
+    """创建集合同步任务：嵌入raw_files中新增和变化的文件，删除源文件已不存在的片段"""
+    try:
+        task = manager.task.create_task(
+            task_type='collection_sync',
+            params={
+                'collection_name': collection_name,
+                'chunk_size': int(request.form.get('chunk_size', 1000)),
+                'chunk_overlap': int(request.form.get('chunk_overlap', 200)),
+                'chunker': request.form.get('chunker', 'character'),
+                'remove_missing': request.form.get('remove_missing', 'on') == 'on'
+            }
+        )
+        flash(f'集合"{collection_name}"的同步任务已创建，将在后台处理', 'success')
+        return redirect(url_for('tasks.view_task', task_id=task.task_id))
+    
+    except Exception as e:
+        logger.error(f"创建集合同步任务时出错: {str(e)}")
+        return redirect(url_for('database.database_dashboard', error=f'创建同步任务失败: {str(e)}'))
@@ -2,13 +2,14 @@
 文件管理相关路由模块
 """
 import os
-import tempfile
+import uuid
 import datetime
 from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, send_file
 from werkzeug.utils import secure_filename
 
 from ... import config
 from ... import manager
+from ...file_manager import save_stream
 from ...logger import get_logger
 
 # 配置日志
@@ -28,6 +29,8 @@ def list_files():
 def filter_files():
     """根据标签过滤文件"""
     tags = request.args.getlist('tags')
+    exclude_tags = request.args.getlist('exclude')
+    query = request.args.get('q', '').strip()
     exact = request.args.get('exact', 'false').lower() == 'true'
     
     # 保持向后兼容性 - 如果使用旧格式的tag参数
@@ -35,34 +38,22 @@ def filter_files():
     if tag_name and not tags:
         tags = [tag_name]
     
-    if not tags:
+    if query:
+        # 布尔查询表达式，如 "A AND (B OR C) AND NOT D"
+        try:
+            files = manager.file.query_files(query, include_subclasses=not exact)
+        except ValueError as e:
+            flash(f'查询表达式错误: {str(e)}', 'error')
+            files = []
+    elif not tags and not exclude_tags:
         # 没有标签，显示所有文件
         files = manager.file.list_files()
-    elif len(tags) == 1:
-        # 单个标签过滤，使用现有方法
-        files = manager.file.get_files_by_tag(tags[0], include_subclasses=not exact)
     else:
-        # 多个标签过滤 - 使用文件名（可哈希）而不是Metadata对象（不可哈希）
-        
-        # 获取所有文件作为参考集
-        all_files = {file.filename: file for file in manager.file.list_files()}
-        
-        # 获取第一个标签的文件名集合
-        first_tag_files = set(file.filename for file in 
-                             manager.file.get_files_by_tag(tags[0], include_subclasses=not exact))
-        
-        # 与其他标签文件名集合求交集
-        matching_filenames = first_tag_files
-        for tag in tags[1:]:
-            tag_filenames = set(file.filename for file in 
-                               manager.file.get_files_by_tag(tag, include_subclasses=not exact))
-            matching_filenames = matching_filenames.intersection(tag_filenames)
-        
-        # 转换回Metadata对象列表
-        files = [all_files[filename] for filename in matching_filenames if filename in all_files]
+        # 在标签索引上求交集和差集
+        files = manager.file.find_files(all_tags=tags, exclude_tags=exclude_tags, include_subclasses=not exact)
     
     # 传递BASE_TAGS到模板用于前端过滤
-    return render_template('files.html', files=files, filter_tags=tags, exact=exact, base_tag_names=list(config.BASE_TAGS.keys()))
+    return render_template('files.html', files=files, filter_tags=tags, exclude_tags=exclude_tags, query=query, exact=exact, base_tag_names=list(config.BASE_TAGS.keys()))
 
 @files_bp.route('/upload', methods=['GET', 'POST'])
 def upload_file():
@@ -101,8 +92,10 @@ def upload_file():
         tag_list = [tag.strip() for tag in tags.split(',')] if tags else []
         tag_list = [tag for tag in tag_list if tag]  # 移除空标签
         
-        # 将文件保存到临时位置，然后创建后台任务
+        # 将文件保存到暂存目录，然后创建后台任务
         task_files = []
+        duplicates = []
+        seen_hashes = {}
         for file in files:
             if file and file.filename:
                 # 安全处理文件名
@@ -118,23 +111,38 @@ def upload_file():
                     filename = secure_filename(file.filename)
 
                 logger.debug(f"processed filename = {filename}")
-                # 创建临时目录（如果不存在）
-                temp_dir = os.path.join(tempfile.gettempdir(), 'amphilagus_uploads')
-                os.makedirs(temp_dir, exist_ok=True)
+                # 暂存文件路径，暂存目录与raw_files在同一文件系统，入库时无需再复制
+                temp_path = os.path.join(config.UPLOAD_TEMP_PATH, f"{filename}")
                 
-                # 临时文件路径
-                temp_path = os.path.join(temp_dir, f"{filename}")
+                # 边写入边计算内容哈希，先写入本次请求独有的文件名
+                part_path = f"{temp_path}.{uuid.uuid4().hex[:8]}.part"
+                content_hash, size = save_stream(file.stream, part_path)
                 
-                # 保存到临时位置
-                file.save(temp_path)
+                # 内容重复的文件在转换前就跳过
+                existing = manager.file.find_file_by_hash(content_hash) or seen_hashes.get(content_hash)
+                if existing:
+                    logger.info(f"文件 {filename} 与 {existing} 内容相同，跳过")
+                    duplicates.append(f"{filename}（与 {existing} 重复）")
+                    os.remove(part_path)
+                    continue
+                seen_hashes[content_hash] = filename
+                os.replace(part_path, temp_path)
                 
                 # 添加到任务文件列表
                 task_files.append({
                     "filename": filename,
                     "temp_path": temp_path,
-                    "size": os.path.getsize(temp_path)
+                    "size": size,
+                    "sha256": content_hash
                 })
         
+        if not task_files:
+            error_msg = f"所有文件都已存在: {', '.join(duplicates)}"
+            if is_ajax:
+                return jsonify({"success": False, "message": error_msg})
+            flash(error_msg, 'error')
+            return redirect(url_for('files.upload_file'))
+        
         # 创建上传任务
         task = manager.task.create_task(
             task_type='file_upload',
@@ -149,14 +157,18 @@ def upload_file():
         )
         
         # 构建响应消息
+        message = f"已创建上传任务，包含 {len(task_files)} 个文件"
+        if duplicates:
+            message += f"，跳过 {len(duplicates)} 个重复文件: {', '.join(duplicates)}"
         if is_ajax:
             return jsonify({
                 "success": True,
-                "message": f"已创建上传任务，包含 {len(task_files)} 个文件",
-                "task_id": task.task_id
+                "message": message,
+                "task_id": task.task_id,
+                "duplicates": duplicates
             })
         else:
-            flash(f"已创建上传任务，包含 {len(task_files)} 个文件", 'success')
+            flash(message, 'success')
             return redirect(url_for('tasks.view_tasks'))
             
     except Exception as e:
@@ -193,15 +205,17 @@ def batch_delete_files():
     success_count = 0
     failed_files = []
     
-    for filename in filenames:
-        try:
-            if manager.file.delete_file(filename):
-                success_count += 1
-            else:
+    # 所有删除在一个事务中提交，元数据只写入一次
+    with manager.file.batch():
+        for filename in filenames:
+            try:
+                if manager.file.delete_file(filename):
+                    success_count += 1
+                else:
+                    failed_files.append(filename)
+            except Exception as e:
+                logger.error(f"删除文件 {filename} 时出错: {str(e)}")
                 failed_files.append(filename)
-        except Exception as e:
-            logger.error(f"删除文件 {filename} 时出错: {str(e)}")
-            failed_files.append(filename)
     
     # 显示结果消息
     if success_count > 0:
@@ -220,6 +234,7 @@ def batch_embed_files():
         collection_name = request.form.get('collection_name')
         chunk_size = int(request.form.get('chunk_size', 1000))
         chunk_overlap = int(request.form.get('chunk_overlap', 200))
+        chunker = request.form.get('chunker', 'character')
         check_duplicates = request.form.get('check_duplicates') == 'on'
         filenames = request.form.getlist('filenames[]')
         
@@ -262,6 +277,7 @@ def batch_embed_files():
                 'collection_name': collection_name,
                 'chunk_size': chunk_size,
                 'chunk_overlap': chunk_overlap,
+                'chunker': chunker,
                 'check_duplicates': check_duplicates,
                 'file_paths': file_paths,
                 'filenames': filenames,  # 保存原始文件名用于显示
@@ -421,8 +437,7 @@ def update_description(filename):
     
     try:
         # 更新描述
-        file_metadata.description = new_description
-        manager.file._save_metadata()
+        manager.file.update_description(filename, new_description)
         flash(f'文件描述已更新')
     except Exception as e:
         flash(f'更新描述时出错: {str(e)}')
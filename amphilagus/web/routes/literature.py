@@ -1,7 +1,7 @@
 """
 文献管理相关路由模块
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 
 from ... import config
 from ... import manager
@@ -52,6 +52,34 @@ def filter_literature():
     # 通过BASE_TAGS传递基础标签类型给前端，用于过滤
     return render_template('literature.html', literature=filtered_literature, filter_tags=tags, exact=exact, base_tag_names=list(config.BASE_TAGS.keys()))
 
+@literature_bp.route('/search', methods=['GET'])
+def search_literature():
+    """全文搜索文献，结果按相关度排序"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return redirect(url_for('literature.list_literature'))
+    
+    # 与搜索框的即时结果一致，最后一个英文单词按前缀匹配
+    results = Literature.search(query, prefix=True)
+    return render_template('literature.html', literature=results, filter_tags=None, exact=False,
+                           search_query=query, base_tag_names=list(config.BASE_TAGS.keys()))
+
+@literature_bp.route('/api/search', methods=['GET'])
+def api_search_literature():
+    """全文搜索API，prefix=1时最后一个英文单词按前缀匹配，用于边输入边搜索"""
+    query = request.args.get('q', '').strip()
+    prefix = request.args.get('prefix', '0').lower() in ('1', 'true')
+    limit = request.args.get('limit', type=int)
+    
+    results = Literature.search(query, limit=limit, prefix=prefix) if query else []
+    return jsonify({
+        "query": query,
+        "results": [
+            {"title": lit.title, "journal": lit.journal, "publish_year": lit.publish_year}
+            for lit in results
+        ]
+    })
+
 @literature_bp.route('/sync', methods=['POST'])
 def sync_literature_tags():
     """同步文献与文件系统中的标签"""
@@ -81,12 +109,13 @@ def update_literature_files():
         # 获取所有文献
         literature_list = Literature.list_all()
         
-        # 遍历每篇文献，更新文件标签
+        # 遍历每篇文献，更新文件标签，所有修改在一个事务中提交
         success_count = 0
-        for lit in literature_list:
-            # 更新文件标签，自动创建不存在的标签
-            if lit.update_file_tags(manager.file, auto_create_tags=True):
-                success_count += 1
+        with manager.file.batch():
+            for lit in literature_list:
+                # 更新文件标签，自动创建不存在的标签
+                if lit.update_file_tags(manager.file, auto_create_tags=True):
+                    success_count += 1
         
         flash(f'已更新 {success_count} 篇文献的文件标签', 'success')
     except Exception as e:
@@ -75,23 +75,12 @@ def delete_tag(tag_name):
     
     # 实现标签删除逻辑
     try:
-        # 获取所有使用此标签的文件
-        files_with_tag = manager.file.get_files_by_tag(tag_name)
-        
-        # 从文件中移除此标签
-        for file in files_with_tag:
-            manager.file.remove_tags_from_file(file.filename, [tag_name])
-        
-        # 从标签注册表中删除
-        if hasattr(manager.file, 'delete_tag'):
-            manager.file.delete_tag(tag_name)
-            if is_preset:
-                flash(f'预设标签 {tag_name} 已删除，可通过"恢复预设标签"按钮恢复')
-            else:
-                flash(f'标签 {tag_name} 已删除')
+        # 从所有文件中移除此标签并从标签注册表中删除，在一个事务中完成
+        manager.file.delete_tag(tag_name)
+        if is_preset:
+            flash(f'预设标签 {tag_name} 已删除，可通过"恢复预设标签"按钮恢复')
         else:
-            # 临时方案：如果没有删除方法，则仅从文件中移除
-            flash(f'标签 {tag_name} 已从所有文件中移除，但无法从系统中完全删除')
+            flash(f'标签 {tag_name} 已删除')
     except Exception as e:
         flash(f'删除标签时出错: {str(e)}')
     
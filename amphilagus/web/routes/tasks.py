@@ -1,7 +1,9 @@
 """
 任务管理相关路由模块
 """
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+import json
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, Response
 
 from ... import manager
 
@@ -33,6 +35,77 @@ def get_task_status(task_id):
         return jsonify(status)
     return jsonify({"error": "任务不存在"}), 404
 
+@tasks_bp.route('/api/<task_id>/events')
+def task_events(task_id):
+    """
+    任务进度事件流 API（Server-Sent Events）
+
+    只在任务状态或进度变化时推送progress事件，内容与状态API相同，并包含实时进度
+    （已完成/总数、当前文件、吞吐量和预计剩余时间）；任务结束或被删除后关闭连接。
+    """
+    if manager.task.get_task(task_id) is None:
+        return jsonify({"error": "任务不存在"}), 404
+
+    def stream():
+        version, last_payload = None, None
+        while True:
+            update = manager.task.wait_for_update(task_id, version)
+            if update is None:
+                # 定期发送注释行，保持连接并及时发现客户端断开
+                yield ": keep-alive\n\n"
+                continue
+            version, status = update
+            if status is None:
+                yield "event: deleted\ndata: {}\n\n"
+                return
+            payload = json.dumps(status, ensure_ascii=False)
+            if payload != last_payload:
+                last_payload = payload
+                yield f"event: progress\ndata: {payload}\n\n"
+            if status['status'] not in ('pending', 'processing'):
+                return
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@tasks_bp.route('/api/events')
+def all_task_events():
+    """
+    所有未结束任务的进度事件流 API（Server-Sent Events）
+
+    一个连接推送所有等待中和处理中任务的变化，避免任务列表页为每个任务单独建立连接。
+    progress事件的内容与单个任务的事件流相同（包含task_id），任务结束时推送一次最终状态；
+    任务被删除时推送deleted事件，内容为{"task_id": 任务ID}。连接一直保持，新建的任务也会推送。
+    """
+    def stream():
+        versions, last_payloads = None, {}
+        while True:
+            update = manager.task.wait_for_updates(versions)
+            if update is None:
+                # 定期发送注释行，保持连接并及时发现客户端断开
+                yield ": keep-alive\n\n"
+                continue
+            versions, statuses, deleted = update
+            for task_id in deleted:
+                last_payloads.pop(task_id, None)
+                yield f"event: deleted\ndata: {json.dumps({'task_id': task_id})}\n\n"
+            for status in statuses:
+                payload = json.dumps(status, ensure_ascii=False)
+                if payload != last_payloads.get(status['task_id']):
+                    last_payloads[status['task_id']] = payload
+                    yield f"event: progress\ndata: {payload}\n\n"
+            # 只保留仍在跟踪的任务的上次推送内容
+            last_payloads = {task_id: payload for task_id, payload in last_payloads.items() if task_id in versions}
+
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@tasks_bp.route('/api/<task_id>/cancel', methods=['POST'])
+def cancel_task(task_id):
+    """取消任务 API"""
+    success, message = manager.task.cancel_task(task_id)
+    return jsonify({"success": success, "message": message})
+
 @tasks_bp.route('/api/<task_id>/delete', methods=['POST'])
 def delete_task(task_id):
     """删除任务 API"""
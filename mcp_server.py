@@ -85,13 +85,10 @@ class RAGPipelineWrapper:
 
     def initialize(self, collection_name, embedding_model="BAAI/bge-small-zh-v1.5", use_llm=False, top_k=5,**kwargs):
         """为特定集合初始化RAG管道"""
-        # 不再以top_k作为管道命名的一部分，因为现在可以动态设置top_k
+        # 不再以top_k作为管道命名的一部分，top_k在每次查询时单独传入
         pipeline_name = f"{collection_name}_usellm" if use_llm else f"{collection_name}"
         if self.initialized and hasattr(self, 'current_pipeline') and self.current_pipeline == pipeline_name:
-            # 如果已经为该集合初始化了管道，检查是否需要更新top_k
-            if hasattr(self.pipeline, 'set_top_k'):
-                logger.debug(f"重用已有管道并设置top_k={top_k}")
-                self.pipeline.set_top_k(top_k)
+            logger.debug(f"重用集合 '{collection_name}' 的已有管道")
             return True
             
         try:
@@ -108,6 +105,8 @@ class RAGPipelineWrapper:
             # 初始化管道
             chroma_path = os.path.abspath(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chroma_db"))
             
+            # 释放旧管道持有的共享模型，同名模型会在注册表中复用
+            previous_pipeline = self.pipeline
             self.pipeline = RAGPipeline(
                 collection_name=collection_name,  # 集合名称
                 embedding_model=embedding_model,  # 嵌入模型
@@ -116,6 +115,8 @@ class RAGPipelineWrapper:
                 top_k=top_k,  # 初始top_k值
                 **kwargs  # 其他参数
             )
+            if previous_pipeline is not None:
+                previous_pipeline.close()
             
             self.initialized = True  # 设置初始化状态为成功
             self.current_pipeline = pipeline_name  # 记录当前管道名称
@@ -139,7 +140,7 @@ class RAGPipelineWrapper:
             
         try:
             # 查询嵌入，不再需要重新创建管道，直接运行
-            results = self.pipeline.run(query=query_text)
+            results = self.pipeline.run(query=query_text, top_k=top_k)
             
             # 格式化结果
             documents = []
@@ -182,7 +183,8 @@ class RAGPipelineWrapper:
                 query=query_text,          # 查询文本
                 title=title,               # 文档标题
                 soft_match=soft_match,     # 是否启用软匹配
-                similarity_threshold=0.01  # 相似度阈值
+                similarity_threshold=0.01,  # 相似度阈值
+                top_k=top_k                # 本次查询的文档数量
             )
             
             # 格式化结果
@@ -0,0 +1,159 @@
+"""
+Tests for the chunker module.
+"""
+
+import pytest
+from haystack import Document
+
+from amphilagus.database.chunker import TokenChunker, section_starts
+
+@pytest.fixture
+def long_text():
+    """Create a text with many short sentences and no headings."""
+    return " ".join(f"Sentence number {i} talks about topic {i % 7}." for i in range(60))
+
+@pytest.fixture
+def structured_text():
+    """Create a Markdown text with nested sections."""
+    return (
+        "# Introduction\n"
+        "Memristors are resistive switching devices. They store state.\n"
+        "## Background\n"
+        "Early work used titanium dioxide. Later work used hafnium oxide.\n"
+        "# Methods\n"
+        "## Simulation details\n"
+        "We ran molecular dynamics. 模拟使用了周期性边界条件。\n"
+    )
+
+def count_tokens(chunker, text):
+    """Count tokens the same way the chunker does."""
+    return chunker.counter.count([text])[0]
+
+def test_chunks_respect_chunk_size(long_text):
+    """Test that no chunk exceeds the token budget."""
+    chunker = TokenChunker(chunk_size=40, chunk_overlap=10)
+    chunks = chunker.chunk_text(long_text)
+
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk["tokens"] <= 40
+        assert count_tokens(chunker, long_text[chunk["start"]:chunk["end"]]) <= 40
+
+def test_chunks_cover_text_in_order(long_text):
+    """Test that chunks are ordered and together cover the whole text."""
+    chunker = TokenChunker(chunk_size=40, chunk_overlap=10)
+    chunks = chunker.chunk_text(long_text)
+
+    assert chunks[0]["start"] == 0
+    assert chunks[-1]["end"] == len(long_text)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert previous["start"] < chunk["start"]
+        # 相邻片段之间没有遗漏的文本
+        assert chunk["start"] <= previous["end"]
+
+def test_overlap_is_whole_sentences_within_limit(long_text):
+    """Test that consecutive chunks share whole sentences up to chunk_overlap tokens."""
+    chunker = TokenChunker(chunk_size=40, chunk_overlap=12)
+    chunks = chunker.chunk_text(long_text)
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk["start"] < previous["end"]
+        overlap = long_text[chunk["start"]:previous["end"]].strip()
+        assert overlap.startswith("Sentence")
+        assert overlap.endswith(".")
+        assert count_tokens(chunker, overlap) <= 12
+
+def test_zero_overlap_produces_adjacent_chunks(long_text):
+    """Test that chunks do not overlap when chunk_overlap is 0."""
+    chunker = TokenChunker(chunk_size=40, chunk_overlap=0)
+    chunks = chunker.chunk_text(long_text)
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk["start"] == previous["end"]
+
+def test_overlap_is_capped_at_half_chunk_size():
+    """Test that the overlap never exceeds half of the chunk size."""
+    chunker = TokenChunker(chunk_size=20, chunk_overlap=50)
+    assert chunker.chunk_overlap == 10
+
+def test_max_tokens_caps_chunk_size():
+    """Test that the model input limit caps the chunk size."""
+    chunker = TokenChunker(chunk_size=512, chunk_overlap=32, max_tokens=128)
+    assert chunker.chunk_size == 128
+
+def test_long_sentence_is_split():
+    """Test that a sentence longer than chunk_size is split by tokens."""
+    text = " ".join(f"word{i}" for i in range(100))
+    chunker = TokenChunker(chunk_size=30, chunk_overlap=0)
+    chunks = chunker.chunk_text(text)
+
+    assert len(chunks) == 4
+    assert all(chunk["tokens"] <= 30 for chunk in chunks)
+    assert "".join(text[chunk["start"]:chunk["end"]] for chunk in chunks) == text
+
+def test_section_paths(structured_text):
+    """Test that every chunk records the heading path it belongs to."""
+    chunker = TokenChunker(chunk_size=200, chunk_overlap=0)
+    chunks = chunker.chunk_text(structured_text)
+
+    assert [chunk["section"] for chunk in chunks] == [
+        "Introduction",
+        "Introduction > Background",
+        "Methods > Simulation details",
+    ]
+    # 标题开始新片段，且片段包含标题本身
+    assert structured_text[chunks[1]["start"]:].startswith("## Background")
+    assert structured_text[chunks[2]["start"]:].startswith("# Methods")
+
+def test_sections_do_not_overlap(structured_text):
+    """Test that overlap is not carried across a heading."""
+    chunker = TokenChunker(chunk_size=200, chunk_overlap=50)
+    chunks = chunker.chunk_text(structured_text)
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk["start"] == previous["end"]
+
+def test_headings_in_code_fences_are_ignored():
+    """Test that # lines inside fenced code blocks do not start sections."""
+    text = (
+        "# Usage\n"
+        "Run the script.\n"
+        "```bash\n"
+        "# install dependencies\n"
+        "pip install amphilagus\n"
+        "```\n"
+        "~~~\n"
+        "## not a heading\n"
+        "~~~\n"
+        "## Options\n"
+        "Set the workspace.\n"
+    )
+    offsets, paths = section_starts(text)
+    assert paths == ["Usage", "Usage > Options"]
+    assert offsets == [0, text.index("## Options")]
+
+    chunks = TokenChunker(chunk_size=200, chunk_overlap=0).chunk_text(text)
+    assert [chunk["section"] for chunk in chunks] == ["Usage", "Usage > Options"]
+
+def test_section_starts(structured_text):
+    """Test heading offsets and paths returned by section_starts."""
+    offsets, paths = section_starts(structured_text)
+
+    assert paths == ["Introduction", "Introduction > Background", "Methods", "Methods > Simulation details"]
+    for offset in offsets:
+        assert structured_text[offset] == "#"
+    assert offsets == sorted(offsets)
+
+def test_chunk_documents_metadata(structured_text):
+    """Test that chunk documents carry offsets, token counts and the source metadata."""
+    chunker = TokenChunker(chunk_size=200, chunk_overlap=0)
+    document = Document(content=structured_text, meta={"source": "paper.md", "file_type": "md"})
+    chunked_docs = chunker.chunk_documents([document])
+
+    assert len(chunked_docs) == 3
+    for chunk_id, doc in enumerate(chunked_docs):
+        assert doc.meta["source"] == "paper.md"
+        assert doc.meta["chunk_id"] == chunk_id
+        assert doc.content == structured_text[doc.meta["chunk_start"]:doc.meta["chunk_end"]]
+        assert doc.meta["chunk_tokens"] <= 200
+    assert chunked_docs[2].meta["section"] == "Methods > Simulation details"
@@ -0,0 +1,89 @@
+"""
+Tests for the embedding_cache module.
+"""
+
+import pytest
+
+from amphilagus.database.collection_index import content_hash
+from amphilagus.database.embedding_cache import EmbeddingCache
+
+MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+@pytest.fixture
+def cache(tmp_path):
+    """Create an empty embedding cache in a temporary directory."""
+    return EmbeddingCache(str(tmp_path / "embedding_cache"))
+
+def test_text_hash_is_shared_with_collection_index():
+    """Test that the cache key uses the same normalized hash as the collection index."""
+    text = "Memristors  store\nstate. "
+    assert EmbeddingCache.text_hash(text) == content_hash(text)
+    # 空白字符差异不影响命中
+    assert EmbeddingCache.text_hash("Memristors store state.") == EmbeddingCache.text_hash(text)
+
+def test_miss_on_empty_cache(cache):
+    """Test that lookups on an empty cache return nothing."""
+    assert cache.get_many(MODEL, ["missing"]) == {}
+    assert cache.get_many(MODEL, []) == {}
+
+def test_put_then_hit(cache):
+    """Test that stored embeddings are returned for known hashes only."""
+    assert cache.put_many(MODEL, [("a", [0.5, 1.0, -2.0]), ("b", [0.0, 0.25, 3.0])]) == 2
+
+    hits = cache.get_many(MODEL, ["a", "missing", "b", "a"])
+    assert hits == {"a": [0.5, 1.0, -2.0], "b": [0.0, 0.25, 3.0]}
+
+def test_existing_hashes_are_not_written_again(cache):
+    """Test that put_many skips hashes that are already cached or repeated."""
+    cache.put_many(MODEL, [("a", [1.0, 2.0])])
+
+    assert cache.put_many(MODEL, [("a", [9.0, 9.0]), ("b", [3.0, 4.0]), ("b", [5.0, 6.0])]) == 1
+    assert cache.get_many(MODEL, ["a", "b"]) == {"a": [1.0, 2.0], "b": [3.0, 4.0]}
+    assert cache.stats() == [{"model": MODEL, "dim": 2, "entries": 2}]
+
+def test_dimension_mismatch_is_skipped(cache):
+    """Test that vectors with a different dimension than the model's are not stored."""
+    cache.put_many(MODEL, [("a", [1.0, 2.0])])
+    assert cache.put_many(MODEL, [("b", [1.0, 2.0, 3.0])]) == 0
+    assert cache.get_many(MODEL, ["b"]) == {}
+
+def test_models_are_separate(cache):
+    """Test that the same text hash is cached independently per model."""
+    cache.put_many(MODEL, [("a", [1.0, 2.0])])
+    cache.put_many("other-model", [("a", [7.0, 8.0, 9.0])])
+
+    assert cache.get_many(MODEL, ["a"]) == {"a": [1.0, 2.0]}
+    assert cache.get_many("other-model", ["a"]) == {"a": [7.0, 8.0, 9.0]}
+    assert cache.get_many("unknown-model", ["a"]) == {}
+
+def test_cache_persists_across_instances(cache):
+    """Test that a new cache instance on the same directory sees earlier entries."""
+    cache.put_many(MODEL, [("a", [1.0, 2.0])])
+    cache.put_many(MODEL, [("b", [3.0, 4.0])])
+
+    reopened = EmbeddingCache(cache.cache_dir)
+    assert reopened.get_many(MODEL, ["a", "b"]) == {"a": [1.0, 2.0], "b": [3.0, 4.0]}
+
+def test_many_hashes_are_queried_in_batches(cache):
+    """Test lookups with more hashes than fit in one SQLite statement."""
+    items = [(f"h{i}", [float(i), 0.0]) for i in range(1200)]
+    assert cache.put_many(MODEL, items) == 1200
+
+    hits = cache.get_many(MODEL, [text_hash for text_hash, _ in items])
+    assert len(hits) == 1200
+    assert hits["h1199"] == [1199.0, 0.0]
+
+def test_clear(cache):
+    """Test clearing one model and then the whole cache."""
+    cache.put_many(MODEL, [("a", [1.0, 2.0])])
+    cache.put_many("other-model", [("a", [3.0, 4.0])])
+
+    cache.clear(MODEL)
+    assert cache.get_many(MODEL, ["a"]) == {}
+    assert cache.get_many("other-model", ["a"]) == {"a": [3.0, 4.0]}
+
+    cache.clear()
+    assert cache.stats() == []
+    # 清空后可以重新写入
+    assert cache.put_many(MODEL, [("a", [5.0, 6.0])]) == 1
+    assert cache.get_many(MODEL, ["a"]) == {"a": [5.0, 6.0]}
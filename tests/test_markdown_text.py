@@ -0,0 +1,99 @@
+"""
+Tests for the markdown_text module.
+"""
+
+import pytest
+
+from amphilagus.database.markdown_text import iter_markdown_blocks, markdown_to_text, strip_inline
+
+@pytest.fixture
+def paper_markdown():
+    """Create a Markdown document shaped like a converted paper."""
+    return (
+        "# Memristor Review\n"
+        "\n"
+        "Resistive **switching** in [oxides](https://example.org) is *well* studied.\n"
+        "\n"
+        "## Methods\n"
+        "\n"
+        "```python\n"
+        "# not a heading\n"
+        "x = 1\n"
+        "```\n"
+        "\n"
+        "- first item\n"
+        "- second `code` item\n"
+        "\n"
+        "| Material | Gap |\n"
+        "|---|---|\n"
+        "| HfO2 | 5.7 |\n"
+        "\n"
+        "Results\n"
+        "-------\n"
+        "\n"
+        "$$\n"
+        "E = mc^2\n"
+        "$$\n"
+    )
+
+def test_strip_inline_formatting():
+    """Test that inline formatting is removed and code spans are kept verbatim."""
+    assert strip_inline("**bold** and *em* and ~~gone~~") == "bold and em and gone"
+    assert strip_inline("see [the docs](http://x) and ![fig](a.png)") == "see the docs and fig"
+    assert strip_inline("use `**not bold**` here") == "use **not bold** here"
+    assert strip_inline("a &amp; b <span>c</span>") == "a & b c"
+    assert strip_inline(r"\*literal\*") == "*literal*"
+
+def test_block_kinds_and_sections(paper_markdown):
+    """Test block kinds and the section path recorded for each block."""
+    blocks = list(iter_markdown_blocks(paper_markdown.splitlines()))
+
+    assert [(block.kind, block.section) for block in blocks] == [
+        ("heading", "Memristor Review"),
+        ("paragraph", "Memristor Review"),
+        ("heading", "Memristor Review > Methods"),
+        ("code", "Memristor Review > Methods"),
+        ("list", "Memristor Review > Methods"),
+        ("table", "Memristor Review > Methods"),
+        ("heading", "Memristor Review > Results"),
+        ("code", "Memristor Review > Results"),
+    ]
+    assert blocks[1].text == "Resistive switching in oxides is well studied."
+    assert blocks[2].level == 2
+
+def test_code_fences_are_kept_verbatim(paper_markdown):
+    """Test that fenced code is kept as is and # lines inside it are not headings."""
+    blocks = list(iter_markdown_blocks(paper_markdown.splitlines()))
+    code = [block for block in blocks if block.kind == "code"]
+
+    assert code[0].text == "# not a heading\nx = 1"
+    assert code[1].text == "E = mc^2"
+    assert not any(block.kind == "heading" and "not a heading" in block.text for block in blocks)
+
+def test_lists_and_tables(paper_markdown):
+    """Test that list markers are dropped and table rows become pipe-separated cells."""
+    blocks = {block.kind: block for block in iter_markdown_blocks(paper_markdown.splitlines())}
+
+    assert blocks["list"].text == "first item\nsecond code item"
+    assert blocks["table"].text == "Material | Gap\nHfO2 | 5.7"
+
+def test_markdown_to_text_headings(paper_markdown):
+    """Test that headings are normalized to single '# title' lines separated by blank lines."""
+    text = markdown_to_text(paper_markdown)
+
+    assert text.startswith("# Memristor Review\n\nResistive switching")
+    assert "\n\n## Methods\n\n" in text
+    # Setext标题也统一输出为ATX形式
+    assert "\n\n## Results\n\n" in text
+    assert "**" not in text and "](" not in text
+
+def test_html_comments_are_removed():
+    """Test that single-line and multi-line HTML comments are dropped."""
+    text = markdown_to_text("before <!-- hidden --> after\n\n<!--\nmulti\nline\n-->\nvisible\n")
+    assert text == "before  after\n\nvisible"
+
+def test_unclosed_fence_is_flushed():
+    """Test that an unterminated code block is still emitted."""
+    blocks = list(iter_markdown_blocks(["# Title", "```", "code line"]))
+    assert blocks[-1].kind == "code"
+    assert blocks[-1].text == "code line"
@@ -0,0 +1,83 @@
+"""
+Tests for PDF extraction in the document_loader module.
+"""
+
+import pytest
+
+from amphilagus.database import document_loader
+from amphilagus.database.document_loader import PDF_PARALLEL_MIN_PAGES, extract_pdf_pages, load_file, load_pdf
+
+def write_pdf(path, page_count):
+    """Write a minimal PDF whose page i contains the text 'Page number i'."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{' '.join(f'{4 + 2 * i} 0 R' for i in range(page_count))}] /Count {page_count} >>",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(page_count):
+        stream = f"BT /F1 12 Tf 72 720 Td (Page number {i + 1}) Tj ET"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    output, offsets = "%PDF-1.4\n", []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    path.write_text(output, encoding="latin-1")
+    return str(path)
+
+@pytest.fixture
+def large_pdf(tmp_path):
+    """Create a PDF large enough to be split across processes."""
+    return write_pdf(tmp_path / "large.pdf", PDF_PARALLEL_MIN_PAGES * 2)
+
+@pytest.fixture
+def pools(monkeypatch):
+    """Record the worker count of every process pool created for PDF extraction."""
+    created = []
+    original = document_loader.ProcessPoolExecutor
+
+    class RecordingPool(original):
+        def __init__(self, max_workers=None, **kwargs):
+            created.append(max_workers)
+            super().__init__(max_workers=max_workers, **kwargs)
+
+    monkeypatch.setattr(document_loader, "ProcessPoolExecutor", RecordingPool)
+    return created
+
+def test_parallel_extraction_matches_serial(large_pdf, pools):
+    """Test that the page-parallel path is taken and returns the same pages as serial extraction."""
+    serial = extract_pdf_pages(large_pdf)
+    assert pools == []
+
+    parallel = extract_pdf_pages(large_pdf, workers=3)
+    assert pools == [3]
+    assert parallel == serial
+    assert len(parallel) == PDF_PARALLEL_MIN_PAGES * 2
+    assert "Page number 1" in parallel[0]
+    assert "Page number 64" in parallel[-1]
+
+def test_small_pdf_is_extracted_serially(tmp_path, pools):
+    """Test that PDFs below PDF_PARALLEL_MIN_PAGES never start a pool."""
+    small_pdf = write_pdf(tmp_path / "small.pdf", PDF_PARALLEL_MIN_PAGES - 1)
+    pages = extract_pdf_pages(small_pdf, workers=4)
+
+    assert pools == []
+    assert len(pages) == PDF_PARALLEL_MIN_PAGES - 1
+
+def test_load_file_uses_configured_workers(large_pdf, pools, monkeypatch):
+    """Test that load_file extracts large PDFs with config.PDF_EXTRACT_WORKERS processes."""
+    monkeypatch.setattr(document_loader.config, "PDF_EXTRACT_WORKERS", 2)
+    monkeypatch.setattr(document_loader.pdf_text_cache, "get", lambda file_hash: None)
+    monkeypatch.setattr(document_loader.pdf_text_cache, "put", lambda file_hash, pages: None)
+
+    documents = load_file(large_pdf, file_hash="0" * 64)
+
+    assert pools == [2]
+    assert [doc.meta["page"] for doc in documents] == list(range(1, PDF_PARALLEL_MIN_PAGES * 2 + 1))
+    assert documents[0].meta["title"] == "large"
+    assert [doc.content for doc in documents] == [doc.content for doc in load_pdf(large_pdf, "large", use_cache=False)]
@@ -0,0 +1,93 @@
+"""
+Tests for the search_index module.
+"""
+
+import pytest
+
+from amphilagus.search_index import InvertedIndex, tokenize
+
+@pytest.fixture
+def index():
+    """Create an index over a few bilingual paper records."""
+    index = InvertedIndex({"title": 3.0, "content": 1.0})
+    index.update("review", {"title": "忆阻器综述", "content": "忆阻器是一种非易失性存储器件。memristor devices"})
+    index.update("oxide", {"title": "HfO2 resistive switching",
+                           "content": "氧化铪薄膜中的阻变机制，与忆阻器相关。memory"})
+    index.update("dft", {"title": "Density functional theory", "content": "计算材料科学中的密度泛函理论"})
+    return index
+
+def test_tokenize_document_and_query():
+    """Test that documents index single characters and bigrams while queries use bigrams."""
+    assert tokenize("忆阻器 Memristor") == ["忆", "阻", "器", "忆阻", "阻器", "memristor"]
+    assert tokenize("忆阻器", query=True) == ["忆阻", "阻器"]
+    assert tokenize("器", query=True) == ["器"]
+    # 全角字符按NFKC规范化
+    assert tokenize("ＨｆＯ２ film_2") == ["hfo2", "film", "2"]
+
+def test_cjk_bigram_search(index):
+    """Test that multi-character Chinese queries require adjacent characters."""
+    assert {doc_id for doc_id, _ in index.search("忆阻器")} == {"review", "oxide"}
+    assert [doc_id for doc_id, _ in index.search("密度泛函")] == ["dft"]
+    # 字都出现但不相邻
+    assert index.search("阻忆") == []
+
+def test_title_matches_rank_higher(index):
+    """Test that field boosts rank title hits above content hits."""
+    results = index.search("忆阻器")
+    assert [doc_id for doc_id, _ in results] == ["review", "oxide"]
+    assert results[0][1] > results[1][1] > 0
+
+def test_rarer_terms_score_higher():
+    """Test BM25 idf: a term found in fewer documents contributes more."""
+    index = InvertedIndex({"content": 1.0})
+    index.update(1, {"content": "common rare"})
+    index.update(2, {"content": "common"})
+    index.update(3, {"content": "common"})
+    rare_score = dict(index.search("rare"))[1]
+    common_score = dict(index.search("common"))[1]
+    assert rare_score > common_score
+
+def test_all_terms_required(index):
+    """Test that every query term must match (AND)."""
+    assert [doc_id for doc_id, _ in index.search("hfo2 忆阻器")] == ["oxide"]
+    assert index.search("hfo2 密度") == []
+
+def test_prefix_expansion(index):
+    """Test that the last English word is expanded as a prefix only when requested."""
+    assert index.search("memr") == []
+    assert [doc_id for doc_id, _ in index.search("memr", prefix=True)] == ["review"]
+    assert {doc_id for doc_id, _ in index.search("mem", prefix=True)} == {"review", "oxide"}
+    # 只展开最后一个词
+    assert [doc_id for doc_id, _ in index.search("resist swi", prefix=True)] == []
+    assert [doc_id for doc_id, _ in index.search("resistive swi", prefix=True)] == ["oxide"]
+
+def test_unknown_terms(index):
+    """Test queries with terms that are not indexed."""
+    assert index.search("graphene") == []
+    assert index.search("graphene", prefix=True) == []
+    assert index.search("xyz 忆阻器") == []
+    assert index.search("") == []
+
+def test_limit(index):
+    """Test that limit keeps only the best results."""
+    assert [doc_id for doc_id, _ in index.search("忆阻器", limit=1)] == ["review"]
+
+def test_update_replaces_document(index):
+    """Test that updating a document replaces its old terms."""
+    index.update("dft", {"title": "Graphene memristor", "content": ""})
+    assert index.search("密度泛函") == []
+    assert {doc_id for doc_id, _ in index.search("memristor")} == {"review", "dft"}
+    assert len(index) == 3
+
+def test_remove_and_clear(index):
+    """Test removing documents and clearing the index."""
+    assert index.remove("review") is True
+    assert index.remove("review") is False
+    assert "review" not in index
+    assert [doc_id for doc_id, _ in index.search("忆阻器")] == ["oxide"]
+    # 已删除文档的词项不再参与前缀展开
+    assert index.search("memr", prefix=True) == []
+
+    index.clear()
+    assert len(index) == 0
+    assert index.search("hfo2") == []
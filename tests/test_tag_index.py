@@ -0,0 +1,130 @@
+"""
+Tests for the tag_index module.
+"""
+
+import random
+
+import pytest
+
+from amphilagus.tag_index import TagIndex, bitmap_ids, parse_query
+
+@pytest.fixture
+def index():
+    """
+    Create an index with a small tag hierarchy.
+
+    材料 > 氧化物 > HfO2, 器件 > 忆阻器, 综述
+    file 0: HfO2, 忆阻器; file 1: 氧化物; file 2: 忆阻器, 综述; file 3: no tags
+    """
+    parents = {"材料": None, "氧化物": "材料", "HfO2": "氧化物", "器件": None, "忆阻器": "器件", "综述": None}
+    file_tags = [(0, "HfO2"), (0, "忆阻器"), (1, "氧化物"), (2, "忆阻器"), (2, "综述")]
+    return TagIndex.build(parents, file_tags, file_ids=range(4))
+
+def ids(index, expression, include_subclasses=True):
+    """Run a query and return the matching file IDs."""
+    return bitmap_ids(index.query(expression, include_subclasses))
+
+def test_bitmap_ids_matches_binary_string():
+    """Test bitmap_ids against the set bits of the binary representation."""
+    rng = random.Random(0)
+    bitmaps = [0, 1, 0b101001, 1 << 1000, (1 << 600) - 1]
+    bitmaps += [rng.getrandbits(2000) & rng.getrandbits(2000) & rng.getrandbits(2000) for _ in range(50)]
+    for bitmap in bitmaps:
+        expected = [i for i, bit in enumerate(reversed(bin(bitmap)[2:])) if bit == "1"]
+        assert bitmap_ids(bitmap) == expected
+
+def test_parse_query_precedence():
+    """Test NOT > AND > OR precedence and implicit AND between adjacent tags."""
+    assert parse_query("A OR B AND NOT C") == ("or", [("tag", "A"), ("and", [("tag", "B"), ("not", ("tag", "C"))])])
+    assert parse_query("A B") == ("and", [("tag", "A"), ("tag", "B")])
+    assert parse_query("A & (B | C) & !D") == ("and", [
+        ("tag", "A"), ("or", [("tag", "B"), ("tag", "C")]), ("not", ("tag", "D"))
+    ])
+    assert parse_query('"带 空格 的标签" or e') == ("or", [("tag", "带 空格 的标签"), ("tag", "e")])
+
+@pytest.mark.parametrize("expression", ["", "A AND", "(A OR B", "A )", "AND A"])
+def test_parse_query_errors(expression):
+    """Test that malformed expressions raise ValueError."""
+    with pytest.raises(ValueError):
+        parse_query(expression)
+
+def test_subclass_closure(index):
+    """Test exact matching versus matching including descendant tags."""
+    assert ids(index, "材料") == [0, 1]
+    assert ids(index, "材料", include_subclasses=False) == []
+    assert ids(index, "氧化物", include_subclasses=False) == [1]
+    assert ids(index, "器件") == [0, 2]
+
+def test_boolean_queries(index):
+    """Test AND, OR and NOT combinations with subclass closure."""
+    assert ids(index, "材料 AND 器件") == [0]
+    assert ids(index, "氧化物 OR 综述") == [0, 1, 2]
+    assert ids(index, "NOT 材料") == [2, 3]
+    assert ids(index, "器件 AND NOT 综述") == [0]
+    assert ids(index, "(材料 | 综述) & !HfO2") == [1, 2]
+
+def test_match(index):
+    """Test the all/any/exclude combination used by the literature filter."""
+    assert bitmap_ids(index.match(all_tags=["器件"], exclude_tags=["综述"])) == [0]
+    assert bitmap_ids(index.match(any_tags=["HfO2", "综述"])) == [0, 2]
+    assert bitmap_ids(index.match()) == [0, 1, 2, 3]
+
+def test_unknown_tag_matches_nothing(index):
+    """Test that a tag missing from the registry has no matching files."""
+    assert ids(index, "不存在") == []
+    assert ids(index, "NOT 不存在") == [0, 1, 2, 3]
+
+def test_add_file_tags_updates_ancestors(index):
+    """Test that adding a tag adds the file to every ancestor's closure."""
+    index.add_file_tags(3, ["HfO2"])
+    assert ids(index, "材料") == [0, 1, 3]
+    assert ids(index, "氧化物") == [0, 1, 3]
+
+    # 新文件
+    index.add_file_tags(7, ["忆阻器"])
+    assert ids(index, "器件") == [0, 2, 7]
+    assert ids(index, "NOT 器件") == [1, 3]
+
+def test_remove_file_tags_keeps_ancestors_still_covered(index):
+    """Test that removing a tag keeps ancestors covered by the file's other tags."""
+    index.add_file_tags(1, ["HfO2"])
+    index.remove_file_tags(1, ["HfO2"])
+    # 文件1仍直接带有氧化物
+    assert ids(index, "材料") == [0, 1]
+    assert ids(index, "HfO2") == [0]
+
+    index.remove_file_tags(0, ["HfO2"])
+    assert ids(index, "材料") == [1]
+    assert ids(index, "器件") == [0, 2]
+
+def test_set_file_tags(index):
+    """Test replacing all tags of a file."""
+    index.set_file_tags(2, ["HfO2"])
+    assert ids(index, "器件") == [0]
+    assert ids(index, "材料") == [0, 1, 2]
+    assert ids(index, "综述") == []
+
+def test_reparent_tag(index):
+    """Test that changing a tag's parent recomputes the closure."""
+    index.set_tag("忆阻器", "材料")
+    assert ids(index, "材料") == [0, 1, 2]
+    assert ids(index, "器件") == []
+
+    # 新标签挂在已有标签下
+    index.set_tag("综述文章", "综述")
+    index.add_file_tags(3, ["综述文章"])
+    assert ids(index, "综述") == [2, 3]
+
+def test_remove_tag(index):
+    """Test that removing a tag removes it from every file and closure."""
+    index.remove_tag("HfO2")
+    assert ids(index, "HfO2") == []
+    assert ids(index, "材料") == [1]
+    assert index.file_tags[0] == {"忆阻器"}
+
+def test_remove_file(index):
+    """Test that a removed file no longer matches any query, including NOT."""
+    index.remove_file(0)
+    assert ids(index, "器件") == [2]
+    assert ids(index, "NOT 器件") == [1, 3]
+    assert ids(index, "材料 OR 器件 OR 综述") == [1, 2]
@@ -0,0 +1,138 @@
+"""
+Tests for the task_store module.
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from amphilagus.task_store import TaskStore
+
+def make_task(task_id, status="pending", created_at=None, completed_at=None, **extra):
+    """Create a task record shaped like Task.to_record()."""
+    created_at = created_at or datetime.now()
+    data = {
+        "task_id": task_id,
+        "task_type": "batch_embed",
+        "priority": "bulk",
+        "status": status,
+        "progress": 0,
+        "files": [],
+        "params": {},
+        "created_at": created_at.isoformat(),
+        "started_at": None,
+        "completed_at": completed_at.isoformat() if completed_at else None,
+        "error": None,
+        "result": {},
+        "checkpoint": {},
+    }
+    data.update(extra)
+    return data
+
+@pytest.fixture
+def store(tmp_path):
+    """Create an empty task store in a temporary directory."""
+    return TaskStore(tmp_path / "tasks.sqlite3")
+
+def test_save_and_load_round_trip(store):
+    """Test that every field, including JSON columns, survives a save/load."""
+    task = make_task(
+        "t1",
+        files=[{"filename": "论文.pdf", "temp_path": "/tmp/a.pdf"}],
+        params={"collection_name": "papers", "chunk_size": 256},
+        result={"success": True},
+        checkpoint={"done_files": ["a.md"]},
+    )
+    store.save(task)
+
+    assert store.load_all() == [task]
+
+def test_checkpoint_round_trip(store):
+    """Test that update_checkpoint only touches the checkpoint and progress."""
+    store.save(make_task("t1", status="processing", params={"file_paths": ["a.md", "b.md"]}))
+    checkpoint = {"collection_ready": True, "done_files": ["a.md"], "in_flight": ["b.md"]}
+    store.update_checkpoint("t1", checkpoint, 40)
+
+    loaded = store.load_all()[0]
+    assert loaded["checkpoint"] == checkpoint
+    assert loaded["progress"] == 40
+    assert loaded["status"] == "processing"
+    assert loaded["params"] == {"file_paths": ["a.md", "b.md"]}
+
+    # 重新打开数据库后断点仍然存在
+    reopened = TaskStore(store.db_path)
+    assert reopened.load_all()[0]["checkpoint"] == checkpoint
+
+def test_update_progress(store):
+    """Test that update_progress changes only the progress column."""
+    store.save(make_task("t1", status="processing"))
+    store.update_progress("t1", 75)
+
+    loaded = store.load_all()[0]
+    assert loaded["progress"] == 75
+    assert loaded["status"] == "processing"
+
+def test_save_replaces_existing_task(store):
+    """Test that saving the same task ID overwrites the row."""
+    store.save(make_task("t1"))
+    store.save(make_task("t1", status="completed", completed_at=datetime.now()))
+
+    tasks = store.load_all()
+    assert len(tasks) == 1
+    assert tasks[0]["status"] == "completed"
+
+def test_status_and_recent_queries(store):
+    """Test ids_with_status and recent_ids ordering."""
+    now = datetime.now()
+    store.save_many([
+        make_task("old", status="completed", created_at=now - timedelta(hours=3), completed_at=now),
+        make_task("running", status="processing", created_at=now - timedelta(hours=2)),
+        make_task("queued", status="pending", created_at=now - timedelta(hours=1)),
+    ])
+
+    assert store.ids_with_status("pending", "processing") == ["running", "queued"]
+    assert store.recent_ids(2) == ["queued", "running"]
+
+def test_retention_by_age(store):
+    """Test that finished tasks older than max_age_days are deleted."""
+    now = datetime.now()
+    store.save_many([
+        make_task("expired", status="completed", created_at=now - timedelta(days=40),
+                  completed_at=now - timedelta(days=40)),
+        make_task("recent", status="failed", created_at=now - timedelta(days=1),
+                  completed_at=now - timedelta(days=1)),
+        make_task("old_pending", status="pending", created_at=now - timedelta(days=40)),
+    ])
+
+    assert store.apply_retention(max_age_days=30) == ["expired"]
+    assert {task["task_id"] for task in store.load_all()} == {"recent", "old_pending"}
+
+def test_retention_by_count(store):
+    """Test that only the newest max_finished finished tasks are kept."""
+    now = datetime.now()
+    store.save_many(
+        [make_task(f"done{i}", status="completed", created_at=now - timedelta(minutes=10 - i), completed_at=now)
+         for i in range(5)]
+        + [make_task("running", status="processing", created_at=now - timedelta(minutes=20))]
+    )
+
+    assert sorted(store.apply_retention(max_finished=2)) == ["done0", "done1", "done2"]
+    assert {task["task_id"] for task in store.load_all()} == {"done3", "done4", "running"}
+
+def test_delete(store):
+    """Test deleting tasks by ID."""
+    store.save_many([make_task("t1"), make_task("t2")])
+    store.delete(["t1"])
+    assert [task["task_id"] for task in store.load_all()] == ["t2"]
+
+def test_import_json(store, tmp_path):
+    """Test importing a legacy tasks.json file."""
+    json_path = tmp_path / "tasks.json"
+    json_path.write_text(json.dumps([make_task("legacy", status="completed", completed_at=datetime.now())]),
+                         encoding="utf-8")
+
+    assert store.import_json(str(json_path)) == 1
+    assert [task["task_id"] for task in store.load_all()] == ["legacy"]
+    assert not json_path.exists()
+    assert (tmp_path / "tasks.json.migrated").exists()